@@ -0,0 +1,47 @@
+"""Append 1M lines through fs.writeText(path, line, 1) and fs.writer.
+
+Run with `python benchmarks/bench_fs_write.py [lines]`.
+"""
+import os
+import sys
+import tempfile
+import time
+from teeny.glob import Fs, closeWriters
+from teeny.value import String, Number
+
+def unbuffered(path: str, lines: list) -> None:
+    # What writeText(path, line, 1) used to do: one open/close pair per call
+    for line in lines:
+        with open(path, "a", encoding = "utf8") as f:
+            f.write(line.value)
+
+def writeText(path: str, lines: list) -> None:
+    fn = Fs.get(String(value = "writeText"))
+    p = String(value = path); append = Number(value = 1)
+    for line in lines:
+        fn([p, line, append], [])
+    closeWriters()
+
+def writer(path: str, lines: list) -> None:
+    w = Fs.get(String(value = "writer"))([String(value = path)], [])
+    write = w.get(String(value = "write"))
+    for line in lines:
+        write([line], [])
+    w.get(String(value = "close"))([], [])
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    # String values are heavy, so cycle through a small pool instead of building a million of them
+    pool = [String(value = f"line {i}\n") for i in range(1000)]
+    lines = [pool[i % len(pool)] for i in range(count)]
+    with tempfile.TemporaryDirectory() as d:
+        for name, fn in [("open/close per line", unbuffered), ("fs.writeText append", writeText), ("fs.writer", writer)]:
+            path = os.path.join(d, name.replace(" ", "_").replace("/", "_") + ".txt")
+            st = time.perf_counter()
+            fn(path, lines)
+            ed = time.perf_counter()
+            assert os.path.getsize(path) == sum(len(line.value) for line in lines)
+            print(f"{name:24} {count} lines  {ed - st:8.3f} s")
+
+if __name__ == "__main__":
+    main()
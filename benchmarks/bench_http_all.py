@@ -0,0 +1,53 @@
+"""Fetch N urls from a local server that answers after a fixed delay, with http.all at several
+concurrency limits. Speedup should stay close to the limit until it reaches N.
+
+Run with `python benchmarks/bench_http_all.py [requests] [delay ms]`.
+"""
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from teeny.glob import Http
+from teeny.value import String, Number, Table
+
+class Delayed(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    delay = 0.05
+    def do_GET(self):
+        time.sleep(self.delay)
+        body = b'{"ok": 1}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    def log_message(self, *args):
+        pass
+
+class Server(ThreadingHTTPServer):
+    # The default backlog of 5 makes the kernel drop connects once many requests start at once
+    request_queue_size = 128
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    Delayed.delay = (int(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+    server = Server(("127.0.0.1", 0), Delayed)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    urls = Table({})
+    for i in range(n):
+        urls.append(String(value = f"{url}{i}"))
+    fetch = Http.get(String(value = "all"))
+    base = None
+    for k in (1, 2, 4, 8, 16, 32, 64):
+        if k > n: break
+        start = time.perf_counter()
+        fetch([urls], [[type("Kw", (), {"typ": "NAME", "value": "concurrency"})(), Number(value = k)]])
+        took = time.perf_counter() - start
+        base = base or took
+        print(f"concurrency {k:>3}: {took:6.3f}s  speedup {base / took:5.1f}x")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
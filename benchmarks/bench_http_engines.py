@@ -0,0 +1,76 @@
+"""p50/p99 request latency of the thread and async engines of http.listen under many concurrent
+keep-alive clients.
+
+Run with `python benchmarks/bench_http_engines.py [clients] [requests per client]`.
+The thread engine closes the connection after every response, its clients reconnect each time.
+"""
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+
+HANDLER = '(req) => [body: "ok"]'
+
+def freePort() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def client(port: int, n: int, latencies: list) -> None:
+    reader = writer = None
+    for _ in range(n):
+        start = time.perf_counter()
+        if writer is None:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET / HTTP/1.1\r\nHost: bench\r\n\r\n")
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+        if head.startswith(b"HTTP/1.0") or b"onnection: close" in head:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+async def load(port: int, clients: int, n: int) -> tuple[list, float]:
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[client(port, n, latencies) for _ in range(clients)])
+    return sorted(latencies), time.perf_counter() - start
+
+def run(engine: str, clients: int, n: int) -> None:
+    port = freePort()
+    options = f', engine = "{engine}", maxConnections = {clients * 2}' if engine == "async" else ""
+    code = f'http.listen({port}, {HANDLER}{options})'
+    server = subprocess.Popen([sys.executable, "-c", f"from teeny.runner import run_code; run_code({code!r}, False, False, False)"],
+                              stderr = subprocess.DEVNULL)
+    try:
+        for _ in range(200):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout = 1).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        time.sleep(0.5)
+        asyncio.run(load(port, 4, 20))
+        latencies, took = asyncio.run(load(port, clients, n))
+        p = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+        print(f"{engine:>6}: {len(latencies) / took:7.0f} req/s  p50 {p(0.5):7.2f} ms  p99 {p(0.99):7.2f} ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main() -> None:
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    print(f"{clients} clients x {n} requests")
+    for engine in ("thread", "async"):
+        run(engine, clients, n)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Throughput of http.listen with one process versus pre-forked workers, under a CPU-bound handler.
+
+Run with `python benchmarks/bench_http_listen.py [workers] [requests] [clients]`.
+The load generator runs in its own processes so it does not compete for the server's GIL.
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+import http.client
+from multiprocessing import Pool
+
+HANDLER = '(req) => [body: string((for i in 1..300 { i * i }).len())]'
+
+def freePort() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def hammer(args: tuple) -> int:
+    port, n = args
+    done = 0
+    for _ in range(n):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout = 30)
+        conn.request("GET", "/")
+        if conn.getresponse().read() == b"300":
+            done += 1
+        conn.close()
+    return done
+
+def run(workers: int, requests: int, clients: int) -> float:
+    port = freePort()
+    code = f'http.listen({port}, {HANDLER}, workers = {workers})'
+    server = subprocess.Popen([sys.executable, "-c", f"from teeny.runner import run_code; run_code({code!r}, False, False, False)"],
+                              stderr = subprocess.DEVNULL)
+    try:
+        for _ in range(200):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout = 1).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        hammer((port, 10))
+        start = time.perf_counter()
+        with Pool(clients) as pool:
+            done = sum(pool.map(hammer, [(port, requests // clients)] * clients))
+        took = time.perf_counter() - start
+        assert done == requests // clients * clients
+        return done / took
+    finally:
+        server.terminate()
+        server.wait()
+
+def main() -> None:
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    clients = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    print(f"{os.cpu_count()} cpus, {requests} requests from {clients} clients")
+    base = run(1, requests, clients)
+    print(f"workers  1: {base:8.0f} req/s")
+    if workers > 1:
+        rate = run(workers, requests, clients)
+        print(f"workers {workers:>2}: {rate:8.0f} req/s  {rate / base:4.1f}x")
+
+if __name__ == "__main__":
+    main()
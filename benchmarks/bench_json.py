@@ -0,0 +1,39 @@
+"""Compare json.decode/json.encode against the old makeTable/makeObject round trip.
+
+Run with `python benchmarks/bench_json.py [records]`.
+"""
+import json
+import sys
+import time
+import tracemalloc
+from teeny.glob import decodeJson, encodeJson
+from teeny.value import makeTable, makeObject
+
+def measure(fn, arg):
+    tracemalloc.start()
+    st = time.perf_counter()
+    res = fn(arg)
+    ed = time.perf_counter()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return res, ed - st, peak
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    text = json.dumps([{"id": i, "name": f"user {i}", "score": i * 0.5, "tags": ["a", "b"], "active": i % 2 == 0}
+                       for i in range(count)])
+    rows = [
+        ("decode  makeTable(json.loads)", lambda t: makeTable(json.loads(t)), text),
+        ("decode  decodeJson", decodeJson, text),
+    ]
+    table = decodeJson(text)
+    rows += [
+        ("encode  json.dumps(makeObject)", lambda v: json.dumps(makeObject(v)), table),
+        ("encode  encodeJson", encodeJson, table),
+    ]
+    for name, fn, arg in rows:
+        _, seconds, peak = measure(fn, arg)
+        print(f"{name:32} {count} records  {seconds:7.3f} s  peak {peak / 2 ** 20:7.1f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Scaling of table.pmap against the serial table.map as the worker count grows.
+
+Run with `python benchmarks/bench_pmap.py [items] [n]`, every item computes fib(n) in Teeny.
+Each worker count is warmed up first so the timed run reuses started workers.
+"""
+import os
+import sys
+import time
+from teeny.runner import run_code
+from teeny.glob import makeGlobal
+from teeny import parallel
+
+def main() -> None:
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    env = makeGlobal()
+    run_code(f'fib = (n) => if n < 2 {{ n }} else {{ fib(n - 1) + fib(n - 2) }}; t = range(0, {items}).map((x) => {n})',
+             False, False, False, env)
+    st = time.perf_counter()
+    run_code('t.map((x) => fib(x))', False, False, False, env)
+    serial = time.perf_counter() - st
+    print(f"cpus {os.cpu_count()}, {items} items of fib({n})")
+    print(f"{'map':12} {serial:8.3f} s")
+    for workers in (1, 2, 4, 8, 16, 32):
+        run_code(f'table.pmap(range(0, {workers}), (x) => time.sleep(0.2), workers = {workers}, chunk = 1)', False, False, False, env)
+        st = time.perf_counter()
+        run_code(f'table.pmap(t, (x) => fib(x), workers = {workers})', False, False, False, env)
+        took = time.perf_counter() - st
+        print(f"{'pmap ' + str(workers):12} {took:8.3f} s  x{serial / took:5.2f}")
+    parallel.shutdown()
+
+if __name__ == "__main__":
+    main()
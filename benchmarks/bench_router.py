@@ -0,0 +1,35 @@
+"""Dispatch cost of a `match req.path` handler versus http.router() as the number of routes grows.
+
+Run with `python benchmarks/bench_router.py [requests]`. The requested path is the last route,
+the worst case for `match`.
+"""
+import sys
+import time
+from teeny.runner import run_code
+from teeny.glob import makeGlobal
+from teeny.value import Table, String, makeTable
+
+def handlers(routes: int) -> tuple:
+    arms = ", ".join(f'"/r{i}/item": [body: "{i}"]' for i in range(routes))
+    code = f'matcher = (req) => match req.path {{ {arms}, _: [status: 404] }}; router = http.router()'
+    env = makeGlobal()
+    run_code(code, False, False, False, env)
+    for i in range(routes):
+        run_code(f'router.get("/r{i}/item", (req) => [body: "{i}"])', False, False, False, env)
+    return env["matcher"], env["router"]
+
+def timeit(fn, req: Table, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn([req], [])
+    return (time.perf_counter() - start) / n * 1e6
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for routes in (5, 20, 80):
+        matcher, router = handlers(routes)
+        req = lambda: makeTable({"method": "GET", "path": f"/r{routes - 1}/item", "headers": {}, "body": ""})
+        print(f"{routes:>3} routes: match {timeit(matcher, req(), n):8.1f} us   router {timeit(router, req(), n):8.1f} us")
+
+if __name__ == "__main__":
+    main()
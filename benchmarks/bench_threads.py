@@ -0,0 +1,31 @@
+"""Throughput of independent interpreters running on threads, one global env each.
+
+Run with `python benchmarks/bench_threads.py [jobs] [n]`, every job computes fib(n) in Teeny.
+On a build with the GIL the rate stays flat as threads are added; on a free-threaded build
+(python3.13t and later, `PYTHON_GIL=0`) it should grow with the number of cores.
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from teeny.runner import run_code
+
+def job(n: int) -> None:
+    run_code(f'fib = (n) => if n < 2 {{ n }} else {{ fib(n - 1) + fib(n - 2) }}; fib({n})', False, False, False)
+
+def main() -> None:
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"cpus {os.cpu_count()}, gil {'on' if gil else 'off'}, {jobs} jobs of fib({n})")
+    base = None
+    for threads in (1, 2, 4, 8, 16):
+        with ThreadPoolExecutor(threads) as pool:
+            st = time.perf_counter()
+            list(pool.map(job, [n] * jobs))
+            took = time.perf_counter() - st
+        base = base or took
+        print(f"{'threads ' + str(threads):12} {took:8.3f} s  {jobs / took:8.1f} jobs/s  x{base / took:5.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,11 @@ def toString(value: Any) -> str:
     return str(value)
 
 class AST:
-    def __init__(self, typ: str, children: list["AST"] = [], value: any = None) -> None:
+    # Source line of the token the node starts at, 0 when unknown
+    line: int = 0
+    def __init__(self, typ: str, children: list["AST"] = [], value: any = None, line: int = 0) -> None:
         self.typ = typ; self.children = children; self.value = value
+        if line: self.line = line
     def toString(self, tab: int = 0) -> str:
         res = ""
         res += "    " * tab + self.typ + ' ' + (toString(self.value) if self.value != None else "") + '\n'
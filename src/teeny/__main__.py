@@ -8,6 +8,7 @@ from teeny.exception import LexicalError, SyntaxError, RuntimeError
 from teeny.value import makeObject, String, makeTable, Error
 from teeny.runner import run_code
 from teeny.glob import makeGlobal, getType
+from teeny.counters import counters
 from pathlib import Path
 import time
 import os
@@ -58,9 +59,20 @@ helpText = f"""{C['hdr']}Teeny REPL commands:{C['rst']}
     {C['cmd']}:reload{C['rst']}             {C['desc']}Reset to a fresh global environment
     {C['cmd']}:?{C['rst']} {C['arg']}<name>{C['rst']}           {C['desc']}Inspect a variable (type and value)
 
+    {C['cmd']}:stats{C['rst']}              {C['desc']}Show runtime counters, {C['cmd']}:stats reset{C['desc']} sets them to zero
+
     {C['cmd']}:time{C['rst']} {C['arg']}<expr>{C['rst']}        {C['desc']}Evaluate <expr> and show execution time
     {C['cmd']}:ast{C['rst']}  {C['arg']}<expr>{C['rst']}        {C['desc']}Show parsed AST for <expr> (does not execute)"""
 
+def printStats(stats: dict) -> None:
+    for k, v in stats.items():
+        if isinstance(v, dict):
+            print(f"{k}:")
+            for typ, n in v.items():
+                print(f"    {typ}: {n}")
+        else:
+            print(f"{k}: {v}")
+
 banner = """\033[35;1mTeeny\033[0m  —  Tiny Expression Language
 Type \033[36m:help\033[0m for help."""
 
@@ -83,6 +95,12 @@ def main():
             elif src == ":help":
                 print(helpText)
                 continue
+            elif src == ":stats reset":
+                counters.reset()
+                continue
+            elif src == ":stats":
+                printStats(counters.stats())
+                continue
             flag = False; st, ed = None, None
             if len(src) >= 5 and src[0:5] == ":time":
                 flag = True
@@ -115,6 +133,26 @@ def main():
         print(f"Module {src.name} installed successfully.")
         sys.exit(0)
         
+    elif sys.argv[1] == "--profile":
+        # Report on stderr, collapsed stacks for flame graphs next to the script's name
+        from teeny.profiler import Profiler
+        script = sys.argv[2]
+        prof = Profiler()
+        res = prof.run(run_code, script, print_each = True, print_res = False)
+        if isinstance(res, Error):
+            print("Error:", res.typ, res.value)
+        sys.stderr.write(prof.report(open(script, encoding = "utf-8").read()))
+        out = Path(script).stem + ".folded"
+        with open(out, "w", encoding = "utf-8") as f:
+            f.write(prof.collapsed())
+        sys.stderr.write(f"collapsed stacks written to {out}\n")
+        sys.exit(0)
+    elif sys.argv[1] == "--async":
+        res = run_code(sys.argv[2], print_each = True, print_res = False, asyncMode = True)
+        if isinstance(res, Error):
+            print("Error:", res.typ, res.value)
+        sys.exit(0)
+
     res = run_code(sys.argv[1], print_each = True, print_res = False)
     if isinstance(res, Error):
         print("Error:", res.typ, res.value)
@@ -0,0 +1,193 @@
+import ssl
+from json import dumps
+import asyncio
+import threading
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from urllib.parse import urlsplit, urljoin, urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from teeny.value import Value, Error
+
+# The event loop behind async mode. It runs on one background thread for the whole process; the
+# interpreter thread hands it coroutines and gets concurrent futures back, so any number of requests,
+# sleeps and subprocesses can be in flight while only this one thread waits on them.
+class Loop:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    def get(self) -> asyncio.AbstractEventLoop:
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target = self.loop.run_forever, name = "teeny-aio", daemon = True).start()
+            return self.loop
+    def submit(self, coro: Awaitable) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.get())
+
+loop: Loop = Loop()
+
+class HTTPError(Exception):
+    pass
+
+class Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+    def close(self) -> None:
+        self.writer.close()
+
+class AsyncHTTP:
+    # A small HTTP/1.1 client on asyncio streams: keep-alive connections per host, at most `limit`
+    # requests on the wire at once, Content-Length, chunked and read-to-close bodies, redirects.
+    def __init__(self, limit: int = 512, timeout: float = 10, keepAlive: bool = True, maxRedirects: int = 5) -> None:
+        self.limit = limit
+        self.timeout = timeout
+        self.keepAlive = keepAlive
+        self.maxRedirects = maxRedirects
+        self.idle: dict[tuple, list[Connection]] = {}
+        self.slots: asyncio.Semaphore | None = None
+        self.ssl = ssl.create_default_context()
+
+    async def request(self, method: str, url: str, params: dict | None = None, headers: dict | None = None,
+                      json: object = None) -> requests.Response:
+        # `json` is sent as the JSON body, as the blocking client does for post/put/patch
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.limit)
+        if params:
+            url += ("&" if "?" in url else "?") + urlencode(params)
+        headers = dict(headers or {})
+        data = None
+        if json is not None:
+            data = dumps(json).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+        async with self.slots:
+            for _ in range(self.maxRedirects + 1):
+                r = await asyncio.wait_for(self.send(method, url, headers, data), self.timeout)
+                location = r.headers.get("location")
+                if r.status_code not in (301, 302, 303, 307, 308) or not location:
+                    return r
+                url = urljoin(url, location)
+                if r.status_code == 303 or (r.status_code in (301, 302) and method == "POST"):
+                    method, data = "GET", None
+            raise HTTPError(f"more than {self.maxRedirects} redirects")
+
+    async def connect(self, key: tuple) -> Connection:
+        pool = self.idle.get(key)
+        while pool:
+            conn = pool.pop()
+            if not conn.writer.is_closing() and not conn.reader.at_eof():
+                conn.reused = True
+                return conn
+            conn.close()
+        scheme, host, port = key
+        reader, writer = await asyncio.open_connection(host, port, ssl = self.ssl if scheme == "https" else None,
+                                                       server_hostname = host if scheme == "https" else None)
+        return Connection(reader, writer)
+    async def send(self, method: str, url: str, headers: dict, data: bytes | None) -> requests.Response:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise HTTPError(f"unsupported url {url}")
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        target = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+        lines = {"Host": parts.netloc, "User-Agent": "teeny", "Accept-Encoding": "identity",
+                 "Connection": "keep-alive" if self.keepAlive else "close"}
+        lines.update(headers)
+        if data is not None or method in ("POST", "PUT", "PATCH"):
+            lines["Content-Length"] = str(len(data or b""))
+        head = f"{method} {target} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in lines.items()) + "\r\n"
+        conn = await self.connect(key)
+        try:
+            conn.writer.write(head.encode("latin-1") + (data or b""))
+            await conn.writer.drain()
+            status, resHeaders, body, reusable = await self.receive(conn, method)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            conn.close()
+            if not conn.reused:
+                raise
+            # A kept-alive connection the server had already closed, one more try on a fresh one
+            return await self.send(method, url, headers, data)
+        except BaseException:
+            conn.close()
+            raise
+        if reusable and self.keepAlive:
+            self.idle.setdefault(key, []).append(conn)
+        else:
+            conn.close()
+        r = requests.Response()
+        r.status_code = status
+        r.headers = CaseInsensitiveDict(resHeaders)
+        r._content = body
+        r.encoding = get_encoding_from_headers(r.headers)
+        r.url = url
+        return r
+    async def receive(self, conn: Connection, method: str) -> tuple[int, dict, bytes, bool]:
+        reader = conn.reader
+        line, *fields = (await reader.readuntil(b"\r\n\r\n"))[:-4].decode("latin-1").split("\r\n")
+        version, status = line.split(" ", 2)[:2]
+        status = int(status)
+        headers = {}
+        for field in fields:
+            name, _, value = field.partition(":")
+            headers[name.strip()] = value.strip()
+        lower = {k.lower(): v for k, v in headers.items()}
+        reusable = lower.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            return status, headers, b"", reusable
+        if "chunked" in lower.get("transfer-encoding", "").lower():
+            parts = []
+            while True:
+                size = int((await reader.readline()).split(b";", 1)[0].strip(), 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return status, headers, b"".join(parts), reusable
+                parts.append(await reader.readexactly(size))
+                await reader.readline()
+        if "content-length" in lower:
+            return status, headers, await reader.readexactly(int(lower["content-length"])), reusable
+        return status, headers, await reader.read(), False
+
+    async def close(self) -> None:
+        for pool in self.idle.values():
+            for conn in pool:
+                conn.close()
+        self.idle.clear()
+
+async def runCommand(args: list[str]) -> str:
+    proc = await asyncio.create_subprocess_exec(*args, stdout = asyncio.subprocess.PIPE, stderr = asyncio.subprocess.PIPE)
+    out, _ = await proc.communicate()
+    return out.decode("utf-8", "replace")
+
+async def readFile(path: str) -> str:
+    # Regular files are always "ready" to the OS, the read goes to the loop's default executor
+    def read() -> str:
+        with open(path, encoding = "utf8") as f:
+            return f.read()
+    return await asyncio.get_running_loop().run_in_executor(None, read)
+
+class Pending:
+    # A loop operation seen from the interpreter, awaited like a task.Task. `convert` turns the
+    # coroutine's result into a Teeny value on the awaiting thread, once.
+    def __init__(self, coro: Awaitable, convert: Callable[[object], Value], errorType: str = "IOError") -> None:
+        self.future = loop.submit(coro)
+        self.convert = convert
+        self.errorType = errorType
+        self.value: Value | None = None
+        self.lock = threading.Lock()
+
+    def wait(self) -> Value:
+        with self.lock:
+            if self.value is None:
+                try:
+                    self.value = self.convert(self.future.result())
+                except Exception as e:
+                    self.value = Error({}, typ = self.errorType, value = str(e) or type(e).__name__)
+            return self.value
+    def done(self) -> bool:
+        return self.future.done()
+
+defaultHTTP: AsyncHTTP = AsyncHTTP()
@@ -0,0 +1,158 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+from teeny.value import Value, String, Table, Error
+from teeny.memo import key as valueKey
+
+# Process-wide named caches. Every thread sees the same caches by name, so http.listen handlers
+# running on the dispatcher's threads can share results.
+
+def sizeOf(value: Value, seen: set[int] | None = None) -> int:
+    # Roughly what the value costs in memory, enough to bound a cache by bytes
+    if isinstance(value, String):
+        return sys.getsizeof(value.value) + 64
+    if isinstance(value, Table):
+        seen = set() if seen is None else seen
+        if id(value) in seen:
+            return 0
+        seen.add(id(value))
+        return 128 + sum(sizeOf(k, seen) + sizeOf(v, seen) for k, v in value.value.items())
+    return 64
+
+class Entry:
+    __slots__ = ("value", "expires", "size")
+    def __init__(self, value: Value, expires: float, size: int) -> None:
+        self.value = value
+        self.expires = expires
+        self.size = size
+
+class Flight:
+    # A computation in progress, the callers that ask for the same key meanwhile wait for it.
+    # `owner` is the thread running it, which would wait for itself if fn asked for the key again.
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Value | None = None
+        self.owner = threading.get_ident()
+
+class Cache:
+    # At most `maxEntries` entries and about `maxBytes` bytes (0 for no limit), the least recently
+    # used entry goes first. An entry lives `ttl` seconds unless set with its own ttl (0 for ever).
+    def __init__(self, name: str, maxEntries: int = 1024, maxBytes: int = 0, ttl: float = 0) -> None:
+        self.name = name
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.ttl = ttl
+        self.entries: OrderedDict[tuple, Entry] = OrderedDict()
+        self.flights: dict[tuple, Flight] = {}
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def lookup(self, k: tuple) -> Value | None:
+        # With the lock held
+        entry = self.entries.get(k)
+        if entry is not None and entry.expires and entry.expires <= time.monotonic():
+            self.remove(k)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(k)
+        self.hits += 1
+        return entry.value
+    def store(self, k: tuple, value: Value, ttl: float | None) -> None:
+        # With the lock held
+        ttl = self.ttl if ttl is None else ttl
+        if k in self.entries:
+            self.remove(k)
+        entry = Entry(value, time.monotonic() + ttl if ttl else 0, sizeOf(value))
+        self.entries[k] = entry
+        self.bytes += entry.size
+        while self.entries and ((self.maxEntries and len(self.entries) > self.maxEntries) or
+                                (self.maxBytes and self.bytes > self.maxBytes)):
+            self.remove(next(iter(self.entries)))
+            self.evictions += 1
+    def remove(self, k: tuple) -> bool:
+        entry = self.entries.pop(k, None)
+        if entry is None:
+            return False
+        self.bytes -= entry.size
+        return True
+
+    def get(self, key: Value) -> Value | None:
+        with self.lock:
+            return self.lookup(valueKey(key))
+    def set(self, key: Value, value: Value, ttl: float | None = None) -> None:
+        with self.lock:
+            self.store(valueKey(key), value, ttl)
+    def has(self, key: Value) -> bool:
+        k = valueKey(key)
+        with self.lock:
+            entry = self.entries.get(k)
+            return entry is not None and (not entry.expires or entry.expires > time.monotonic())
+    def delete(self, key: Value) -> bool:
+        with self.lock:
+            return self.remove(valueKey(key))
+    def getOrCompute(self, key: Value, fn: Value, ttl: float | None = None) -> Value:
+        # Single flight: one caller runs fn for a missing key, the others wait for its result.
+        # An Error from fn is handed to everyone waiting but not stored.
+        k = valueKey(key)
+        with self.lock:
+            value = self.lookup(k)
+            if value is not None:
+                return value
+            flight = self.flights.get(k)
+            leader = flight is None
+            if leader:
+                flight = self.flights[k] = Flight()
+        if not leader:
+            if flight.owner == threading.get_ident():
+                return Error({}, typ = "CacheError", value = f"getOrCompute of a key while computing it in cache {self.name}")
+            flight.done.wait()
+            return flight.value
+        try:
+            flight.value = fn([key], [])
+        except Exception as e:
+            flight.value = Error({}, typ = "CacheError", value = str(e))
+        finally:
+            with self.lock:
+                if flight.value is not None and not isinstance(flight.value, Error):
+                    self.store(k, flight.value, ttl)
+                del self.flights[k]
+            flight.done.set()
+        return flight.value
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.entries)
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "expirations": self.expirations,
+                    "entries": len(self.entries), "bytes": self.bytes, "max": self.maxEntries, "maxBytes": self.maxBytes}
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+caches: dict[str, Cache] = {}
+cachesLock = threading.Lock()
+
+def named(name: str, maxEntries: int = 1024, maxBytes: int = 0, ttl: float = 0) -> Cache:
+    # The options only apply when the cache is created, later calls get the existing one
+    with cachesLock:
+        if name not in caches:
+            caches[name] = Cache(name, maxEntries, maxBytes, ttl)
+        return caches[name]
+def drop(name: str) -> bool:
+    with cachesLock:
+        return caches.pop(name, None) is not None
+def allStats() -> dict:
+    with cachesLock:
+        current = list(caches.values())
+    return {c.name: c.stats() for c in current}
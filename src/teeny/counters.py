@@ -0,0 +1,36 @@
+from collections import defaultdict
+
+# Counters of what the runtime does, always on and cheap enough for that: one attribute or dict
+# increment per event. Increments from several threads are not atomic, so with threads the
+# figures are approximate. runtime.stats() and the REPL's :stats show them.
+
+class Counters:
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.allocations: defaultdict[type, int] = defaultdict(int)
+        self.envLookups = 0
+        self.envDepth = 0
+        self.closureCalls = 0
+        self.builtinCalls = 0
+        self.snapshots = 0
+        self.regexCompiles = 0
+        self.moduleHits = 0
+        self.moduleLoads = 0
+
+    def stats(self) -> dict:
+        return {
+            "allocations": {cls.__name__: n for cls, n in sorted(self.allocations.items(), key = lambda item: -item[1])},
+            "envLookups": self.envLookups,
+            # Outer environments walked past before a name was found, in total
+            "envDepth": self.envDepth,
+            "closureCalls": self.closureCalls,
+            "builtinCalls": self.builtinCalls,
+            "snapshots": self.snapshots,
+            "regexCompiles": self.regexCompiles,
+            "moduleHits": self.moduleHits,
+            "moduleLoads": self.moduleLoads
+        }
+
+counters: Counters = Counters()
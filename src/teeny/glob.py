@@ -1,25 +1,36 @@
 import importlib
 from teeny.value import Env, Number, String, Table, Error, ValError, BuiltinClosure, \
-                        makeTable, makeObject, Value, Nil, Closure, copy, isTruthy
+                        makeTable, makeObject, Value, Nil, Closure, copy, isTruthy, Regex, compileRegex
+from teeny.counters import counters
 import math
 from pathlib import Path
 import json
 import os
 import shutil
+import mmap
 import requests
 import sys
 import random
 import subprocess
 import time
 import functools
+import threading
+import asyncio
+import atexit
+import codecs
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import statistics
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
 import sqlite3
 from rich import print as rprint
 from rich.markdown import Markdown
-from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from teeny.httpclient import HTTPClient, ResponseCache, defaultClient
+from teeny.httpserver import Router, HandlerCache, serve, metrics
+from teeny import parallel, task, aio, shm, memo, cache
 
-srcPath: Path = Path(sys.argv[1] if len(sys.argv) >= 2 else __file__).parent
+srcPath: Path = Path(next((a for a in sys.argv[1:] if not a.startswith("--")), __file__)).parent
 globalPackagePath: Path = Path(__file__).parent.parent.parent / "lib"
 
 Math: Table = Table(value = {
@@ -66,13 +77,147 @@ Err = Table(value = {
     String(value = "raise"): BuiltinClosure(fn = lambda typ, message: Error({}, typ, message))
 })
 
+def makeIterator(items, typ: str = "IOError") -> Table:
+    # Wrap a Python iterator so `for` can consume it lazily, only the current item is kept alive
+    it = iter(items)
+    cur = [-1, Nil()]
+    def nxt(val = [], kw = []) -> Number | Nil:
+        try:
+            cur[1] = next(it)
+        except StopIteration:
+            return Nil()
+        except Exception as e:
+            cur[1] = Error({}, typ = typ, value = str(e))
+        cur[0] += 1
+        return Number(value = cur[0])
+    def take(self: Table, pos: Value) -> Value:
+        if isinstance(pos, Number) and pos.value == cur[0]:
+            return cur[1]
+        return self.get(pos)
+    def step() -> Value:
+        if isinstance(nxt(), Nil):
+            return Nil()
+        return cur[1]
+    return Table(value = {
+        String(value = "_iter_"): BuiltinClosure(fn = lambda: nxt),
+        String(value = "_get_"): BuiltinClosure(fn = take),
+        String(value = "next"): BuiltinClosure(fn = step)
+    })
+
+class BufferedWriter:
+    # Collects writes in memory and hands them to the file in one call once the buffer is full
+    # or flushInterval seconds have passed since the last flush
+    def __init__(self, pth: str, append: bool = True, bufferSize: int = 65536, flushInterval: float = 1.0) -> None:
+        self.file = open(pth, "a" if append else "w", encoding = "utf8")
+        self.buffer: list[str] = []
+        self.buffered = 0
+        self.bufferSize = bufferSize
+        self.flushInterval = flushInterval
+        self.lastFlush = time.monotonic()
+        self.lock = threading.Lock()
+        track(self)
+    def write(self, content: str) -> None:
+        with self.lock:
+            self.buffer.append(content)
+            self.buffered += len(content)
+            if self.buffered >= self.bufferSize or time.monotonic() - self.lastFlush >= self.flushInterval:
+                self.flushLocked()
+    def flush(self) -> None:
+        with self.lock:
+            if not self.file.closed:
+                self.flushLocked()
+    def flushIfStale(self) -> None:
+        with self.lock:
+            if self.buffer and not self.file.closed and time.monotonic() - self.lastFlush >= self.flushInterval:
+                self.flushLocked()
+    def flushLocked(self) -> None:
+        if self.buffer:
+            self.file.write("".join(self.buffer))
+            self.buffer.clear()
+            self.buffered = 0
+        self.file.flush()
+        self.lastFlush = time.monotonic()
+    def close(self) -> None:
+        with self.lock:
+            if self.file.closed: return
+            self.flushLocked()
+            self.file.close()
+        with openWritersLock:
+            openWriters.discard(self)
+    def __del__(self) -> None:
+        # A writer the script dropped without closing still hands over what it buffered
+        try:
+            self.close()
+        except Exception:
+            pass
+
+# Every writer not yet closed, flushed at exit. A daemon thread flushes the ones that have held
+# data for flushInterval seconds, so a quiet writer does not keep its last lines forever.
+# Reentrant: a writer collected while the lock is held closes itself through __del__.
+openWriters: weakref.WeakSet[BufferedWriter] = weakref.WeakSet()
+openWritersLock = threading.RLock()
+flushTick: float = 0.1
+flusher: threading.Thread | None = None
+def track(writer: BufferedWriter) -> None:
+    global flusher
+    with openWritersLock:
+        openWriters.add(writer)
+        if flusher is None:
+            flusher = threading.Thread(target = flushStale, name = "teeny-fs-flush", daemon = True)
+            flusher.start()
+def flushStale() -> None:
+    while True:
+        time.sleep(flushTick)
+        flushWriters(stale = True)
+
+writerCacheSize: int = 16
+writerCache: OrderedDict[str, BufferedWriter] = OrderedDict()
+writerCacheLock = threading.Lock()
+def writerKey(pth: str) -> str:
+    # Callers resolve paths against the working directory or srcPath, relative or not; the same
+    # file has to end up under the same key
+    return os.path.abspath(pth)
+def cachedWriter(pth: str) -> BufferedWriter:
+    pth = writerKey(pth)
+    with writerCacheLock:
+        if pth in writerCache:
+            writerCache.move_to_end(pth)
+            return writerCache[pth]
+        writer = BufferedWriter(pth)
+        writerCache[pth] = writer
+        if len(writerCache) > writerCacheSize:
+            writerCache.popitem(last = False)[1].close()
+        return writer
+def releaseWriter(pth: str, close: bool = False) -> None:
+    # Readers and truncating writes must see everything appended so far
+    pth = writerKey(pth)
+    with writerCacheLock:
+        writer = writerCache.pop(pth, None) if close else writerCache.get(pth)
+    if writer is not None:
+        writer.close() if close else writer.flush()
+def flushWriters(stale: bool = False) -> Nil:
+    with openWritersLock:
+        writers = list(openWriters)
+    for writer in writers:
+        writer.flushIfStale() if stale else writer.flush()
+    return Nil()
+def closeWriters() -> None:
+    with writerCacheLock:
+        writerCache.clear()
+    with openWritersLock:
+        writers = list(openWriters)
+    for writer in writers:
+        writer.close()
+atexit.register(closeWriters)
+
 def read(path: String, isJson = False, lines = False) -> String | Table:
     pth: str = Path(os.getcwd()) / path.value
     res: str = ""
     try:
+        releaseWriter(str(pth))
         res = open(pth, "r", encoding = "utf8").read()
         if isJson:
-            res = json.loads(res)
+            res = decodeJson(res)
     except Exception as e:
         return Error({}, typ = "IOError", value = str(e))
     if not isJson:
@@ -84,22 +229,56 @@ def read(path: String, isJson = False, lines = False) -> String | Table:
                 rs.append(String(value = item))
             return rs
     else:
-        return makeTable(res)
+        return res
 def write(path: String, content: Value, isJson=False, lines=False, append=Number(value=0)) -> Value:
-    pth = str(Path(os.getcwd()) / path.value)
+    pth = os.path.join(os.getcwd(), path.value)
     if isJson:
-        cont = json.dumps(makeObject(content))
+        cont = encodeJson(content)
     elif lines:
-        cont = '\n'.join(content.toList())
+        cont = '\n'.join([i.toString().value for i in content.toList()])
     else:
-        cont = content.value.replace("\\n", "\n")
-    mode = "a" if append.value else "w"
+        cont = content.value
+        if "\\n" in cont: cont = cont.replace("\\n", "\n")
     try:
-        with open(pth, mode, encoding="utf8") as f:
-            f.write(cont)
+        if append.value:
+            cachedWriter(pth).write(cont)
+        else:
+            releaseWriter(pth, close = True)
+            with open(pth, "w", encoding="utf8") as f:
+                f.write(cont)
     except Exception as e:
         return Error({}, typ = "IOError", value = str(e))
     return content
+def makeWriter(writer: BufferedWriter) -> Table:
+    res = Table({})
+    def write(content: Value) -> Value:
+        writer.write(content.value if isinstance(content, String) else content.toString().value)
+        return content
+    def writeLine(content: Value) -> Value:
+        writer.write((content.value if isinstance(content, String) else content.toString().value) + "\n")
+        return content
+    def use(fn: Value) -> Value:
+        try:
+            return fn([res], [])
+        finally:
+            writer.close()
+    res.update({
+        String(value = "write"): BuiltinClosure(fn = ioCall(write)),
+        String(value = "writeLine"): BuiltinClosure(fn = ioCall(writeLine)),
+        String(value = "flush"): BuiltinClosure(fn = ioCall(lambda: (writer.flush(), Nil())[-1])),
+        String(value = "close"): BuiltinClosure(fn = ioCall(lambda: (writer.close(), Nil())[-1])),
+        String(value = "use"): BuiltinClosure(fn = ioCall(use))
+    })
+    return res
+def openWriter(path: String, append: Number = Number(value = 0), bufferSize: Number = Number(value = 65536),
+               flushInterval: Number = Number(value = 1)) -> Table:
+    pth = str(Path(os.getcwd()) / path.value)
+    try:
+        releaseWriter(pth, close = True)
+        writer = BufferedWriter(pth, bool(append.value), int(bufferSize.value), flushInterval.value)
+    except Exception as e:
+        return Error({}, typ = "IOError", value = str(e))
+    return makeWriter(writer)
 
 def exists(path: String) -> Number:
     pth: str = srcPath / path.value
@@ -135,6 +314,8 @@ def copy(src: String, dst: String) -> Nil:
     pthSrc: str = srcPath / src.value
     pthDst: str = srcPath / dst.value
     try:
+        releaseWriter(str(pthSrc))
+        releaseWriter(str(pthDst), close = True)
         shutil.copy2(pthSrc, pthDst)
     except Exception as e:
         return Error({}, typ = "IOError", value = str(e))
@@ -143,10 +324,19 @@ def move(src: String, dst: String) -> Nil:
     pthSrc: str = srcPath / Path(src.value)
     pthDst: str = srcPath / Path(dst.value)
     try:
+        releaseWriter(str(pthSrc), close = True)
+        releaseWriter(str(pthDst), close = True)
         shutil.move(pthSrc, pthDst)
     except Exception as e:
         return Error({}, typ = "IOError", value = str(e))
     return Nil()
+def fileSize(path: String) -> Number:
+    pth: str = srcPath / path.value
+    try:
+        releaseWriter(str(pth))
+        return Number(value = os.path.getsize(pth))
+    except Exception as e:
+        return Error({}, typ = "IOError", value = str(e))
 def join(table: Table) -> String:
     tab = table.toList()
     try:
@@ -163,6 +353,93 @@ def findFiles(path: String, check: Value = BuiltinClosure(fn = lambda *args: Tru
     for item in lis:
         res.append(String(value = item))
     return res
+def ioCall(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def inner(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            return Error({}, typ = "IOError", value = str(e))
+    return inner
+def readLines(f) -> Iterator[String]:
+    for line in f:
+        yield String(value = line[:-1] if line.endswith("\n") else line)
+def handleLines(f) -> Iterator[String]:
+    # The handle is closed once every line has been read, like eachLine does. An iterator left
+    # half way keeps it open, the script may still read from it.
+    yield from readLines(f)
+    f.close()
+def makeFileHandle(f) -> Table:
+    def readN(n: Number = Number(value = -1)) -> String:
+        return String(value = f.read(int(n.value)))
+    def readLine() -> String | Nil:
+        line = f.readline()
+        if line == "": return Nil()
+        return String(value = line[:-1] if line.endswith("\n") else line)
+    def writeS(content: Value) -> Number:
+        return Number(value = f.write(content.toString().value))
+    return Table(value = {
+        String(value = "lines"): BuiltinClosure(fn = lambda: makeIterator(handleLines(f))),
+        String(value = "read"): BuiltinClosure(fn = ioCall(readN)),
+        String(value = "readLine"): BuiltinClosure(fn = ioCall(readLine)),
+        String(value = "write"): BuiltinClosure(fn = ioCall(writeS)),
+        String(value = "flush"): BuiltinClosure(fn = ioCall(lambda: (f.flush(), Nil())[-1])),
+        String(value = "close"): BuiltinClosure(fn = ioCall(lambda: (f.close(), Nil())[-1])),
+        String(value = "closed"): BuiltinClosure(fn = lambda: Number(value = int(f.closed)))
+    })
+def openFile(path: String, mode: String = String(value = "r")) -> Table:
+    pth: str = Path(os.getcwd()) / path.value
+    try:
+        releaseWriter(str(pth), close = mode.value[0] in "wa")
+        f = open(pth, mode.value, encoding = "utf8")
+    except Exception as e:
+        return Error({}, typ = "IOError", value = str(e))
+    return makeFileHandle(f)
+def eachLine(path: String, fn: Value) -> Number:
+    pth: str = Path(os.getcwd()) / path.value
+    cnt = 0
+    try:
+        releaseWriter(str(pth))
+        with open(pth, "r", encoding = "utf8") as f:
+            for line in readLines(f):
+                res = fn([line, Number(value = cnt)], [])
+                if isinstance(res, Error):
+                    return res
+                cnt += 1
+    except Exception as e:
+        return Error({}, typ = "IOError", value = str(e))
+    return Number(value = cnt)
+def mapLines(m: mmap.mmap) -> Iterator[String]:
+    pos = 0; end = len(m)
+    while pos < end:
+        nxt = m.find(b"\n", pos)
+        if nxt == -1: nxt = end
+        yield String(value = m[pos:nxt].decode("utf8", errors = "replace"))
+        pos = nxt + 1
+def mapFind(m: mmap.mmap, sub: String | Regex, start: Number = Number(value = 0)) -> Number:
+    if isinstance(sub, Regex):
+        res = compileRegex(sub.value.encode("utf8")).search(m, int(start.value))
+        return Number(value = res.start() if res else -1)
+    return Number(value = m.find(sub.value.encode("utf8"), int(start.value)))
+def mapMatches(m: mmap.mmap, pattern: Regex) -> Iterator[String]:
+    for res in compileRegex(pattern.value.encode("utf8")).finditer(m):
+        yield String(value = res.group().decode("utf8", errors = "replace"))
+def mapFile(path: String) -> Table:
+    pth: str = Path(os.getcwd()) / path.value
+    try:
+        releaseWriter(str(pth))
+        with open(pth, "rb") as f:
+            m = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    except Exception as e:
+        return Error({}, typ = "IOError", value = str(e))
+    return Table(value = {
+        String(value = "len"): BuiltinClosure(fn = ioCall(lambda: Number(value = len(m)))),
+        String(value = "slice"): BuiltinClosure(fn = ioCall(lambda l, r: String(value = m[int(l.value):int(r.value)].decode("utf8", errors = "replace")))),
+        String(value = "find"): BuiltinClosure(fn = ioCall(lambda sub, start = Number(value = 0): mapFind(m, sub, start))),
+        String(value = "matches"): BuiltinClosure(fn = ioCall(lambda pattern: makeIterator(mapMatches(m, pattern)))),
+        String(value = "lines"): BuiltinClosure(fn = ioCall(lambda: makeIterator(mapLines(m)))),
+        String(value = "close"): BuiltinClosure(fn = ioCall(lambda: (m.close(), Nil())[-1]))
+    })
 Fs: Table = Table(value = {
     String(value = "readText"): BuiltinClosure(fn = lambda path: read(path, False)),
     String(value = "writeText"): BuiltinClosure(fn = lambda path, content, append = Number(value = 0): write(path, content, False, append = append)),
@@ -179,158 +456,404 @@ Fs: Table = Table(value = {
     String(value = "join"): BuiltinClosure(fn = join),
     String(value = "mkdir"): BuiltinClosure(fn = lambda path: (os.mkdir(srcPath / path.value), Nil())[-1]),
     String(value = "rmdir"): BuiltinClosure(fn = lambda path: (os.rmdir(srcPath / path.value), Nil())[-1]),
-    String(value = "fileSize"): BuiltinClosure(fn = lambda path: (os.path.getsize(srcPath / path.value, Nil()))[-1]),
-    String(value = "findFiles"): BuiltinClosure(fn = findFiles)
+    String(value = "fileSize"): BuiltinClosure(fn = fileSize),
+    String(value = "findFiles"): BuiltinClosure(fn = findFiles),
+    String(value = "open"): BuiltinClosure(fn = openFile),
+    String(value = "eachLine"): BuiltinClosure(fn = eachLine),
+    String(value = "mmap"): BuiltinClosure(fn = mapFile),
+    String(value = "writer"): BuiltinClosure(fn = openWriter),
+    String(value = "flush"): BuiltinClosure(fn = flushWriters)
 })
 
+def jsonValue(obj) -> Value:
+    # Objects arrive here already converted by jsonTable, only scalars and arrays are left
+    if isinstance(obj, str): return String(value = obj)
+    if isinstance(obj, (int, float)): return Number(value = obj)
+    if obj is None: return Nil()
+    if isinstance(obj, list):
+        res = Table({})
+        res.value = {Number(value = pos): jsonValue(item) for pos, item in enumerate(obj)}
+        res.size = len(obj)
+        return res
+    return obj
+def jsonTable(pairs: list) -> Table:
+    res = Table({})
+    res.value = {String(value = k): jsonValue(v) for k, v in pairs}
+    return res
+def decodeJson(text: str) -> Value:
+    return jsonValue(json.loads(text, object_pairs_hook = jsonTable))
+def jsonKey(key: Value) -> str:
+    if isinstance(key, String): return key.value
+    return str(makeObject(key))
+def jsonDefault(value: Value):
+    # Called by the json encoder for every Teeny value, Tables are expanded one level at a time
+    if isinstance(value, String): return value.value
+    if isinstance(value, Number):
+        v = value.value
+        return int(v) if isinstance(v, float) and v.is_integer() else v
+    if isinstance(value, Table):
+        items = value.value
+        for k in items:
+            if not isinstance(k, Number):
+                return {jsonKey(k): v for k, v in items.items()}
+        return list(items.values())
+    if isinstance(value, Nil): return None
+    return makeObject(value)
+def encodeJson(value: Value) -> str:
+    return json.dumps(value, default = jsonDefault)
 def encode(res: Table) -> String:
     try:
-        return String(value = json.dumps(makeObject(res)))
+        return String(value = encodeJson(res))
     except Exception as e:
         return Error({}, typ = "JsonError", value = str(e))
 def decode(res: String) -> Table:
     try:
-        return makeTable(json.loads(res.value))
+        return decodeJson(res.value)
     except Exception as e:
         return Error({}, typ = "JsonError", value = str(e))
+class JsonStream:
+    # Pulls the file in chunks and decodes one value at a time, the buffer only holds the value being decoded
+    def __init__(self, f, chunkSize: int = 65536) -> None:
+        self.f = f
+        self.chunkSize = chunkSize
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder(object_pairs_hook = jsonTable)
+    def fill(self) -> bool:
+        if self.eof: return False
+        chunk = self.f.read(self.chunkSize)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n": self.pos += 1
+            if self.pos < len(self.buf): return self.buf[self.pos]
+            if not self.fill(): raise ValueError("unexpected end of JSON input")
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise ValueError(f"expected '{ch}' but found '{self.buf[self.pos]}'")
+        self.pos += 1
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A value touching the end of the buffer (a number, say) may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof: raise
+            self.fill()
+    def find(self, segments: list[str]) -> None:
+        for seg in segments:
+            self.expect("{")
+            while True:
+                if self.peek() == "}":
+                    raise KeyError(f"key {seg} not found")
+                key = self.value()
+                self.expect(":")
+                if key == seg: break
+                self.value()
+                if self.peek() == ",": self.pos += 1
+    def items(self) -> Iterator[Value]:
+        self.expect("[")
+        if self.peek() == "]": return
+        while True:
+            yield jsonValue(self.value())
+            ch = self.peek()
+            self.pos += 1
+            if ch == "]": return
+            if ch != ",": raise ValueError(f"expected ',' or ']' but found '{ch}'")
+def streamItems(pth: str, segments: list[str]) -> Iterator[Value]:
+    with open(pth, "r", encoding = "utf8") as f:
+        reader = JsonStream(f)
+        reader.find(segments)
+        yield from reader.items()
+def streamLines(pth: str) -> Iterator[Value]:
+    with open(pth, "r", encoding = "utf8") as f:
+        for line in f:
+            if line.isspace(): continue
+            try:
+                yield decodeJson(line)
+            except Exception as e:
+                yield Error({}, typ = "JsonError", value = str(e))
+def jsonLines(path: String) -> Table:
+    pth = os.path.join(os.getcwd(), path.value)
+    releaseWriter(pth)
+    if not os.path.isfile(pth):
+        return Error({}, typ = "IOError", value = f"No such file: '{pth}'")
+    return makeIterator(streamLines(pth))
+def jsonStream(path: String, pathExpr: String = String(value = "")) -> Table:
+    pth = os.path.join(os.getcwd(), path.value)
+    releaseWriter(pth)
+    if not os.path.isfile(pth):
+        return Error({}, typ = "IOError", value = f"No such file: '{pth}'")
+    segments = [seg for seg in pathExpr.value.split(".") if seg not in ("", "$")]
+    return makeIterator(streamItems(pth, segments), "JsonError")
 Json: Table = Table(value = {
     String(value = "encode"): BuiltinClosure(fn = encode),
     String(value = "stringnify"): BuiltinClosure(fn = encode),
     String(value = "decode"): BuiltinClosure(fn = decode),
     String(value = "parse"): BuiltinClosure(fn = decode),
     String(value = "read"): Fs.get(String(value = "readJson")),
-    String(value = "write"): Fs.get(String(value = "writeJson"))
+    String(value = "write"): Fs.get(String(value = "writeJson")),
+    String(value = "lines"): BuiltinClosure(fn = jsonLines),
+    String(value = "stream"): BuiltinClosure(fn = jsonStream)
 })
 
-def HTTPGet(url: String, params: Table | Nil = Nil(), headers: Table | Nil = Nil()) -> Table:
-    urlString: str = url.value
+class LazyTable(Table):
+    # A Table whose `pending` fields are computed the first time they are read. Reading one field
+    # computes only that one, anything that walks the whole Table (keys, has, match, encode...)
+    # goes through `value` and computes the rest first. Pending keys hold nil in `fields` meanwhile
+    # so the key order stays the one given.
+    def __init__(self, value: dict, pending: dict[Value, Callable[[], Value]]) -> None:
+        self.pending = pending
+        self.pendingLock = threading.Lock()
+        super().__init__(value = value)
+    @property
+    def value(self) -> dict:
+        if self.pending:
+            self.compute(*self.pending)
+        return self.fields
+    @value.setter
+    def value(self, val: dict) -> None:
+        self.fields = val
+    def compute(self, *keys: Value) -> None:
+        with self.pendingLock:
+            for k in keys:
+                fn = self.pending.get(k)
+                if fn is None: continue
+                self.fields[k] = fn()
+                # Dropped only once stored, a concurrent reader waits on the lock instead of seeing nil
+                del self.pending[k]
+    def get(self, pos: Value) -> Value:
+        if pos in self.pending:
+            self.compute(pos)
+        res = self.fields.get(pos)
+        if res is not None and not isinstance(res, Nil):
+            return res
+        return Value.get(self, pos)
+
+def textChunks(r: requests.Response, size: int) -> Iterator[String]:
+    # Bytes are decoded here rather than by requests, which hands out raw bytes when the
+    # response names no charset. A character split across two chunks is kept for the next one.
     try:
-        r = requests.get(urlString, params = makeObject(params), headers = makeObject(headers), timeout=10)
-    except Exception as e:
-        return Error({}, typ = "HTTPError", value = str(e))
-    return Table(value = {
+        decoder = codecs.getincrementaldecoder(r.encoding or "utf-8")(errors = "replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors = "replace")
+    for chunk in r.iter_content(size):
+        text = decoder.decode(chunk)
+        if text: yield String(value = text)
+    tail = decoder.decode(b"", final = True)
+    if tail: yield String(value = tail)
+def makeResponse(r: requests.Response, callableJson: bool = False) -> Table:
+    # Only status is built up front, the body fields are decoded the first time a script reads them.
+    # Responses to anything but GET keep `json` as a closure, as they always had, decoding once too.
+    pending: dict[Value, Callable[[], Value]] = {
+        String(value = "content"): lambda: String(value = r.text),
+        String(value = "json"): lambda: responseJson(r),
+        String(value = "headers"): lambda: makeTable(dict(r.headers)),
+        String(value = "cookie"): lambda: makeTable(r.cookies.get_dict())
+    }
+    if callableJson:
+        del pending[String(value = "json")]
+    def chunks(size: Number = Number(value = 65536)) -> Table:
+        return makeIterator(textChunks(r, int(size.value)), "HTTPError")
+    @ioCall
+    def save(path: String, size: Number = Number(value = 65536)) -> Number:
+        written = 0
+        with open(os.path.join(os.getcwd(), path.value), "wb") as f:
+            for chunk in r.iter_content(int(size.value)):
+                f.write(chunk)
+                written += len(chunk)
+        return Number(value = written)
+    return LazyTable(value = {
         String(value = "status"): Number(value = r.status_code),
-        String(value = "headers"): makeTable(dict(r.headers)),
-        String(value = "content"): String(value = r.text),
-        String(value = 'json'): makeTable(r.json())
-    })
-def HTTPPost(url: String, data: Table, headers: Table | Nil = Nil(), cookies: Table | Nil = Nil()) -> Table:
-    urlString = url.value
+        String(value = "content"): Nil(),
+        String(value = "json"): BuiltinClosure(fn = functools.cache(lambda: responseJson(r))) if callableJson else Nil(),
+        String(value = "headers"): Nil(),
+        String(value = "cookie"): Nil(),
+        String(value = "chunks"): BuiltinClosure(fn = chunks),
+        String(value = "save"): BuiltinClosure(fn = save)
+    }, pending = pending)
+def responseJson(r: requests.Response) -> Value:
+    # A body that is not JSON reads as nil rather than failing the whole response
     try:
-        r = requests.post(urlString, json = makeObject(data), headers = makeObject(headers), \
-                          cookies = makeObject(cookies))
-    except Exception as e:
-        return Error({}, typ = "HTTPError", value = str(e))
-    return Table(value = {
-        String(value = "status"): Number(value = r.status_code),
-        String(value = "headers"): makeTable(dict(r.headers)),
-        String(value = "content"): String(value = r.text),
-        String(value = "cookie"): makeTable(r.cookies.get_dict()),
-        String(value = "json"): BuiltinClosure(fn = lambda: makeTable(r.json()))
-    })
-def HTTPPatch(url: String, data: Table, headers: Table) -> Table:
-    urlString = url.value
+        return decodeJson(r.text)
+    except ValueError:
+        return Nil()
+def HTTPRequest(client: HTTPClient, method: str, url: String, stream: Number, **kwargs) -> Table:
     try:
-        r = requests.patch(urlString, json = makeObject(data), headers = makeObject(headers))
-    except Exception as e:
-        return Error({}, typ = "HTTPError", value = str(e))
-    return Table(value = {
-        String(value = "status"): Number(value = r.status_code),
-        String(value = "headers"): makeTable(dict(r.headers)),
-        String(value = "content"): String(value = r.text)
-    })
-def HTTPPut(url: String, data: Table) -> Table:
-    urlString = url.value
-    try:
-        r = requests.put(urlString, json = makeObject(data))
+        r = client.request(method, url.value, stream = isTruthy(stream), **kwargs)
     except Exception as e:
         return Error({}, typ = "HTTPError", value = str(e))
+    return makeResponse(r, method != "GET")
+def HTTPGet(client: HTTPClient, url: String, params: Table | Nil = Nil(), headers: Table | Nil = Nil(),
+            stream: Number = Number(value = 0)) -> Table:
+    return HTTPRequest(client, "GET", url, stream, params = makeObject(params), headers = makeObject(headers))
+def HTTPPost(client: HTTPClient, url: String, data: Table, headers: Table | Nil = Nil(), cookies: Table | Nil = Nil(),
+             stream: Number = Number(value = 0)) -> Table:
+    return HTTPRequest(client, "POST", url, stream, json = makeObject(data), headers = makeObject(headers),
+                       cookies = makeObject(cookies))
+def HTTPPatch(client: HTTPClient, url: String, data: Table, headers: Table | Nil = Nil(),
+              stream: Number = Number(value = 0)) -> Table:
+    return HTTPRequest(client, "PATCH", url, stream, json = makeObject(data), headers = makeObject(headers))
+def HTTPPut(client: HTTPClient, url: String, data: Table, headers: Table | Nil = Nil(),
+            stream: Number = Number(value = 0)) -> Table:
+    return HTTPRequest(client, "PUT", url, stream, json = makeObject(data), headers = makeObject(headers))
+def HTTPDelete(client: HTTPClient, url: String, headers: Table | Nil = Nil(), stream: Number = Number(value = 0)) -> Table:
+    return HTTPRequest(client, "DELETE", url, stream, headers = makeObject(headers))
+def HTTPHead(client: HTTPClient, url: String, headers: Table | Nil = Nil()) -> Table:
+    return HTTPRequest(client, "HEAD", url, Number(value = 0), headers = makeObject(headers))
+def HTTPSend(client: HTTPClient, req: String | Table) -> Table:
+    # One entry of http.all, either a bare url or [method: ..., url: ..., data: ..., ...]
+    if isinstance(req, String):
+        return HTTPGet(client, req)
+    if not isinstance(req, Table):
+        return Error({}, typ = "HTTPError", value = "request must be a url or a Table")
+    field = lambda name: req.get(String(value = name))
+    method = field("method")
+    method = method.value.upper() if isinstance(method, String) else "GET"
+    url = field("url")
+    if not isinstance(url, String):
+        return Error({}, typ = "HTTPError", value = "request has no url")
+    data = field("data")
+    if isinstance(data, Nil): data = Table({})
+    match method:
+        case "GET": return HTTPGet(client, url, field("params"), field("headers"))
+        case "POST": return HTTPPost(client, url, data, field("headers"), field("cookies"))
+        case "PUT": return HTTPPut(client, url, data, field("headers"))
+        case "PATCH": return HTTPPatch(client, url, data, field("headers"))
+        case "DELETE": return HTTPDelete(client, url, field("headers"))
+        case "HEAD": return HTTPHead(client, url, field("headers"))
+    return Error({}, typ = "HTTPError", value = f"unknown method {method}")
+def asValError(val: Value) -> Value:
+    # An Error would abort whatever touches it, inside a batch it becomes a plain value instead
+    if isinstance(val, Error):
+        return ValError(typ = makeTable(val.typ), value = makeTable(val.value))
+    return val
+def batch(client: HTTPClient, reqs: list, concurrency: Number) -> Iterator[Table]:
+    # Requests run on a bounded thread pool, results come back in the order they were given
+    # and a failing request only turns its own slot into an Error
+    def send(req: Value) -> Table:
+        try:
+            return asValError(HTTPSend(client, req))
+        except Exception as e:
+            return ValError(typ = String(value = "HTTPError"), value = String(value = str(e)))
+    workers = max(1, min(int(concurrency.value), len(reqs) or 1))
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        yield from pool.map(send, reqs)
+def HTTPAll(client: HTTPClient, reqs: Table, concurrency: Number = Number(value = 8)) -> Table:
+    res = Table({})
+    for r in batch(client, reqs.toList(), concurrency):
+        res.append(r)
+    return res
+def HTTPMap(client: HTTPClient, urls: Table, fn: Closure | BuiltinClosure, concurrency: Number = Number(value = 8)) -> Table:
+    # fn runs on the calling thread as soon as its response is in, later requests keep going meanwhile
+    res = Table({})
+    for r in batch(client, urls.toList(), concurrency):
+        res.append(asValError(fn([r], [])))
+    return res
+def makeClient(opts: Table | Nil = Nil()) -> HTTPClient:
+    opts = makeObject(opts) or {}
+    return HTTPClient(poolSize = int(opts.get("poolSize", 10)), hosts = int(opts.get("hosts", 10)),
+                      retries = int(opts.get("retries", 0)), backoff = opts.get("backoff", 0),
+                      timeout = opts.get("timeout", 10), keepAlive = bool(opts.get("keepAlive", 1)),
+                      headers = {k: str(v) for k, v in opts.get("headers", {}).items()},
+                      sessions = int(opts.get("sessions", 16)), cache = makeCache(opts.get("cache")))
+def makeCache(opts: dict | int | None) -> ResponseCache | None:
+    # `cache: 1` keeps 256 responses in memory, `cache: [size: ..., dir: ...]` sizes it and adds a disk store
+    if not opts: return None
+    if not isinstance(opts, dict): opts = {}
+    path = opts.get("dir")
+    return ResponseCache(size = int(opts.get("size", 256)),
+                         path = os.path.join(os.getcwd(), path) if path else None)
+def HTTPCacheStats(client: HTTPClient) -> Table:
+    if client.cache is None:
+        return makeTable({"hits": 0, "misses": 0, "revalidations": 0, "entries": 0})
+    return makeTable(client.cache.stats())
+def HTTPCacheClear(client: HTTPClient) -> Nil:
+    if client.cache is not None:
+        client.cache.clear()
+    return Nil()
+def makeHttpClient(client: HTTPClient) -> Table:
     return Table(value = {
-        String(value = "status"): Number(value = r.status_code),
-        String(value = "headers"): makeTable(dict(r.headers)),
-        String(value = "content"): String(value = r.text),
-        String(value = "cookie"): makeTable(r.cookies.get_dict()),
-        String(value = "json"): BuiltinClosure(fn = lambda: makeTable(r.json()))
+        String(value = "get"): BuiltinClosure(fn = functools.partial(HTTPGet, client)),
+        String(value = "post"): BuiltinClosure(fn = functools.partial(HTTPPost, client)),
+        String(value = "patch"): BuiltinClosure(fn = functools.partial(HTTPPatch, client)),
+        String(value = "delete"): BuiltinClosure(fn = functools.partial(HTTPDelete, client)),
+        String(value = "put"): BuiltinClosure(fn = functools.partial(HTTPPut, client)),
+        String(value = "head"): BuiltinClosure(fn = functools.partial(HTTPHead, client)),
+        String(value = "all"): BuiltinClosure(fn = functools.partial(HTTPAll, client)),
+        String(value = "map"): BuiltinClosure(fn = functools.partial(HTTPMap, client)),
+        String(value = "cacheStats"): BuiltinClosure(fn = functools.partial(HTTPCacheStats, client)),
+        String(value = "clearCache"): BuiltinClosure(fn = functools.partial(HTTPCacheClear, client)),
+        String(value = "close"): BuiltinClosure(fn = lambda: (client.close(), Nil())[-1])
     })
-def HTTPDelete(url: String) -> Table:
-    urlString = url.value
+def HTTPClientNew(opts: Table | Nil = Nil()) -> Table:
     try:
-        r = requests.delete(urlString)
+        return makeHttpClient(makeClient(opts))
     except Exception as e:
         return Error({}, typ = "HTTPError", value = str(e))
-    return Table(value = {
-        String(value = "status"): Number(value = r.status_code),
-        String(value = "headers"): makeTable(dict(r.headers)),
-        String(value = "content"): String(value = r.text),
-        String(value = "cookie"): makeTable(r.cookies.get_dict()),
-        String(value = "json"): BuiltinClosure(fn = lambda: makeTable(r.json()))
+def makeRouter(router: Router, prefix: str = "") -> Table:
+    # Registering returns the router again so routes can be chained, a group shares the trie
+    res = Table({})
+    def route(method: String, path: String, fn: Closure | BuiltinClosure) -> Table:
+        try:
+            router.add(method.value.upper(), prefix + "/" + path.value.strip("/"), fn)
+        except ValueError as e:
+            return Error({}, typ = "HTTPError", value = str(e))
+        return res
+    def verb(method: str) -> BuiltinClosure:
+        return BuiltinClosure(fn = lambda path, fn: route(String(value = method), path, fn))
+    def notFound(fn: Closure | BuiltinClosure) -> Table:
+        router.fallback = fn
+        return res
+    res.value.update({
+        String(value = "get"): verb("GET"),
+        String(value = "post"): verb("POST"),
+        String(value = "put"): verb("PUT"),
+        String(value = "patch"): verb("PATCH"),
+        String(value = "delete"): verb("DELETE"),
+        String(value = "head"): verb("HEAD"),
+        String(value = "any"): verb("*"),
+        String(value = "route"): BuiltinClosure(fn = route),
+        String(value = "group"): BuiltinClosure(fn = lambda p: makeRouter(router, prefix + "/" + p.value.strip("/"))),
+        String(value = "notFound"): BuiltinClosure(fn = notFound),
+        String(value = "_call_"): BuiltinClosure(fn = router.dispatch)
     })
-def HTTPHead(url: String) -> Table:
-    urlString = url.value
+    return res
+def makeHandlerCache(opts: dict | int | None) -> HandlerCache | None:
+    # `cache = 1` keeps up to 64 MiB of responses, `cache = [size: bytes, vary: [...]]` sizes it and adds
+    # request headers to the key
+    if not opts: return None
+    if not isinstance(opts, dict): opts = {}
+    return HandlerCache(int(opts.get("size", 64 * 1024 * 1024)), [str(h) for h in opts.get("vary", [])])
+def HTTPListen(portNumber: Number, handlerFn: Closure, workers: Number = Number(value = 1),
+               engine: String = String(value = "thread"), maxConnections: Number = Number(value = 1024),
+               threads: Number = Number(value = 8), maxQueue: Number = Number(value = 64),
+               streamBody: Number = Number(value = 0), cache: Value = Nil()) -> Nil | Error:
+    options = {}
+    if engine.value == "async":
+        options["maxConnections"] = int(maxConnections.value)
     try:
-        r = requests.head(urlString)
-    except Exception as e:
+        serve(int(portNumber.value), handlerFn, int(workers.value), engine.value, int(threads.value),
+              int(maxQueue.value), bool(streamBody.value), makeHandlerCache(makeObject(cache)), **options)
+    except (OSError, ValueError) as e:
         return Error({}, typ = "HTTPError", value = str(e))
-    return Table(value = {
-        String(value = "status"): Number(value = r.status_code),
-        String(value = "headers"): makeTable(dict(r.headers)),
-        String(value = "content"): String(value = ""),
-        String(value = "cookie"): makeTable(r.cookies.get_dict()),
-        String(value = "json"): BuiltinClosure(fn = lambda: makeTable(r.json()))
-    })
-def HTTPListen(portNumber: Number, handlerFn: Closure):
-    port = portNumber.value
-    handler = lambda *x: handlerFn([makeTable(i) for i in x], [])
-    class Handler(BaseHTTPRequestHandler):
-        def handle_method(self):
-            length = int(self.headers.get("content-length", "0"))
-            body = self.rfile.read(length).decode("utf-8") if length else ""
-
-            req = {
-                "method": self.command,
-                "path": self.path,
-                "headers": dict(self.headers),
-                "body": body,
-            }
-
-            res = makeObject(handler(req))
-            status = res.get("status", 200)
-            headers = res.get("headers", {})
-            body = res.get("body", "")
-
-            if "json" in res:
-                body = json.dumps(res["json"])
-                headers["content-type"] = "application/json"
-
-            if not isinstance(body, bytes):
-                body = str(body).encode("utf-8")
-
-            self.send_response(status)
-
-            for k, v in headers.items():
-                self.send_header(k, str(v))
-
-            self.send_header("content-length", str(len(body)))
-            self.end_headers()
-            self.wfile.write(body)
-
-        def do_GET(self): self.handle_method()
-        def do_POST(self): self.handle_method()
-        def do_PUT(self): self.handle_method()
-        def do_PATCH(self): self.handle_method()
-        def do_DELETE(self): self.handle_method()
-        def do_HEAD(self): self.handle_method()
-
-    server = ThreadingHTTPServer(("0.0.0.0", int(port)), Handler)
-    server.serve_forever()
-Http: Table = Table(value = {
-    String(value = "get"): BuiltinClosure(fn = HTTPGet),
-    String(value = "post"): BuiltinClosure(fn = HTTPPost),
-    String(value = "patch"): BuiltinClosure(fn = HTTPPatch),
-    String(value = "delete"): BuiltinClosure(fn = HTTPDelete),
-    String(value = "put"): BuiltinClosure(fn = HTTPPut),
-    String(value = "head"): BuiltinClosure(fn = HTTPHead),
+    return Nil()
+Http: Table = makeHttpClient(defaultClient)
+Http.value.update({
+    String(value = "client"): BuiltinClosure(fn = HTTPClientNew),
     String(value = "listen"): BuiltinClosure(fn = HTTPListen),
+    String(value = "metrics"): BuiltinClosure(fn = lambda: makeTable(metrics.snapshot())),
+    String(value = "router"): BuiltinClosure(fn = lambda: makeRouter(Router())),
     String(value = "codes"): Table(value = {
         String(value = "ok"): Number(value = requests.codes.ok)
     })
@@ -338,6 +861,8 @@ Http: Table = Table(value = {
 
 def Run(command: String) -> String:
     try:
+        # The command may read files this process still has buffered
+        flushWriters()
         return String(value = subprocess.run(command.value.split(), capture_output = True, text = True).stdout)
     except Exception as e:
         return Error({}, typ = "OSError", value = str(e))
@@ -364,6 +889,7 @@ def setEnv(name: String, value: String) -> Nil:
     return Nil()
 Os: Table = Table(value = {
     String(value = "platform"): BuiltinClosure(fn = lambda: sys.platform),
+    String(value = "pid"): BuiltinClosure(fn = lambda: Number(value = os.getpid())),
     String(value = "run"): BuiltinClosure(fn = Run),
     String(value = "shell"): BuiltinClosure(fn = Run),
     String(value = "getEnv"): BuiltinClosure(fn = getEnv),
@@ -375,12 +901,151 @@ Time: Table = Table(value = {
     String(value = "sleep"): BuiltinClosure(fn = lambda t: [time.sleep(t.value), Nil()][-1])
 })
 
+def makeFuture(t: task.Task | aio.Pending) -> Table:
+    return Table(value = {
+        String(value = "await"): BuiltinClosure(fn = t.wait),
+        String(value = "done"): BuiltinClosure(fn = lambda: Number(value = int(t.done())))
+    })
+def spawn(fn: Value, *args: Value) -> Table:
+    return makeFuture(task.Task(fn, list(args)))
+def awaitAll(futures: Table) -> Table | Error:
+    # Results in the order of `futures`, the first Error met is returned instead
+    res = Table()
+    for f in futures.toList():
+        val = f.get(String(value = "await"))([], [])
+        if isinstance(val, Error):
+            return val
+        res.append(val)
+    return res
+def makeChannel(capacity: Number = Number(value = 16)) -> Table:
+    ch = task.Channel(int(capacity.value))
+    def send(value: Value) -> Nil | Error:
+        try:
+            ch.send(value)
+        except task.Closed as e:
+            return Error({}, typ = "ChannelError", value = str(e))
+        return Nil()
+    res = makeIterator(ch, "ChannelError")
+    res.value.update({
+        String(value = "send"): BuiltinClosure(fn = send),
+        String(value = "recv"): BuiltinClosure(fn = lambda: (lambda v: Nil() if v is None else v)(ch.recv())),
+        String(value = "close"): BuiltinClosure(fn = lambda: (ch.close(), Nil())[-1]),
+        String(value = "len"): BuiltinClosure(fn = lambda: Number(value = len(ch))),
+        String(value = "closed"): BuiltinClosure(fn = lambda: Number(value = int(ch.closed)))
+    })
+    return res
+def aioRequest(method: str, url: String, params: Table | Nil = Nil(), headers: Table | Nil = Nil(),
+               data: Table | Nil = Nil()) -> Table:
+    pending = aio.Pending(aio.defaultHTTP.request(method, url.value, makeObject(params), makeObject(headers),
+                                                  None if isinstance(data, Nil) else makeObject(data)),
+                          makeResponse, "HTTPError")
+    return makeFuture(pending)
+def aioSleep(t: Number) -> Table:
+    return makeFuture(aio.Pending(asyncio.sleep(t.value), lambda _: Nil()))
+def aioRun(command: String) -> Table:
+    # Flushed before the command starts, as os.run does, it may read what was appended
+    flushWriters()
+    return makeFuture(aio.Pending(aio.runCommand(command.value.split()), lambda out: String(value = out), "OSError"))
+def aioRead(path: String) -> Table:
+    pth = str(Path(os.getcwd()) / path.value)
+    releaseWriter(pth)
+    return makeFuture(aio.Pending(aio.readFile(pth), lambda text: String(value = text)))
+def Await(value: Value) -> Value:
+    # Futures are waited for, anything else is already a value
+    if isinstance(value, Table) and isinstance(value.value.get(String(value = "await")), BuiltinClosure):
+        return value.value[String(value = "await")]([], [])
+    return value
+def Async(fn: Value) -> BuiltinClosure:
+    # Calls of the result start fn as a task and return its future
+    return BuiltinClosure(fn = lambda *args: spawn(fn, *args))
+Aio: Table = Table(value = {
+    String(value = "get"): BuiltinClosure(fn = lambda url, params = Nil(), headers = Nil(): aioRequest("GET", url, params, headers)),
+    String(value = "post"): BuiltinClosure(fn = lambda url, data, headers = Nil(): aioRequest("POST", url, Nil(), headers, data)),
+    String(value = "put"): BuiltinClosure(fn = lambda url, data, headers = Nil(): aioRequest("PUT", url, Nil(), headers, data)),
+    String(value = "patch"): BuiltinClosure(fn = lambda url, data, headers = Nil(): aioRequest("PATCH", url, Nil(), headers, data)),
+    String(value = "delete"): BuiltinClosure(fn = lambda url, headers = Nil(): aioRequest("DELETE", url, Nil(), headers)),
+    String(value = "head"): BuiltinClosure(fn = lambda url, headers = Nil(): aioRequest("HEAD", url, Nil(), headers)),
+    String(value = "sleep"): BuiltinClosure(fn = aioSleep),
+    String(value = "run"): BuiltinClosure(fn = aioRun),
+    String(value = "read"): BuiltinClosure(fn = aioRead)
+})
+def asyncEnv(outer: Env) -> Env:
+    # Async mode: http verbs, time.sleep, fs.readText and os.run return futures driven by the event
+    # loop, `await` waits for one and `async(fn)` makes fn start as a task. The overrides live in a
+    # child env, the modules themselves are left untouched for scripts in normal mode.
+    env = Env(outer = outer)
+    overlay = lambda module, names: Table(value = {**module.value, **{String(value = n): Aio.value[String(value = a)]
+                                                                      for n, a in names.items()}})
+    env.update({
+        "http": overlay(Http, {v: v for v in ("get", "post", "put", "patch", "delete", "head")}),
+        "time": overlay(Time, {"sleep": "sleep"}),
+        "fs": overlay(Fs, {"readText": "read"}),
+        "os": overlay(Os, {"run": "run", "shell": "run"}),
+        "await": BuiltinClosure(fn = Await),
+        "async": BuiltinClosure(fn = Async)
+    })
+    return env
+Task: Table = Table(value = {
+    String(value = "spawn"): BuiltinClosure(fn = spawn),
+    String(value = "all"): BuiltinClosure(fn = awaitAll),
+    String(value = "chan"): BuiltinClosure(fn = makeChannel)
+})
+
+Shm: Table = Table(value = {
+    String(value = "share"): BuiltinClosure(fn = shm.share),
+    String(value = "attach"): BuiltinClosure(fn = shm.attach)
+})
+
+def ttlOf(ttl: Value) -> float | None:
+    return ttl.value if isinstance(ttl, Number) else None
+def makeNamedCache(c: cache.Cache) -> Table:
+    def get(key: Value) -> Value:
+        res = c.get(key)
+        return Nil() if res is None else res
+    def setKey(key: Value, value: Value, ttl: Value = Nil()) -> Value:
+        c.set(key, value, ttlOf(ttl))
+        return value
+    return Table(value = {
+        String(value = "name"): String(value = c.name),
+        String(value = "get"): BuiltinClosure(fn = get),
+        String(value = "set"): BuiltinClosure(fn = setKey),
+        String(value = "has"): BuiltinClosure(fn = lambda key: Number(value = int(c.has(key)))),
+        String(value = "delete"): BuiltinClosure(fn = lambda key: Number(value = int(c.delete(key)))),
+        String(value = "getOrCompute"): BuiltinClosure(fn = lambda key, fn, ttl = Nil(): c.getOrCompute(key, fn, ttlOf(ttl))),
+        String(value = "len"): BuiltinClosure(fn = lambda: Number(value = len(c))),
+        String(value = "stats"): BuiltinClosure(fn = lambda: makeTable(c.stats())),
+        String(value = "clear"): BuiltinClosure(fn = lambda: (c.clear(), Nil())[-1])
+    })
+def namedCache(name: String, max: Number = Number(value = 1024), bytes: Number = Number(value = 0), ttl: Number = Number(value = 0)) -> Table:
+    return makeNamedCache(cache.named(name.value, int(max.value), int(bytes.value), ttl.value))
+Cache: Table = Table(value = {
+    String(value = "named"): BuiltinClosure(fn = namedCache),
+    String(value = "drop"): BuiltinClosure(fn = lambda name: Number(value = int(cache.drop(name.value)))),
+    String(value = "stats"): BuiltinClosure(fn = lambda: makeTable(cache.allStats()))
+})
+
+def runtimeStats() -> Table:
+    return makeTable(counters.stats())
+Runtime: Table = Table(value = {
+    String(value = "stats"): BuiltinClosure(fn = runtimeStats),
+    String(value = "reset"): BuiltinClosure(fn = lambda: (counters.reset(), Nil())[-1])
+})
+
 def compose2(f, g) -> Callable:
     return lambda *a, **kw: f([g([*a], kw)], [])
 def Compose(*args) -> Callable:
     return BuiltinClosure(fn = functools.reduce(compose2, args))
+def Memo(fn: Value, max: Number = Number(value = 256), ttl: Number = Number(value = 0)) -> Table:
+    # A callable Table: calling it calls fn once per distinct arguments
+    m = memo.Memo(fn, int(max.value), ttl.value)
+    return Table(value = {
+        String(value = "_call_"): BuiltinClosure(fn = m),
+        String(value = "stats"): BuiltinClosure(fn = lambda: makeTable(m.stats())),
+        String(value = "clear"): BuiltinClosure(fn = lambda: (m.clear(), Nil())[-1])
+    })
 Func: Table = Table(value = {
-    String(value = "compose"): BuiltinClosure(fn = Compose)
+    String(value = "compose"): BuiltinClosure(fn = Compose),
+    String(value = "memo"): BuiltinClosure(fn = Memo)
 })
 
 def filter(table: Table, func: Value) -> Table:
@@ -395,6 +1060,10 @@ def table(*args, **kwargs):
     for i in args:
         res.append(i)
     return res
+def pmap(table: Table, func: Value, workers: Number = Number(value = 0), chunk: Number = Number(value = 0)) -> Table | Error:
+    return parallel.pmap(table, func, int(workers.value) or None, int(chunk.value) or None)
+def pfilter(table: Table, func: Value, workers: Number = Number(value = 0), chunk: Number = Number(value = 0)) -> Table | Error:
+    return parallel.pfilter(table, func, int(workers.value) or None, int(chunk.value) or None)
 def Zip(table1: Table, table2: Table) -> Table:
     l1 = table1.toList(); l2 = table2.toList()
     return makeTable(list(zip(l1, l2)))
@@ -403,6 +1072,8 @@ Tab: Table = Table(value = {
     String(value = "filter"): BuiltinClosure(fn = filter),
     String(value = "map"): BuiltinClosure(fn = map),
     String(value = "reduce"): BuiltinClosure(fn = reduce),
+    String(value = "pmap"): BuiltinClosure(fn = pmap),
+    String(value = "pfilter"): BuiltinClosure(fn = pfilter),
     String(value = "zip"): BuiltinClosure(fn = Zip)
 })
 
@@ -439,7 +1110,10 @@ def dynamicImport(file_path: str):
     sys.modules[module_name] = module
     spec.loader.exec_module(module)
     return module.getGlobal()
-cachedModules = {}
+# Imported modules run once per process, in their own globals; threads importing the same file at
+# once may both run it, the first result is the one everyone keeps
+cachedModules: dict[str, Value] = {}
+cachedModulesLock = threading.Lock()
 def Import(name: String, type: String = String(value = "teeny")) -> Table:
     if type.value == "python":
         mod = importlib.import_module(name.value)
@@ -457,14 +1131,17 @@ def Import(name: String, type: String = String(value = "teeny")) -> Table:
             if not os.path.isfile(gPth):
                 return Error({}, typ = "Import Error", value = f"Module {name.value} not found")
             pth = gPth
-    if pth in cachedModules:
-        return cachedModules[pth]
+    with cachedModulesLock:
+        if pth in cachedModules:
+            counters.moduleHits += 1
+            return cachedModules[pth]
+    counters.moduleLoads += 1
     code = open(pth).read()
     from teeny.runner import run
     res = run(code)
     val = res.get("export")
-    cachedModules[pth] = val
-    return val
+    with cachedModulesLock:
+        return cachedModules.setdefault(pth, val)
 
 def Mix(table: Table, env: Env) -> Nil:
     for key in table.value.keys():
@@ -496,10 +1173,15 @@ def evaluate(code: String, env: Table = Table()) -> Value:
     res = run_code(code.value, print_each = False, print_res = False, is_file = False, defEnv = envObj)
     return res
 
+def module(table: Table) -> Table:
+    # Each global env gets its own copy of a standard library table, so `math.x = 1` in one
+    # interpreter is not seen by another; the builtins inside are stateless and shared
+    return Table(value = dict(table.value), size = table.size)
+
 def makeGlobal() -> Env:
     gEnv = Env()
     gEnv.update({
-        "math": Math,
+        "math": module(Math),
         "print": BuiltinClosure(fn = Print),
         "println": BuiltinClosure(fn = lambda *x: Print(*x, "\n")),
         "printmd": BuiltinClosure(fn = lambda *x: rprint(Markdown(' '.join([i.toString().value for i in x])))),
@@ -511,16 +1193,21 @@ def makeGlobal() -> Env:
         "mix": BuiltinClosure(fn = Mix, hasEnv = True),
         "include": BuiltinClosure(fn = lambda name, env: Mix(Import(name), env), hasEnv = True),
         "range": BuiltinClosure(fn = lambda l, r, step = Number(value = 1): makeTable(list(range(int(l.value), int(r.value), int(step.value))))),
-        "error": Err,
-        "fs": Fs,
-        "table": Tab,
-        "json": Json,
-        "http": Http,
-        "os": Os,
-        "time": Time,
+        "error": module(Err),
+        "fs": module(Fs),
+        "table": module(Tab),
+        "json": module(Json),
+        "http": module(Http),
+        "os": module(Os),
+        "time": module(Time),
+        "task": module(Task),
+        "aio": module(Aio),
+        "shm": module(Shm),
+        "cache": module(Cache),
+        "runtime": module(Runtime),
         "argv": makeTable(sys.argv[1:]),
-        "func": Func,
-        "benchmark": Benchmark,
+        "func": module(Func),
+        "benchmark": module(Benchmark),
         "type": BuiltinClosure(fn = getType),
         "copy": BuiltinClosure(fn = copy),
         "string": BuiltinClosure(fn = lambda x: x.toString()),
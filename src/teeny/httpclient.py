@@ -0,0 +1,269 @@
+import queue
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from http.cookiejar import CookiePolicy
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (502, 503, 504)
+
+class NoCookies(CookiePolicy):
+    # Scripts pass cookies explicitly, a pooled session must not replay what an earlier call received
+    netscape = True
+    rfc2965 = hide_cookie2 = False
+    def set_ok(self, cookie, request) -> bool:
+        return False
+    def return_ok(self, cookie, request) -> bool:
+        return False
+    def domain_return_ok(self, domain, request) -> bool:
+        return False
+    def path_return_ok(self, path, request) -> bool:
+        return False
+
+# Requests carrying these are answered for one user, the cache is shared by every caller of the client
+CREDENTIALS = ("Authorization", "Cookie", "Proxy-Authorization")
+
+def freshness(headers) -> float | None:
+    # Seconds the response may be served without asking the server, None when it must not be stored
+    control = [d.strip().lower() for d in headers.get("Cache-Control", "").split(",") if d.strip()]
+    if "no-store" in control or "private" in control or headers.get("Vary", "").strip() == "*":
+        return None
+    if "no-cache" in control:
+        return 0
+    for d in control:
+        if d.startswith("max-age="):
+            try:
+                return max(0, int(d[8:]))
+            except ValueError:
+                return 0
+    if "Expires" in headers:
+        try:
+            return max(0, parsedate_to_datetime(headers["Expires"]).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0
+    if "ETag" in headers or "Last-Modified" in headers:
+        return 0
+    return None
+
+def varied(headers, sent) -> dict:
+    # The request headers the response says it depends on, by lowercase name
+    names = [n.strip().lower() for n in headers.get("Vary", "").split(",") if n.strip()]
+    return {n: str(sent.get(n, "")) for n in names}
+
+class CacheEntry:
+    # `vary` holds the request headers named by the response's Vary, a request must send the same to reuse it
+    def __init__(self, url: str, status: int, headers: dict, body: bytes, encoding: str | None, expires: float,
+                 vary: dict | None = None) -> None:
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.encoding = encoding
+        self.expires = expires
+        self.vary = vary or {}
+    def fresh(self) -> bool:
+        return time.time() < self.expires
+    def matches(self, sent) -> bool:
+        return all(str(sent.get(n, "")) == v for n, v in self.vary.items())
+    def validators(self) -> dict:
+        res = {}
+        if "ETag" in self.headers: res["If-None-Match"] = self.headers["ETag"]
+        if "Last-Modified" in self.headers: res["If-Modified-Since"] = self.headers["Last-Modified"]
+        return res
+    def toResponse(self) -> requests.Response:
+        # A new one for every caller, so what one caller does to its response is not seen by the next
+        r = requests.Response()
+        r.status_code = self.status
+        r.headers = CaseInsensitiveDict(self.headers)
+        r._content = self.body
+        r.encoding = self.encoding
+        r.url = self.url
+        return r
+
+class ResponseCache:
+    # An LRU of GET responses keyed by the full url, one variant per url: a request whose Vary headers
+    # differ from the stored entry's is a miss and its response replaces the entry. Mirrored to `path`
+    # when given so it survives restarts.
+    def __init__(self, size: int = 256, path: str | None = None) -> None:
+        self.size = size
+        self.path = path
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.revalidations = 0
+        if path:
+            os.makedirs(path, exist_ok = True)
+
+    def filename(self, url: str) -> str:
+        return os.path.join(self.path, hashlib.sha256(url.encode()).hexdigest())
+    def lookup(self, url: str) -> CacheEntry | None:
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                self.entries.move_to_end(url)
+                return entry
+        entry = self.load(url) if self.path else None
+        if entry is not None:
+            self.remember(url, entry)
+        return entry
+    def remember(self, url: str, entry: CacheEntry) -> None:
+        with self.lock:
+            self.entries[url] = entry
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last = False)
+    def store(self, url: str, r: requests.Response, sent) -> None:
+        ttl = freshness(r.headers) if r.status_code == 200 else None
+        if ttl is None:
+            return
+        entry = CacheEntry(url, r.status_code, dict(r.headers), r.content, r.encoding, time.time() + ttl, varied(r.headers, sent))
+        self.remember(url, entry)
+        if self.path:
+            self.save(url, entry)
+    def refresh(self, url: str, entry: CacheEntry, r: requests.Response) -> None:
+        # A 304 carries the new freshness and possibly new validators, the body stays
+        for k in ("Cache-Control", "Expires", "ETag", "Last-Modified", "Date"):
+            if k in r.headers: entry.headers[k] = r.headers[k]
+        entry.expires = time.time() + (freshness(entry.headers) or 0)
+        if self.path:
+            self.save(url, entry)
+
+    def load(self, url: str) -> CacheEntry | None:
+        name = self.filename(url)
+        try:
+            with open(name + ".json", encoding = "utf8") as f:
+                meta = json.load(f)
+            with open(name + ".body", "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(url, meta["status"], meta["headers"], body, meta["encoding"], meta["expires"], meta.get("vary"))
+    def save(self, url: str, entry: CacheEntry) -> None:
+        # Written aside and renamed so a concurrent reader never sees half an entry
+        name = self.filename(url)
+        try:
+            with open(name + ".body.tmp", "wb") as f:
+                f.write(entry.body)
+            os.replace(name + ".body.tmp", name + ".body")
+            with open(name + ".json.tmp", "w", encoding = "utf8") as f:
+                json.dump({"status": entry.status, "headers": entry.headers, "encoding": entry.encoding,
+                           "expires": entry.expires, "vary": entry.vary}, f)
+            os.replace(name + ".json.tmp", name + ".json")
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "revalidations": self.revalidations,
+                    "entries": len(self.entries)}
+    def count(self, name: str) -> None:
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.revalidations = 0
+        if self.path:
+            for name in os.listdir(self.path):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+class HTTPClient:
+    # A pool of requests.Session objects sharing one configuration, each session keeps its own
+    # keep-alive connections so concurrent callers never share one
+    def __init__(self, poolSize: int = 10, hosts: int = 10, retries: int = 0, backoff: float = 0,
+                 timeout: float = 10, keepAlive: bool = True, headers: dict | None = None, sessions: int = 16,
+                 cache: ResponseCache | None = None) -> None:
+        self.poolSize = poolSize
+        self.hosts = hosts
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.keepAlive = keepAlive
+        self.headers = headers or {}
+        self.idle: queue.LifoQueue[requests.Session] = queue.LifoQueue(maxsize = sessions)
+        self.closed = False
+        self.cache = cache
+
+    def newSession(self) -> requests.Session:
+        session = requests.Session()
+        session.cookies.set_policy(NoCookies())
+        # Every method is retried, on connection errors and on the statuses of an overloaded upstream
+        retry = Retry(total = self.retries, backoff_factor = self.backoff, allowed_methods = None,
+                      status_forcelist = RETRY_STATUSES, raise_on_status = False)
+        adapter = HTTPAdapter(pool_connections = self.hosts, pool_maxsize = self.poolSize, max_retries = retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(self.headers)
+        if not self.keepAlive:
+            session.headers["Connection"] = "close"
+        return session
+    def acquire(self) -> requests.Session:
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return self.newSession()
+    def release(self, session: requests.Session) -> None:
+        if self.closed:
+            session.close()
+            return
+        try:
+            self.idle.put_nowait(session)
+        except queue.Full:
+            session.close()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        if self.cache is not None and method == "GET" and not kwargs.get("stream"):
+            return self.cachedGet(url, **kwargs)
+        return self.send(method, url, **kwargs)
+    def send(self, method: str, url: str, **kwargs) -> requests.Response:
+        session = self.acquire()
+        try:
+            r = session.request(method, url, **kwargs)
+            if not self.keepAlive and not kwargs.get("stream"):
+                # Servers rarely echo "Connection: close", drop the pooled socket so it is not reused
+                session.close()
+            return r
+        finally:
+            self.release(session)
+    def cachedGet(self, url: str, **kwargs) -> requests.Response:
+        # Fresh entries skip the network, stale ones are revalidated and a 304 reuses the stored response.
+        # Requests with credentials neither read nor fill the cache.
+        sent = CaseInsensitiveDict({**self.headers, **(kwargs.get("headers") or {})})
+        if kwargs.get("cookies") or kwargs.get("auth") or any(h in sent for h in CREDENTIALS):
+            return self.send("GET", url, **kwargs)
+        key = requests.Request("GET", url, params = kwargs.get("params")).prepare().url
+        entry = self.cache.lookup(key)
+        if entry is not None and not entry.matches(sent):
+            entry = None
+        if entry is not None:
+            if entry.fresh():
+                self.cache.count("hits")
+                return entry.toResponse()
+            kwargs["headers"] = {**entry.validators(), **(kwargs.get("headers") or {})}
+        r = self.send("GET", url, **kwargs)
+        if r.status_code == 304 and entry is not None:
+            self.cache.count("revalidations")
+            self.cache.refresh(key, entry, r)
+            return entry.toResponse()
+        self.cache.count("misses")
+        self.cache.store(key, r, sent)
+        return r
+    def close(self) -> None:
+        self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+defaultClient: HTTPClient = HTTPClient()
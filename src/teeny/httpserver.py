@@ -0,0 +1,831 @@
+import io
+import os
+import json
+import time
+import signal
+import socket
+import asyncio
+import threading
+import functools
+import gzip
+import hashlib
+import mimetypes
+from collections import deque, OrderedDict
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, Future
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote
+from teeny.value import Value, Closure, Table, String, Nil, makeTable, makeObject, Error, isolate
+
+def respond(handlerFn: Closure, method: str, path: str, headers: dict, body: str | io.TextIOBase,
+            cache: "HandlerCache | None" = None) -> tuple[int, dict, "bytes | FileBody | StreamBody"]:
+    # Shared by both engines: runs the Teeny handler and turns its Table into status, headers and body.
+    # Every request gets its own child of the closure env, so assignments stay local to the request
+    if isinstance(handlerFn, Closure):
+        handlerFn = isolate(handlerFn)
+    req = makeTable({"method": method, "path": path, "headers": headers, "body": ""})
+    if not isinstance(body, str):
+        from teeny.glob import makeFileHandle
+        body = makeFileHandle(body)
+    req.define(String(value = "body"), body if isinstance(body, Table) else String(value = body))
+    res = handlerFn([req], [])
+    source = res.get(String(value = "stream")) if isinstance(res, Table) else Nil()
+    if isinstance(res, Error):
+        res = {"status": 500, "body": res.toString().value}
+    else:
+        res = makeObject(res)
+        if not isinstance(res, dict):
+            res = {"body": res}
+    status = res.get("status", 200)
+    resHeaders = res.get("headers", {})
+    body = res.get("body", "")
+
+    if not isinstance(source, Nil):
+        return int(status), resHeaders, StreamBody(source)
+    if "file" in res:
+        return fileReply(str(res["file"]), int(status), resHeaders, headers, bool(res.get("gzip")))
+
+    if "json" in res:
+        body = json.dumps(res["json"])
+        resHeaders["content-type"] = "application/json"
+
+    if not isinstance(body, bytes):
+        body = str(body).encode("utf-8")
+    if res.get("gzip") and body and acceptsGzip(headers):
+        body = gzip.compress(body, 6)
+        resHeaders["content-encoding"] = "gzip"
+        resHeaders["vary"] = "Accept-Encoding"
+    if cache is not None and res.get("cache") and int(status) == 200 and method in ("GET", "HEAD"):
+        etag = cache.store(method, path, headers, float(res["cache"]), resHeaders, body)
+        if cache.matches(headers, etag):
+            return 304, {"etag": etag}, b""
+    return int(status), resHeaders, body
+
+class FileBody:
+    # A byte range of a file, the engines hand it to sendfile instead of reading it into memory
+    def __init__(self, path: str, offset: int, count: int) -> None:
+        self.path = path
+        self.offset = offset
+        self.count = count
+    def __len__(self) -> int:
+        return self.count
+
+class StreamBody:
+    # The chunks of a `stream` response, pulled one at a time from a Teeny iterator or from a
+    # closure called until it returns nil. Nothing is produced before the engine asks for it.
+    def __init__(self, source: Value) -> None:
+        self.source = source
+    def __iter__(self) -> Iterator[bytes]:
+        if isinstance(self.source, Table):
+            nxt = self.source.get(String(value = "_iter_"))([], [])
+            step = lambda: (lambda i: i if isinstance(i, Nil) else self.source.take(i))(nxt([], []))
+        else:
+            step = lambda: self.source([], [])
+        while True:
+            item = step()
+            if isinstance(item, Nil):
+                return
+            if isinstance(item, Error):
+                # The status is already sent, the engine drops the connection so the client sees a cut body
+                raise RuntimeError(item.toString().value)
+            data = item.value if isinstance(item, String) else item.toString().value
+            if data:
+                yield data.encode("utf-8")
+
+class BodyReader(io.RawIOBase):
+    # The request body as a binary file over the connection: `length` bytes, or the chunks of a
+    # chunked body decoded as they arrive. `read` and `readline` read the connection itself, so
+    # nothing past the body is consumed and the next request on the connection stays intact.
+    def __init__(self, read: Callable[[int], bytes], readline: Callable[[], bytes], length: int = 0,
+                 chunked: bool = False, limit: int | None = None) -> None:
+        self.readRaw = read
+        self.readLine = readline
+        self.chunked = chunked
+        self.left = 0 if chunked else length
+        self.finished = not chunked and length == 0
+        self.limit = limit
+        self.total = 0
+
+    def readable(self) -> bool:
+        return True
+    def readinto(self, buf) -> int:
+        if self.left == 0 and not self.finished:
+            self.nextChunk()
+        if self.finished:
+            return 0
+        data = self.readRaw(min(len(buf), self.left))
+        if not data:
+            raise ConnectionError("connection closed inside the request body")
+        buf[:len(data)] = data
+        self.left -= len(data)
+        if self.left == 0:
+            if self.chunked:
+                self.readLine()
+            else:
+                self.finished = True
+        return len(data)
+    def nextChunk(self) -> None:
+        line = self.readLine()
+        if not line:
+            raise ConnectionError("connection closed inside the request body")
+        size = int(line.split(b";", 1)[0].strip(), 16)
+        if size == 0:
+            # Trailer fields are read and ignored up to the blank line ending the body
+            while self.readLine() not in (b"\r\n", b"\n", b""):
+                pass
+            self.finished = True
+            return
+        self.total += size
+        if self.limit is not None and self.total > self.limit:
+            raise ValueError("request body too large")
+        self.left = size
+
+def textStream(reader: BodyReader) -> io.TextIOWrapper:
+    return io.TextIOWrapper(io.BufferedReader(reader), encoding = "utf-8", errors = "replace")
+
+class GzipCache:
+    # Compressed copies of served files keyed by path, mtime and size, so an edited file is
+    # compressed again while an unchanged one never is. Bounded by the total compressed bytes.
+    def __init__(self, maxBytes: int = 64 * 1024 * 1024) -> None:
+        self.maxBytes = maxBytes
+        self.size = 0
+        self.entries: OrderedDict[tuple, bytes] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path: str, st: os.stat_result) -> bytes:
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        with open(path, "rb") as f:
+            data = gzip.compress(f.read(), 6)
+        with self.lock:
+            if key not in self.entries and len(data) <= self.maxBytes:
+                self.entries[key] = data
+                self.size += len(data)
+                while self.size > self.maxBytes:
+                    self.size -= len(self.entries.popitem(last = False)[1])
+        return data
+
+gzipCache: GzipCache = GzipCache()
+
+class HandlerCache:
+    # Responses of http.listen handlers that returned `cache: seconds`, keyed by method, path, whether
+    # the client takes gzip and the `vary` request headers. A hit is answered from here without queueing
+    # for a handler thread. LRU bounded by the total bytes of the stored bodies.
+    def __init__(self, maxBytes: int = 64 * 1024 * 1024, vary: list[str] | None = None) -> None:
+        self.maxBytes = maxBytes
+        self.vary = [h.lower() for h in vary or []]
+        self.size = 0
+        self.entries: OrderedDict[tuple, tuple[float, dict, bytes, str]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def key(self, method: str, path: str, headers: dict) -> tuple:
+        lower = {k.lower(): v for k, v in headers.items()}
+        return (method, path, acceptsGzip(headers)) + tuple(lower.get(h, "") for h in self.vary)
+    def matches(self, headers: dict, etag: str) -> bool:
+        tags = next((v for k, v in headers.items() if k.lower() == "if-none-match"), "")
+        return any(t.strip() in ("*", etag) for t in tags.split(",")) if tags else False
+    def lookup(self, method: str, path: str, headers: dict) -> tuple[int, dict, bytes] | None:
+        if method not in ("GET", "HEAD"):
+            return None
+        key = self.key(method, path, headers)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self.size -= len(self.entries.pop(key)[2])
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        _, resHeaders, body, etag = entry
+        if self.matches(headers, etag):
+            return 304, {"etag": etag}, b""
+        return 200, dict(resHeaders), body
+    def store(self, method: str, path: str, headers: dict, ttl: float, resHeaders: dict, body: bytes) -> str:
+        # Returns the ETag, a hash of the body, which is also set on the response
+        etag = '"' + hashlib.blake2b(body, digest_size = 12).hexdigest() + '"'
+        resHeaders["etag"] = etag
+        if ttl <= 0 or len(body) > self.maxBytes:
+            return etag
+        key = self.key(method, path, headers)
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key)[2])
+            self.entries[key] = (time.monotonic() + ttl, dict(resHeaders), body, etag)
+            self.size += len(body)
+            while self.size > self.maxBytes:
+                self.size -= len(self.entries.popitem(last = False)[1][2])
+        return etag
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries), "bytes": self.size}
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = self.hits = self.misses = 0
+
+def acceptsGzip(headers: dict) -> bool:
+    return any(k.lower() == "accept-encoding" and "gzip" in v.lower() for k, v in headers.items())
+
+def fileReply(path: str, status: int, resHeaders: dict, headers: dict, compress: bool) -> tuple[int, dict, bytes | FileBody]:
+    path = os.path.join(os.getcwd(), path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return 404, {}, b"not found"
+    if not os.path.isfile(path):
+        return 404, {}, b"not found"
+    lower = {k.lower(): v for k, v in headers.items()}
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    resHeaders.setdefault("content-type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+    resHeaders["last-modified"] = formatdate(st.st_mtime, usegmt = True)
+    resHeaders["accept-ranges"] = "bytes"
+
+    # If-None-Match wins over If-Modified-Since when both are sent
+    if "if-none-match" in lower:
+        tags = [t.strip() for t in lower["if-none-match"].split(",")]
+        if "*" in tags or etag in tags or etag[:-1] + '-gz"' in tags:
+            return 304, {"etag": etag, "last-modified": resHeaders["last-modified"]}, b""
+    elif "if-modified-since" in lower:
+        try:
+            if int(st.st_mtime) <= parsedate_to_datetime(lower["if-modified-since"]).timestamp():
+                return 304, {"etag": etag, "last-modified": resHeaders["last-modified"]}, b""
+        except (TypeError, ValueError):
+            pass
+
+    wanted = lower.get("range", "")
+    if wanted and lower.get("if-range", etag) not in (etag, resHeaders["last-modified"]):
+        wanted = ""
+    if wanted:
+        span = byteRange(wanted, st.st_size)
+        if span is None:
+            return 416, {"content-range": f"bytes */{st.st_size}"}, b""
+        if span:
+            start, end = span
+            resHeaders["etag"] = etag
+            resHeaders["content-range"] = f"bytes {start}-{end}/{st.st_size}"
+            return 206, resHeaders, FileBody(path, start, end - start + 1)
+
+    if compress and acceptsGzip(headers):
+        resHeaders["etag"] = etag[:-1] + '-gz"'
+        resHeaders["content-encoding"] = "gzip"
+        resHeaders["vary"] = "Accept-Encoding"
+        return status, resHeaders, gzipCache.get(path, st)
+    resHeaders["etag"] = etag
+    return status, resHeaders, FileBody(path, 0, st.st_size)
+
+def byteRange(header: str, size: int) -> tuple[int, int] | None | bool:
+    # One "bytes=a-b", "bytes=a-" or "bytes=-n" range. None when it cannot be satisfied, False when
+    # the header is something else (several ranges, other units) and the whole file is sent
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return False
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            n = int(last)
+            if n <= 0: return None
+            return max(0, size - n), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return False
+    if start >= size or end < start:
+        return None
+    return start, end
+
+class Metrics:
+    # Counters of the server running in this process, read by http.metrics()
+    def __init__(self, window: int = 1024) -> None:
+        self.lock = threading.Lock()
+        self.queued = self.inFlight = self.served = self.rejected = 0
+        self.latencies: deque[float] = deque(maxlen = window)
+        self.total = self.slowest = 0.0
+        self.cache: HandlerCache | None = None
+    def start(self) -> None:
+        with self.lock:
+            self.queued -= 1
+            self.inFlight += 1
+    def finish(self, took: float) -> None:
+        with self.lock:
+            self.inFlight -= 1
+            self.served += 1
+            self.total += took
+            self.slowest = max(self.slowest, took)
+            self.latencies.append(took)
+    def snapshot(self) -> dict:
+        with self.lock:
+            recent = sorted(self.latencies)
+            at = lambda q: round(recent[min(len(recent) - 1, int(len(recent) * q))] * 1000, 3) if recent else 0
+            return {"queued": self.queued, "inFlight": self.inFlight, "served": self.served, "rejected": self.rejected,
+                    "latency": {"mean": round(self.total / self.served * 1000, 3) if self.served else 0,
+                                "p50": at(0.5), "p99": at(0.99), "max": round(self.slowest * 1000, 3)},
+                    **({"cache": self.cache.stats()} if self.cache is not None else {})}
+    def reset(self) -> None:
+        with self.lock:
+            self.served = self.rejected = 0
+            self.latencies.clear()
+            self.total = self.slowest = 0.0
+
+metrics: Metrics = Metrics()
+
+class Dispatcher:
+    # Handlers run on a fixed pool of `threads`, at most `maxQueue` requests may wait for one,
+    # past that submit() refuses and the engine answers 503 instead of letting latency grow
+    def __init__(self, handlerFn: Closure, threads: int = 8, maxQueue: int = 64, streamBody: bool = False,
+                 cache: HandlerCache | None = None) -> None:
+        self.handlerFn = handlerFn
+        self.maxQueue = maxQueue
+        # When set, handlers read `req.body` from the connection as a stream instead of getting a String
+        self.streamBody = streamBody
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers = threads)
+
+    def submit(self, method: str, path: str, headers: dict, body: str | io.TextIOBase) -> Future | None:
+        hit = self.cache.lookup(method, path, headers) if self.cache is not None else None
+        if hit is not None:
+            future = Future()
+            future.set_result(hit)
+            return future
+        with metrics.lock:
+            if metrics.queued >= self.maxQueue:
+                metrics.rejected += 1
+                return None
+            metrics.queued += 1
+        return self.executor.submit(self.run, method, path, headers, body)
+    def run(self, method: str, path: str, headers: dict, body: str | io.TextIOBase) -> tuple[int, dict, bytes]:
+        metrics.start()
+        start = time.perf_counter()
+        try:
+            return respond(self.handlerFn, method, path, headers, body, self.cache)
+        except Exception as e:
+            return 500, {}, str(e).encode("utf-8")
+        finally:
+            metrics.finish(time.perf_counter() - start)
+    def close(self) -> None:
+        self.executor.shutdown(wait = True)
+
+class RouteNode:
+    __slots__ = ("static", "param", "paramName", "wildcard", "wildcardName", "handlers")
+    def __init__(self) -> None:
+        self.static: dict[str, RouteNode] = {}
+        self.param: RouteNode | None = None
+        self.paramName = ""
+        self.wildcard: dict[str, Value] | None = None
+        self.wildcardName = ""
+        self.handlers: dict[str, Value] = {}
+
+def pick(handlers: dict[str, Value], method: str, allowed: set) -> Value | None:
+    fn = handlers.get(method) or handlers.get("*") or (handlers.get("GET") if method == "HEAD" else None)
+    if fn is None:
+        allowed.update(handlers)
+    return fn
+
+class Router:
+    # Routes live in a trie of path segments built as they are registered, so a lookup walks the
+    # request path once whatever the number of routes. `:name` matches one segment, `*name` the
+    # rest of the path; static segments win over parameters, parameters over wildcards.
+    def __init__(self) -> None:
+        self.root = RouteNode()
+        self.fallback: Value | None = None
+
+    def add(self, method: str, path: str, fn: Value) -> None:
+        node = self.root
+        for seg in [s for s in path.split("/") if s]:
+            if seg.startswith("*"):
+                if node.wildcard is None: node.wildcard = {}
+                if node.wildcardName and node.wildcardName != seg[1:]:
+                    raise ValueError(f"route {path} names wildcard {seg[1:]}, an earlier route calls it {node.wildcardName}")
+                node.wildcardName = seg[1:]
+                node.wildcard[method] = fn
+                return
+            if seg.startswith(":"):
+                if node.param is None: node.param = RouteNode()
+                if node.paramName and node.paramName != seg[1:]:
+                    raise ValueError(f"route {path} names parameter {seg[1:]}, an earlier route calls it {node.paramName}")
+                node.paramName = seg[1:]
+                node = node.param
+            else:
+                node = node.static.setdefault(seg, RouteNode())
+        node.handlers[method] = fn
+    def match(self, method: str, path: str) -> tuple[Value | None, dict, list]:
+        # Returns the handler and the extracted params, or None and the methods the path does allow
+        segs = [unquote(s) for s in path.split("?", 1)[0].split("/") if s]
+        params: dict[str, str] = {}
+        allowed: set[str] = set()
+        fn = self.find(self.root, segs, 0, method, params, allowed)
+        if fn is None:
+            return None, {}, sorted(allowed)
+        return fn, params, []
+    def find(self, node: RouteNode, segs: list[str], i: int, method: str, params: dict, allowed: set) -> Value | None:
+        # A route that exists for other methods only does not end the search, a parameter or
+        # wildcard route further on may take this method. Their methods are kept for the 405.
+        if i == len(segs):
+            fn = pick(node.handlers, method, allowed)
+            if fn is not None: return fn
+            if node.wildcard is not None:
+                fn = pick(node.wildcard, method, allowed)
+                if fn is not None:
+                    params[node.wildcardName] = ""
+                    return fn
+            return None
+        child = node.static.get(segs[i])
+        if child is not None:
+            fn = self.find(child, segs, i + 1, method, params, allowed)
+            if fn is not None: return fn
+        if node.param is not None:
+            fn = self.find(node.param, segs, i + 1, method, params, allowed)
+            if fn is not None:
+                params[node.paramName] = segs[i]
+                return fn
+        if node.wildcard is not None:
+            fn = pick(node.wildcard, method, allowed)
+            if fn is not None:
+                params[node.wildcardName] = "/".join(segs[i:])
+                return fn
+        return None
+    def dispatch(self, req: Table) -> Value:
+        method = req.get(String(value = "method")).value
+        fn, params, allowed = self.match(method, req.get(String(value = "path")).value)
+        req.define(String(value = "params"), makeTable(params))
+        if fn is None:
+            if self.fallback is not None:
+                fn = self.fallback
+            elif allowed:
+                return makeTable({"status": 405, "headers": {"allow": ", ".join(allowed)}})
+            else:
+                return makeTable({"status": 404, "body": "not found"})
+        if isinstance(fn, Closure):
+            fn = isolate(fn)
+        return fn([req], [])
+
+BUSY = (503, {"retry-after": "1"}, b"server busy")
+
+def makeHandler(dispatcher: Dispatcher) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def handle_method(self):
+            chunked = "chunked" in self.headers.get("transfer-encoding", "").lower()
+            try:
+                length = 0 if chunked else int(self.headers.get("content-length", "0"))
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.send_error(400, "bad content-length")
+                return
+            reader = BodyReader(self.rfile.read, self.rfile.readline, length, chunked)
+            if dispatcher.streamBody:
+                body = textStream(reader)
+            else:
+                try:
+                    body = reader.readall().decode("utf-8", "replace")
+                except ValueError:
+                    self.send_error(400, "malformed chunked body")
+                    return
+
+            future = dispatcher.submit(self.command, self.path, dict(self.headers), body)
+            status, headers, body = BUSY if future is None else future.result()
+            self.send_response(status)
+
+            for k, v in headers.items():
+                self.send_header(k, str(v))
+
+            if isinstance(body, StreamBody):
+                # HTTP/1.0 has no chunked encoding, the end of the body is the end of the connection.
+                # The chunks are produced on this connection's thread as the socket takes them.
+                self.send_header("connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                if self.command != "HEAD":
+                    try:
+                        for data in body:
+                            self.wfile.write(data)
+                            self.wfile.flush()
+                    except (RuntimeError, ConnectionError):
+                        pass
+                return
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            if isinstance(body, FileBody):
+                if self.command != "HEAD":
+                    with open(body.path, "rb") as f:
+                        self.connection.sendfile(f, body.offset, body.count)
+            else:
+                self.wfile.write(body)
+
+        def do_GET(self): self.handle_method()
+        def do_POST(self): self.handle_method()
+        def do_PUT(self): self.handle_method()
+        def do_PATCH(self): self.handle_method()
+        def do_DELETE(self): self.handle_method()
+        def do_HEAD(self): self.handle_method()
+    return Handler
+
+def listenSocket(port: int, backlog: int = 128) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("0.0.0.0", port))
+    sock.listen(backlog)
+    return sock
+
+def serveThreads(sock: socket.socket, handler: type[BaseHTTPRequestHandler]) -> None:
+    # Serves on an already listening socket, SIGTERM lets the requests in progress finish first
+    server = ThreadingHTTPServer(sock.getsockname(), handler, bind_and_activate = False)
+    server.socket.close()
+    server.socket = sock
+    stop = lambda *_: threading.Thread(target = server.shutdown).start()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+class Prefork:
+    # The parent only supervises: it forks the workers, forks a new one whenever one dies and
+    # forwards SIGTERM/SIGINT to all of them on shutdown
+    def __init__(self, sock: socket.socket, target: Callable[[socket.socket], None], workers: int, grace: float = 10) -> None:
+        self.sock = sock
+        self.target = target
+        self.workers = workers
+        self.grace = grace
+        self.children: dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self.target(self.sock)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+    def stop(self, *_) -> None:
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    def run(self) -> None:
+        previous = {s: signal.signal(s, self.stop) for s in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            for _ in range(self.workers):
+                self.spawn()
+            while self.children:
+                try:
+                    pid, _ = os.wait()
+                except ChildProcessError:
+                    break
+                started = self.children.pop(pid, None)
+                if started is None or self.stopping:
+                    continue
+                # A worker that crashes right after starting would otherwise be re-forked in a tight loop
+                if time.monotonic() - started < 1:
+                    time.sleep(1)
+                if not self.stopping:
+                    self.spawn()
+        finally:
+            self.stop()
+            self.reap()
+            for s, h in previous.items():
+                signal.signal(s, h)
+            self.sock.close()
+    def reap(self) -> None:
+        deadline = time.monotonic() + self.grace
+        while self.children and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.05)
+            else:
+                self.children.pop(pid, None)
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.children.clear()
+
+STATUS = {status.value: status.phrase for status in HTTPStatus}
+
+class AsyncServer:
+    # One event loop multiplexes every connection: keep-alive connections cost a coroutine instead
+    # of a thread, and handlers run on the dispatcher's fixed pool. Connections beyond
+    # `maxConnections` get a 503 right away.
+    def __init__(self, dispatcher: Dispatcher, maxConnections: int = 1024,
+                 keepAliveTimeout: float = 5, maxHeader: int = 65536, maxBody: int = 16 * 1024 * 1024) -> None:
+        self.dispatcher = dispatcher
+        self.maxConnections = maxConnections
+        self.keepAliveTimeout = keepAliveTimeout
+        self.maxHeader = maxHeader
+        self.maxBody = maxBody
+        self.connections = 0
+        self.idle: set[asyncio.StreamWriter] = set()
+        self.stopping = False
+
+    async def serve(self, sock: socket.socket) -> None:
+        loop = asyncio.get_running_loop()
+        self.done = asyncio.Event()
+        server = await asyncio.start_server(self.connection, sock = sock, limit = self.maxHeader,
+                                            backlog = max(128, self.maxConnections))
+        # Signals can only be hooked from the main thread, an embedding program stops us with stop()
+        signals = (signal.SIGTERM, signal.SIGINT) if threading.current_thread() is threading.main_thread() else ()
+        for s in signals:
+            loop.add_signal_handler(s, self.stop)
+        try:
+            await self.done.wait()
+            server.close()
+            await server.wait_closed()
+            while self.connections:
+                await asyncio.sleep(0.05)
+        finally:
+            for s in signals:
+                loop.remove_signal_handler(s)
+    def stop(self) -> None:
+        # Idle keep-alive connections are closed now, busy ones after their current response
+        self.stopping = True
+        for writer in list(self.idle):
+            writer.close()
+        self.done.set()
+
+    async def connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if self.connections >= self.maxConnections or self.stopping:
+            try:
+                await self.send(writer, 503, {}, b"server busy", False)
+            except ConnectionError:
+                pass
+            writer.close()
+            return
+        self.connections += 1
+        try:
+            while not self.stopping:
+                self.idle.add(writer)
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepAliveTimeout)
+                except asyncio.LimitOverrunError:
+                    await self.send(writer, 431, {}, b"", False)
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                finally:
+                    self.idle.discard(writer)
+                if not await self.request(head, reader, writer):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+    async def request(self, head: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        # Answers one request and tells whether the connection stays open. The body is read exactly,
+        # so a pipelined request behind it stays in the reader buffer for the next round.
+        try:
+            line, *fields = head[:-4].decode("latin-1").split("\r\n")
+            method, target, version = line.split(" ")
+            headers = {}
+            for field in fields:
+                name, value = field.split(":", 1)
+                headers[name.strip()] = value.strip()
+        except ValueError:
+            await self.send(writer, 400, {}, b"malformed request", False)
+            return False
+        lower = {k.lower(): v for k, v in headers.items()}
+        chunked = "chunked" in lower.get("transfer-encoding", "").lower()
+        try:
+            length = 0 if chunked else int(lower.get("content-length", "0"))
+        except ValueError:
+            length = -1
+        if length < 0:
+            await self.send(writer, 400, {}, b"bad content-length", False)
+            return False
+        if length > self.maxBody:
+            await self.send(writer, 413, {}, b"", False)
+            return False
+        connection = lower.get("connection", "").lower()
+        keepAlive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+        stream = None
+        if self.dispatcher.streamBody:
+            # The handler thread reads the body through the event loop, as far as it wants to
+            loop = asyncio.get_running_loop()
+            blocking = lambda fn: lambda *a: asyncio.run_coroutine_threadsafe(fn(*a), loop).result()
+            stream = BodyReader(blocking(reader.read), blocking(reader.readline), length, chunked, self.maxBody)
+            body = textStream(stream)
+        elif chunked:
+            try:
+                data = await self.readChunked(reader)
+            except ValueError:
+                await self.send(writer, 400, {}, b"malformed chunked body", False)
+                return False
+            if data is None:
+                await self.send(writer, 413, {}, b"", False)
+                return False
+            body = data.decode("utf-8", "replace")
+        else:
+            body = (await reader.readexactly(length)).decode("utf-8", "replace") if length else ""
+
+        # The connection is not read any further until its handler has answered
+        future = self.dispatcher.submit(method, target, headers, body)
+        status, resHeaders, payload = BUSY if future is None else await asyncio.wrap_future(future)
+        # Whatever the handler left of a streamed body would be taken for the next request
+        keepAlive = keepAlive and not self.stopping and (stream is None or stream.finished)
+        if isinstance(payload, StreamBody):
+            return await self.stream(writer, method, version, status, resHeaders, payload, keepAlive)
+        if isinstance(payload, FileBody):
+            await self.send(writer, status, resHeaders, b"", keepAlive, len(payload))
+            if method != "HEAD":
+                with open(payload.path, "rb") as f:
+                    await asyncio.get_running_loop().sendfile(writer.transport, f, payload.offset, payload.count)
+            return keepAlive
+        await self.send(writer, status, resHeaders, b"" if method == "HEAD" else payload, keepAlive, len(payload))
+        return keepAlive
+    async def readChunked(self, reader: asyncio.StreamReader) -> bytes | None:
+        # A whole chunked body, None once it grows past maxBody
+        parts, total = [], 0
+        while True:
+            size = int((await reader.readline()).split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(parts)
+            total += size
+            if total > self.maxBody:
+                return None
+            parts.append(await reader.readexactly(size))
+            await reader.readline()
+    async def stream(self, writer: asyncio.StreamWriter, method: str, version: str, status: int, headers: dict,
+                     payload: StreamBody, keepAlive: bool) -> bool:
+        # Each chunk is produced on the dispatcher's pool and written before the next one is asked for,
+        # HTTP/1.0 clients get the body unframed and the connection closed after it
+        chunked = version == "HTTP/1.1"
+        keepAlive = keepAlive and chunked
+        await self.send(writer, status, headers, b"", keepAlive, "chunked" if chunked else "close")
+        if method == "HEAD":
+            return keepAlive
+        loop = asyncio.get_running_loop()
+        chunks = iter(payload)
+        while True:
+            try:
+                data = await loop.run_in_executor(self.dispatcher.executor, next, chunks, None)
+            except Exception:
+                return False
+            if data is None:
+                break
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data) if chunked else data)
+            await writer.drain()
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        return keepAlive
+    async def send(self, writer: asyncio.StreamWriter, status: int, headers: dict, body: bytes, keepAlive: bool,
+                   length: int | str | None = None) -> None:
+        # `length` overrides Content-Length, "chunked" announces a chunked body and "close" leaves the
+        # body unframed, ended by closing the connection
+        lines = [f"HTTP/1.1 {status} {STATUS.get(status, '')}", f"Date: {formatdate(usegmt = True)}"]
+        lines += [f"{k}: {v}" for k, v in headers.items()
+                  if k.lower() not in ("content-length", "connection", "transfer-encoding")]
+        if length == "chunked":
+            lines.append("Transfer-Encoding: chunked")
+        elif length != "close":
+            lines.append(f"Content-Length: {len(body) if length is None else length}")
+        lines.append("Connection: keep-alive" if keepAlive else "Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        # drain waits while the client is slower than we write, so a slow reader cannot grow our buffers
+        await writer.drain()
+
+def serveAsync(sock: socket.socket, dispatcher: Dispatcher, **options) -> None:
+    asyncio.run(AsyncServer(dispatcher, **options).serve(sock))
+
+def serve(port: int, handlerFn: Closure, workers: int = 1, engine: str = "thread", threads: int = 8,
+          maxQueue: int = 64, streamBody: bool = False, cache: HandlerCache | None = None, **options) -> None:
+    # The dispatcher is created before forking, its threads start lazily so each worker gets its own
+    dispatcher = Dispatcher(handlerFn, threads, maxQueue, streamBody, cache)
+    metrics.cache = cache
+    if engine == "async":
+        target = functools.partial(serveAsync, dispatcher = dispatcher, **options)
+    elif engine == "thread":
+        target = functools.partial(serveThreads, handler = makeHandler(dispatcher))
+    else:
+        raise ValueError(f"unknown engine {engine}")
+    try:
+        if workers > 1 and hasattr(os, "fork"):
+            Prefork(listenSocket(port), target, workers).run()
+        elif engine == "thread":
+            server = ThreadingHTTPServer(("0.0.0.0", port), makeHandler(dispatcher))
+            server.serve_forever()
+        else:
+            target(listenSocket(port))
+    finally:
+        dispatcher.close()
@@ -48,7 +48,9 @@ def assignVariable(lhs: AST, rhs: Value, env: Env, isDeclare: bool = False,
                 res.append(val)
         return res
 
-def interpret(ast: AST, env: Env = makeGlobal(), **kwargs) -> Value:
+def interpret(ast: AST, env: Env | None = None, **kwargs) -> Value:
+    if env is None:
+        env = makeGlobal()
     if ast.typ == "NUMBER":
         return Number(value = float(ast.value))
     elif ast.typ == "STRING":
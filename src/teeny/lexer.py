@@ -113,29 +113,34 @@ def escapeString(s: str) -> str:
         result.append(inner[i]); i += 1
     return "".join(result)
 def lexString(src: str, pos: int, quoteChar: str):
+    # Tokens of the string and of its interpolations carry the line of the opening quote onwards
+    line = src.count("\n", 0, pos) + 1
     pos += 1
     now = ""
     res = []
     flag = False
     if src[pos] == quoteChar:
-        res.append(Token("STRING", "", 0, 0))
+        res.append(Token("STRING", "", line, 0))
         return [res, pos + 1]
     while src[pos] != quoteChar:
         if src[pos] == "{" and not flag:
-            res.append(Token("STRING", escapeString(now), 0, 0))
+            res.append(Token("STRING", escapeString(now), line, 0))
             now = ""
-            res.append(Token("INTE_START", "", 0, 0))
+            res.append(Token("INTE_START", "", line, 0))
             ed = findMatchingRightParen(src, pos)
             tokens = tokenize(src[pos + 1:ed - 1])
+            offset = src.count("\n", 0, pos)
+            for t in tokens:
+                t.line += offset
             res.extend(tokens)
-            res.append(Token("INTE_END", "", 0, 0))
+            res.append(Token("INTE_END", "", line, 0))
             pos = ed
         else:
             if src[pos] == "\\": flag = True
             else: flag = False
             now += src[pos]
             pos = pos + 1
-    if now != "": res.append(Token("STRING", escapeString(now), 0, 0))
+    if now != "": res.append(Token("STRING", escapeString(now), line, 0))
     return [res, pos + 1]
 
 def tokenize(src: str) -> list[Token]:
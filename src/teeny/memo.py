@@ -0,0 +1,79 @@
+import time
+import threading
+from collections import OrderedDict
+from teeny.AST import AST
+from teeny.value import Value, Number, String, Regex, Table, Nil, Error, ValError, nextID
+
+# Cache keys built from the structure of Teeny values: plain tuples of Python scalars, cheap to
+# hash and compare. Tables are keyed by their content, closures and other values by their gID.
+
+def key(value: Value, seen: set[int] | None = None) -> tuple:
+    if isinstance(value, Number):
+        return ("n", value.value)
+    if isinstance(value, String):
+        return ("s", value.value)
+    if isinstance(value, Nil):
+        return ("nil",)
+    if isinstance(value, Regex):
+        return ("r", value.value)
+    if isinstance(value, ValError):
+        return ("ve", key(value.typ, seen), key(value.value, seen))
+    if isinstance(value, Table):
+        seen = set() if seen is None else seen
+        if id(value) in seen:
+            return ("cycle",)
+        seen.add(id(value))
+        res = ("t", tuple((key(k, seen), key(v, seen)) for k, v in value.value.items()))
+        seen.discard(id(value))
+        return res
+    # The counter id every value gets when it is made, id() is reused once the value is collected
+    if not value.gID:
+        value.gID = str(nextID())
+    return ("id", value.gID)
+
+def argsKey(args: tuple, kwargs: dict) -> tuple:
+    return tuple(key(a) for a in args) + tuple((k, key(v)) for k, v in sorted(kwargs.items()))
+
+class Memo:
+    # fn's results by argument, at most `size` of them (0 for no limit), each kept `ttl` seconds
+    # (0 for ever). The least recently used result goes first. Errors are returned, never kept.
+    def __init__(self, fn: Value, size: int = 256, ttl: float = 0) -> None:
+        self.fn = fn
+        self.size = size
+        self.ttl = ttl
+        self.entries: OrderedDict[tuple, tuple[Value, float]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, *args, **kwargs) -> Value:
+        k = argsKey(args, kwargs)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(k)
+            if entry is not None and (not entry[1] or entry[1] > now):
+                self.entries.move_to_end(k)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        # Called without the lock, so recursive calls through the memo hit it too
+        res = self.fn(list(args), [[AST("NAME", [], n), v] for n, v in kwargs.items()])
+        if isinstance(res, Error):
+            return res
+        with self.lock:
+            self.entries[k] = (res, time.monotonic() + self.ttl if self.ttl else 0)
+            self.entries.move_to_end(k)
+            while self.size and len(self.entries) > self.size:
+                self.entries.popitem(last = False)
+                self.evictions += 1
+        return res
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self.entries), "max": self.size}
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
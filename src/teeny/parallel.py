@@ -0,0 +1,228 @@
+import os
+import pickle
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from teeny.AST import AST
+from teeny import shm
+from teeny.value import Value, Number, String, Regex, Table, Closure, BuiltinClosure, Nil, Error, ValError, Env, nextID, isTruthy
+
+# Values cross the process boundary as nested tuples of plain Python objects:
+#   ("n", number)  ("s", text)  ("r", pattern)  ("nil",)  ("e", type, message)  ("ve", type, value)
+#   ("t", id, [(key, value), ...], size)
+#   ("c", id, params, defaults, implementation, isDynamic, [(name, value), ...])
+#   ("ref", id) for a Table or Closure already sent, so shared and recursive values keep their shape.
+#   ("shm", name) for a shm table, the worker maps the same segment instead of receiving the items.
+# A Closure travels as its AST plus the variables its body reads from outside, the worker rebuilds
+# it on top of its own global environment. Built-in Closures cannot be sent, the standard library
+# modules are found by name on the other side.
+
+class Unsendable(TypeError):
+    pass
+
+BUILTINS: set[str] = set()
+
+def names(node, found: set[str]) -> set[str]:
+    # Every NAME in the tree, the ones that are not captured simply do not resolve in the closure env
+    if isinstance(node, AST):
+        if node.typ == "NAME" and isinstance(node.value, str):
+            found.add(node.value)
+        names(node.value, found)
+        names(node.children, found)
+    elif isinstance(node, (list, tuple)):
+        for item in node:
+            names(item, found)
+    return found
+
+def root(env: Env) -> Env:
+    while env.outer is not None:
+        env = env.outer
+    return env
+
+def encode(value: Value, seen: dict[int, int] | None = None):
+    seen = {} if seen is None else seen
+    if isinstance(value, Number):
+        return ("n", value.value)
+    if isinstance(value, String):
+        return ("s", value.value)
+    if isinstance(value, Regex):
+        return ("r", value.value)
+    if isinstance(value, Nil):
+        return ("nil",)
+    if isinstance(value, Error):
+        return ("e", value.typ, value.value)
+    if isinstance(value, ValError):
+        return ("ve", encode(value.typ), encode(value.value))
+    if isinstance(value, shm.SharedTable):
+        return ("shm", value.array.name)
+    if id(value) in seen:
+        return ("ref", seen[id(value)])
+    if isinstance(value, Table):
+        seen[id(value)] = len(seen)
+        return ("t", seen[id(value)], [(encode(k, seen), encode(v, seen)) for k, v in value.value.items()], value.size)
+    if isinstance(value, Closure):
+        seen[id(value)] = len(seen)
+        captured = []
+        top = root(value.env)
+        for name in sorted(names(value.implementation, set()) | names(value.params, set())):
+            if not value.env.find(name):
+                continue
+            val = value.env.read(name)
+            # The worker has its own copy of the standard library
+            if name in BUILTINS and name in top and top[name] is val and not isinstance(val, (Number, String, Closure)):
+                continue
+            captured.append((name, encode(val, seen)))
+        defaults = [(param, encode(val, seen)) for param, val in value.default]
+        return ("c", seen[id(value)], value.params, defaults, value.implementation, value.isDynamic, captured)
+    if isinstance(value, BuiltinClosure):
+        raise Unsendable("cannot send a Built-in Closure to a worker process")
+    raise Unsendable(f"cannot send {type(value).__name__} to a worker process")
+
+def decode(data, env: Env, built: dict[int, Value] | None = None) -> Value:
+    built = {} if built is None else built
+    kind = data[0]
+    if kind == "n": return Number(value = data[1])
+    if kind == "s": return String(value = data[1])
+    if kind == "r": return Regex(value = data[1])
+    if kind == "nil": return Nil()
+    if kind == "e": return Error({}, typ = data[1], value = data[2])
+    if kind == "ve": return ValError(typ = decode(data[1], env, built), value = decode(data[2], env, built))
+    if kind == "ref": return built[data[1]]
+    if kind == "shm": return attached(data[1])
+    if kind == "t":
+        res = Table()
+        built[data[1]] = res
+        for k, v in data[2]:
+            res.value[decode(k, env, built)] = decode(v, env, built)
+        res.size = data[3]
+        return res
+    _, ref, params, defaults, implementation, isDynamic, captured = data
+    res = Closure.__new__(Closure)
+    built[ref] = res
+    res.params = params
+    res.implementation = implementation
+    res.isDynamic = isDynamic
+    res.gID = str(nextID())
+    res.env = Env(outer = env)
+    res.default = [[param, decode(val, env, built)] for param, val in defaults]
+    for name, val in captured:
+        res.env[name] = decode(val, env, built)
+    return res
+
+# Worker side: one global environment per process and the last function received, decoded once
+# however many chunks use it
+workerEnv: Env | None = None
+workerFn: tuple[bytes, Value] | None = None
+
+workerShared: dict[str, Value] = {}
+
+def attached(name: str) -> Value:
+    # Mapped once per process and kept for every later chunk that reads it
+    if name not in workerShared:
+        workerShared[name] = shm.attach(String(value = name))
+    return workerShared[name]
+
+def initWorker() -> None:
+    global workerEnv
+    from teeny.glob import makeGlobal
+    workerEnv = makeGlobal()
+
+def runChunk(blob: bytes, mode: str, items: list) -> tuple[bool, list | tuple[str, str]]:
+    # Returns (True, results) or (False, (type, message)) for the first Error the function returned
+    global workerFn
+    digest = hashlib.sha256(blob).digest()
+    if workerFn is None or workerFn[0] != digest:
+        workerFn = (digest, decode(pickle.loads(blob), workerEnv))
+    fn = workerFn[1]
+    res = []
+    for value, key in items:
+        out = fn([decode(value, workerEnv), decode(key, workerEnv)], {})
+        if isinstance(out, Error):
+            return False, (out.typ, out.value)
+        res.append(isTruthy(out) if mode == "filter" else encode(out))
+    return True, res
+
+# Parent side: the pool is created on first use and kept for later calls with the same size
+poolLock = threading.Lock()
+pool: ProcessPoolExecutor | None = None
+poolSize = 0
+
+def getPool(workers: int) -> ProcessPoolExecutor:
+    global pool, poolSize
+    with poolLock:
+        if pool is None or poolSize != workers:
+            if pool is not None:
+                pool.shutdown(wait = False)
+            # spawn rather than fork: the parent may be running server or client threads
+            pool = ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context("spawn"),
+                                       initializer = initWorker)
+            poolSize = workers
+        return pool
+
+def shutdown() -> None:
+    global pool, poolSize
+    with poolLock:
+        if pool is not None:
+            pool.shutdown(wait = True)
+        pool, poolSize = None, 0
+
+class WorkerError(Exception):
+    def __init__(self, typ: str, value: str) -> None:
+        super().__init__(value)
+        self.typ = typ
+        self.value = value
+
+def parallel(fn: Value, items: list[tuple[Value, Value]], mode: str, workers: int | None, chunk: int | None) -> list:
+    # Runs fn over (value, key) pairs on the pool, `chunk` pairs per task, results in input order
+    if not isinstance(fn, Closure):
+        raise Unsendable(f"only a Closure can run in a worker process, got {fn.toString().value}")
+    if not BUILTINS:
+        from teeny.glob import makeGlobal
+        BUILTINS.update(makeGlobal())
+    if not items:
+        return []
+    workers = workers or os.cpu_count() or 1
+    chunk = chunk or max(1, -(-len(items) // (workers * 4)))
+    blob = pickle.dumps(encode(fn))
+    pairs = [(encode(v), encode(k)) for v, k in items]
+    tasks = [pairs[i:i + chunk] for i in range(0, len(pairs), chunk)]
+    res = []
+    for ok, part in getPool(workers).map(runChunk, [blob] * len(tasks), [mode] * len(tasks), tasks):
+        if not ok:
+            raise WorkerError(*part)
+        res += part
+    return res
+
+def pmap(table: Table, fn: Value, workers: int | None = None, chunk: int | None = None) -> Table | Error:
+    # Same result as table.map(fn): keys kept, values replaced by fn(value, key)
+    keys = list(table.value.keys())
+    try:
+        out = parallel(fn, [(table.value[k], k) for k in keys], "map", workers, chunk)
+    except WorkerError as e:
+        return Error({}, typ = e.typ, value = e.value)
+    except Unsendable as e:
+        return Error({}, typ = "Runtime Error", value = str(e))
+    res = Table({})
+    env = root(fn.env)
+    for k, v in zip(keys, out):
+        res.define(k, decode(v, env))
+    res.size = table.size
+    return res
+
+def pfilter(table: Table, fn: Value, workers: int | None = None, chunk: int | None = None) -> Table | Error:
+    # Same result as table.filter(fn): the list part is renumbered, named keys are kept
+    l = table.toList(); d = table.toDict()
+    items = [(v, Number(value = p)) for p, v in enumerate(l)] + [(d.get(k), k) for k in d.keys()]
+    try:
+        keep = parallel(fn, items, "filter", workers, chunk)
+    except WorkerError as e:
+        return Error({}, typ = e.typ, value = e.value)
+    except Unsendable as e:
+        return Error({}, typ = "Runtime Error", value = str(e))
+    res = Table({})
+    for i, ((v, k), ok) in enumerate(zip(items, keep)):
+        if not ok: continue
+        if i < len(l): res.append(v)
+        else: res.define(k, v)
+    return res
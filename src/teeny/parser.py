@@ -41,6 +41,7 @@ def advance(tokens: list[Token], p: int, expectedTyp: str | list[str]) -> int:
 def parse(tokens: list[Token], p = 0, minBp = 0) -> list[AST | int]:
     while p < len(tokens) and tokens[p].typ == "SEMI": p += 1
     if p == len(tokens): return [None, p]
+    start = tokens[p]
     lhs = None
     if tokens[p].typ == "NUMBER" or tokens[p].typ == "NAME":
         if p + 1 < len(tokens) and (tokens[p + 1].typ == "ARROW" or tokens[p + 1].typ == "AT"):
@@ -252,6 +253,8 @@ def parse(tokens: list[Token], p = 0, minBp = 0) -> list[AST | int]:
         p += 1
         rhs, p = parse(tokens, p, rBp)
         lhs = AST("PREOP", [rhs], op)
+    if isinstance(lhs, AST) and not lhs.line:
+        lhs.line = start.line
     while True:
         if p == len(tokens): break
         op = tokens[p] if p < len(tokens) else None
@@ -269,11 +272,12 @@ def parse(tokens: list[Token], p = 0, minBp = 0) -> list[AST | int]:
         if suffixOperators(op) != None:
             lBp = suffixOperators(op)
             if lBp < minBp: break
+            line = tokens[p].line
             p += 1
             if op == '[' or op == '?[':
                 rhs, p = parse(tokens, p, 0)
                 p += 1
-                lhs = AST("OP", [lhs, rhs], f"{op}]")
+                lhs = AST("OP", [lhs, rhs], f"{op}]", line)
             elif op == '(' or op == "?(":
                 children = []
                 while tokens[p].typ != "RPAREN":
@@ -283,15 +287,16 @@ def parse(tokens: list[Token], p = 0, minBp = 0) -> list[AST | int]:
                     if tokens[p].typ == "COMMA": p += 1
                     children.append(rhs)
                 p += 1
-                lhs = AST("CALL", [lhs, *children]) if op == '(' else AST("QCALL", [lhs, *children])
+                lhs = AST("CALL" if op == '(' else "QCALL", [lhs, *children], None, line)
             else:
                 raise SyntaxError(f"Unexpected token: found {op}, except [ or ("
                         , tokens[p].line, tokens[p].col)
             continue
         lBp, rBp = infixOperators(op)
         if lBp < minBp: break
+        line = tokens[p].line
         p += 1
         rhs, p = parse(tokens, p, rBp)
 
-        lhs = AST("OP", [lhs, rhs], op)
+        lhs = AST("OP", [lhs, rhs], op, line)
     return [lhs, p]
\ No newline at end of file
@@ -0,0 +1,206 @@
+import time
+import threading
+from collections import defaultdict
+from teeny import interpreter, runner
+from teeny.AST import AST
+from teeny.value import Value, Closure, BuiltinClosure
+
+# A tracing profiler for Teeny code. While it is enabled, interpret, closure calls and value
+# allocation are swapped for versions that keep account; disabled, the interpreter runs the
+# original functions and pays nothing. Only the thread that enabled it is profiled.
+#
+# Functions are keyed by their definition and named after the first call site that names them.
+# Time and allocations are charged to the line of the innermost node being evaluated, so line
+# figures are exclusive, function figures come both inclusive (total) and exclusive (self).
+
+# What enable() swaps: runner calls interpret for every top level statement, the interpreter and
+# Closure.__call__ look it up in the interpreter module for every node
+HOOKS = [(interpreter, "interpret"), (runner, "interpret"), (Closure, "__call__"), (BuiltinClosure, "__call__"),
+         (Value, "__post_init__")]
+
+class FuncStats:
+    __slots__ = ("label", "named", "calls", "wall", "cpu", "allocs", "selfWall", "selfCpu", "selfAllocs")
+    def __init__(self, label: str, named: bool) -> None:
+        self.label = label
+        self.named = named
+        self.calls = 0
+        self.wall = self.cpu = self.allocs = 0
+        self.selfWall = self.selfCpu = self.selfAllocs = 0
+
+class LineStats:
+    __slots__ = ("hits", "wall", "allocs")
+    def __init__(self) -> None:
+        self.hits = 0
+        self.wall = 0
+        self.allocs = 0
+
+class Frame:
+    __slots__ = ("key", "stats", "wall", "cpu", "allocs", "childWall", "childCpu", "childAllocs")
+    def __init__(self, key: object, stats: FuncStats, wall: int, cpu: int, allocs: int) -> None:
+        self.key = key
+        self.stats = stats
+        self.wall = wall
+        self.cpu = cpu
+        self.allocs = allocs
+        self.childWall = self.childCpu = self.childAllocs = 0
+
+class Profiler:
+    def __init__(self) -> None:
+        self.funcs: dict[object, FuncStats] = {}
+        self.lines: defaultdict[int, LineStats] = defaultdict(LineStats)
+        self.folded: defaultdict[str, int] = defaultdict(int)
+        self.stack: list[Frame] = []
+        self.labels: list[str] = []
+        self.active: dict[object, int] = defaultdict(int)
+        # Names of the calls being evaluated, [name, consumed] each
+        self.calls: list[list] = []
+        self.allocCount = 0
+        self.line = 0
+        self.lineStart = 0
+        self.lineAllocs = 0
+        self.thread = 0
+        self.saved: tuple | None = None
+
+    # Swapping the hooks in and out
+    def enable(self) -> None:
+        if self.saved is not None:
+            return
+        self.thread = threading.get_ident()
+        self.saved = tuple(getattr(owner, name) for owner, name in HOOKS)
+        interpret, _, closureCall, builtinCall, postInit = self.saved
+        prof = self
+        def profiledInterpret(ast: AST, env = None, **kwargs) -> Value:
+            if threading.get_ident() != prof.thread:
+                return interpret(ast, env, **kwargs)
+            line = getattr(ast, "line", 0)
+            call = ast.typ == "CALL" or ast.typ == "QCALL"
+            if call:
+                prof.calls.append([callName(ast.children[0]), False])
+            if not line or line == prof.line:
+                try:
+                    return interpret(ast, env, **kwargs)
+                finally:
+                    if call: prof.calls.pop()
+            outer = prof.line
+            prof.switch(line)
+            prof.lines[line].hits += 1
+            try:
+                return interpret(ast, env, **kwargs)
+            finally:
+                prof.switch(outer)
+                if call: prof.calls.pop()
+        def profiledClosure(fn: Closure, value, kwarg) -> Value:
+            if threading.get_ident() != prof.thread:
+                return closureCall(fn, value, kwarg)
+            key = id(fn.implementation)
+            stats = prof.funcs.get(key)
+            name = prof.callName()
+            if stats is None or (name and not stats.named):
+                line = getattr(fn.implementation[0], "line", 0) if fn.implementation else 0
+                label = f"{name or '<lambda>'}:{line}"
+                if stats is None:
+                    stats = prof.funcs[key] = FuncStats(label, bool(name))
+                else:
+                    stats.label, stats.named = label, True
+            prof.enter(key, stats)
+            try:
+                return closureCall(fn, value, kwarg)
+            finally:
+                prof.leave()
+        def profiledBuiltin(fn: BuiltinClosure, value, kwarg = []) -> Value:
+            if threading.get_ident() != prof.thread:
+                return builtinCall(fn, value, kwarg)
+            name = prof.callName() or "<builtin>"
+            key = ("builtin", name)
+            stats = prof.funcs.get(key)
+            if stats is None:
+                stats = prof.funcs[key] = FuncStats(f"{name} (builtin)", True)
+            prof.enter(key, stats)
+            try:
+                return builtinCall(fn, value, kwarg)
+            finally:
+                prof.leave()
+        def countedPostInit(value: Value) -> None:
+            prof.allocCount += 1
+            postInit(value)
+        for (owner, name), hook in zip(HOOKS, (profiledInterpret, profiledInterpret, profiledClosure, profiledBuiltin, countedPostInit)):
+            setattr(owner, name, hook)
+        self.lineStart = time.perf_counter_ns()
+        self.lineAllocs = self.allocCount
+        self.enter("<script>", self.funcs.setdefault("<script>", FuncStats("<script>", True)))
+    def disable(self) -> None:
+        if self.saved is None:
+            return
+        while self.stack:
+            self.leave()
+        self.switch(0)
+        for (owner, name), original in zip(HOOKS, self.saved):
+            setattr(owner, name, original)
+        self.saved = None
+
+    def callName(self) -> str | None:
+        # The name of the innermost call expression, if no function has answered it yet
+        if self.calls and not self.calls[-1][1]:
+            self.calls[-1][1] = True
+            return self.calls[-1][0]
+        return None
+    def switch(self, line: int) -> None:
+        now = time.perf_counter_ns()
+        if self.line:
+            stats = self.lines[self.line]
+            stats.wall += now - self.lineStart
+            stats.allocs += self.allocCount - self.lineAllocs
+        self.line = line
+        self.lineStart = now
+        self.lineAllocs = self.allocCount
+    def enter(self, key: object, stats: FuncStats) -> None:
+        self.stack.append(Frame(key, stats, time.perf_counter_ns(), time.thread_time_ns(), self.allocCount))
+        self.labels.append(stats.label)
+        self.active[key] += 1
+    def leave(self) -> None:
+        wall, cpu = time.perf_counter_ns(), time.thread_time_ns()
+        frame = self.stack.pop()
+        key, stats = frame.key, frame.stats
+        wall -= frame.wall; cpu -= frame.cpu; allocs = self.allocCount - frame.allocs
+        stats.calls += 1
+        self.active[key] -= 1
+        # Recursive calls are already inside the outermost call's total
+        if not self.active[key]:
+            stats.wall += wall; stats.cpu += cpu; stats.allocs += allocs
+        stats.selfWall += wall - frame.childWall
+        stats.selfCpu += cpu - frame.childCpu
+        stats.selfAllocs += allocs - frame.childAllocs
+        self.folded[";".join(self.labels)] += (wall - frame.childWall) // 1000
+        self.labels.pop()
+        if self.stack:
+            parent = self.stack[-1]
+            parent.childWall += wall; parent.childCpu += cpu; parent.childAllocs += allocs
+
+    def run(self, fn, *args, **kwargs):
+        self.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.disable()
+
+    # Output
+    def report(self, source: str = "", limit: int = 30) -> str:
+        out = [f"{'calls':>9} {'total ms':>10} {'self ms':>10} {'cpu ms':>10} {'allocs':>10}  function"]
+        for s in sorted(self.funcs.values(), key = lambda s: s.selfWall, reverse = True)[:limit]:
+            out.append(f"{s.calls:>9} {s.wall / 1e6:>10.3f} {s.selfWall / 1e6:>10.3f} {s.cpu / 1e6:>10.3f} {s.allocs:>10}  {s.label}")
+        text = source.splitlines()
+        out += ["", f"{'line':>9} {'hits':>10} {'ms':>10} {'allocs':>10}  source"]
+        for line, s in sorted(self.lines.items(), key = lambda item: item[1].wall, reverse = True)[:limit]:
+            code = text[line - 1].strip() if 0 < line <= len(text) else ""
+            out.append(f"{line:>9} {s.hits:>10} {s.wall / 1e6:>10.3f} {s.allocs:>10}  {code[:60]}")
+        return "\n".join(out) + "\n"
+    def collapsed(self) -> str:
+        # One "caller;callee microseconds" line per stack, the input of flamegraph.pl and speedscope
+        return "".join(f"{stack} {us}\n" for stack, us in sorted(self.folded.items()) if us > 0)
+
+def callName(node: AST) -> str | None:
+    if node.typ == "NAME" and isinstance(node.value, str):
+        return node.value
+    if node.typ == "OP" and node.value in (".", "?.") and len(node.children) == 2:
+        return callName(node.children[1])
+    return None
@@ -5,9 +5,10 @@ from teeny.processor import process
 from teeny.interpreter import interpret
 from teeny.exception import LexicalError, SyntaxError, RuntimeError
 from teeny.value import makeObject, Error, Value, Nil
-from teeny.glob import makeGlobal
+from teeny.glob import makeGlobal, asyncEnv
 
-def run(code: str, env: Env = makeGlobal()) -> Env:
+def run(code: str, env: Env | None = None) -> Env:
+    env = makeGlobal() if env is None else env
     rhs = None; p = 0
     while True:
         rhs, p = parse(tokenize(code), p)
@@ -16,8 +17,12 @@ def run(code: str, env: Env = makeGlobal()) -> Env:
             break
     return env
 
-def run_code(pathOrCode: str, print_each: bool = True, print_res: bool = True, is_file: bool = True, defEnv: Env = makeGlobal()) -> None:
-    env = defEnv
+def run_code(pathOrCode: str, print_each: bool = True, print_res: bool = True, is_file: bool = True, defEnv: Env | None = None,
+             asyncMode: bool = False) -> None:
+    # Every call without an env gets its own globals, so interpreters on different threads share nothing
+    defEnv = makeGlobal() if defEnv is None else defEnv
+    # In async mode I/O builtins return futures run by the event loop, see glob.asyncEnv
+    env = asyncEnv(defEnv) if asyncMode else defEnv
     try:
         src = None
         if is_file: src = open(pathOrCode, "r", encoding="utf-8").read()
@@ -56,7 +61,8 @@ def run_code(pathOrCode: str, print_each: bool = True, print_res: bool = True, i
         print(f"File not found: {pathOrCode}")
     except (LexicalError, SyntaxError, RuntimeError) as e:
         print(e)
-def Run(code: str, env: Env = makeGlobal()) -> Value:
+def Run(code: str, env: Env | None = None) -> Value:
+    env = makeGlobal() if env is None else env
     rhs = None; p = 0; lst = Nil()
     while True:
         rhs, p = parse(tokenize(code), p)
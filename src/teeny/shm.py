@@ -0,0 +1,184 @@
+import os
+import mmap
+import array
+import atexit
+import struct
+import itertools
+import threading
+from collections.abc import Callable
+from multiprocessing import shared_memory
+from teeny.value import Value, Number, String, Table, BuiltinClosure, Nil, Error, makeTable
+
+# The list part of a Table in one shared memory segment, laid out by column:
+#   header   magic "TNSH", kind, 3 bytes padding, item count (uint64)
+#   kind q   count int64s         kind d   count float64s
+#   kind s   count + 1 int64 offsets into the utf-8 bytes that follow them
+# Other processes map the segment read-only and read items in place, nothing is unpickled or copied.
+
+HEADER = struct.Struct("<4sc3xQ")
+MAGIC = b"TNSH"
+
+def layout(values: list) -> tuple[str, bytes]:
+    if all(isinstance(v, int) and not isinstance(v, bool) and -2 ** 63 <= v < 2 ** 63 for v in values):
+        return "q", array.array("q", values).tobytes()
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return "d", array.array("d", values).tobytes()
+    if all(isinstance(v, str) for v in values):
+        data = [v.encode("utf-8") for v in values]
+        offsets = array.array("q", itertools.accumulate((len(d) for d in data), initial = 0))
+        return "s", offsets.tobytes() + b"".join(data)
+    raise TypeError("only a list of numbers or a list of strings can be shared")
+
+class SharedArray:
+    # A view of one segment. `release` unmaps it, the owner's segment can also be unlinked.
+    def __init__(self, name: str, buf: memoryview, release: Callable[[], None], owner: shared_memory.SharedMemory | None = None) -> None:
+        magic, kind, count = HEADER.unpack_from(buf)
+        if magic != MAGIC:
+            raise ValueError(f"{name} is not a shared table")
+        self.name = name
+        self.kind = kind.decode()
+        self.count = count
+        self.release = release
+        self.owner = owner
+        body = buf[HEADER.size:].toreadonly()
+        self.views = [buf, body]
+        if self.kind == "s":
+            self.offsets = body[:8 * (count + 1)].cast("q")
+            self.data = body[8 * (count + 1):]
+            self.views += [self.offsets, self.data]
+        else:
+            self.offsets = None
+            self.data = body[:8 * count].cast(self.kind)
+            self.views.append(self.data)
+
+    def __len__(self) -> int:
+        return self.count
+    def __getitem__(self, i: int) -> int | float | str:
+        if self.offsets is None:
+            return self.data[i]
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+    def __iter__(self):
+        return (self[i] for i in range(self.count))
+    def sum(self) -> int | float:
+        if self.offsets is not None:
+            raise TypeError("sum of a shared table of strings")
+        return sum(self.data)
+
+    def close(self) -> None:
+        if not self.views:
+            return
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        self.release()
+    def unlink(self) -> None:
+        self.close()
+        if self.owner is not None:
+            self.owner.unlink()
+            owned.discard(self)
+            self.owner = None
+
+# Segments this process created are unlinked when it exits, unless unlinked before
+owned: set[SharedArray] = set()
+ownedLock = threading.Lock()
+
+def create(values: list, name: str | None = None) -> SharedArray:
+    kind, payload = layout(values)
+    mem = shared_memory.SharedMemory(name = name, create = True, size = HEADER.size + len(payload))
+    HEADER.pack_into(mem.buf, 0, MAGIC, kind.encode(), len(values))
+    mem.buf[HEADER.size:HEADER.size + len(payload)] = payload
+    res = SharedArray(mem.name, mem.buf, mem.close, mem)
+    with ownedLock:
+        owned.add(res)
+    return res
+
+def openArray(name: str) -> SharedArray:
+    if os.name != "posix":
+        mem = shared_memory.SharedMemory(name = name)
+        return SharedArray(name, mem.buf, mem.close)
+    # Mapped directly rather than through SharedMemory: a readable-only mapping, and no resource
+    # tracker registration that would unlink the owner's segment when this process exits
+    import _posixshmem
+    fd = _posixshmem.shm_open(name if name.startswith("/") else "/" + name, os.O_RDONLY, mode = 0o600)
+    try:
+        m = mmap.mmap(fd, os.fstat(fd).st_size, prot = mmap.PROT_READ)
+    finally:
+        os.close(fd)
+    return SharedArray(name, memoryview(m), m.close)
+
+def unlinkOwned() -> None:
+    with ownedLock:
+        arrays = list(owned)
+    for arr in arrays:
+        try:
+            arr.unlink()
+        except OSError:
+            pass
+atexit.register(unlinkOwned)
+
+class SharedTable(Table):
+    # What Teeny code sees: indexing, `for` and len read the segment, assignments fail.
+    # parallel.encode sends it to workers by name.
+    array: SharedArray | None = None
+
+def item(arr: SharedArray, i: int) -> Value:
+    return makeTable(arr[i])
+
+def makeShared(arr: SharedArray) -> SharedTable:
+    def take(self: Table, pos: Value) -> Value:
+        if isinstance(pos, Number) and float(pos.value).is_integer() and 0 <= pos.value < arr.count:
+            if not arr.views:
+                return Error({}, typ = "SharedError", value = f"shared table {arr.name} is closed")
+            return item(arr, int(pos.value))
+        return self.get(pos)
+    def toTable() -> Table:
+        return makeTable(list(arr))
+    def sub(l: Number, r: Number) -> Table:
+        return makeTable([arr[i] for i in range(arr.count)[int(l.value):int(r.value)]])
+    def call(fn: Callable) -> Callable:
+        def inner(*args) -> Value:
+            try:
+                return fn(*args)
+            except (TypeError, ValueError, ZeroDivisionError) as e:
+                return Error({}, typ = "SharedError", value = str(e))
+        return inner
+    def readOnly(self: Table, pos: Value, val: Value) -> Error:
+        return Error({}, typ = "SharedError", value = f"shared table {arr.name} is read-only")
+    def unlink() -> Nil:
+        if arr.owner is None:
+            return Error({}, typ = "SharedError", value = f"shared table {arr.name} was not created by this process")
+        arr.unlink()
+        return Nil()
+    res = SharedTable(value = {
+        String(value = "_get_"): BuiltinClosure(fn = take),
+        String(value = "_set_"): BuiltinClosure(fn = readOnly),
+        String(value = "_def_"): BuiltinClosure(fn = readOnly),
+        String(value = "name"): String(value = arr.name),
+        String(value = "sum"): BuiltinClosure(fn = call(lambda: makeTable(arr.sum()))),
+        String(value = "mean"): BuiltinClosure(fn = call(lambda: makeTable(arr.sum() / arr.count))),
+        String(value = "min"): BuiltinClosure(fn = call(lambda: makeTable(min(arr.data) if arr.offsets is None else min(arr)))),
+        String(value = "max"): BuiltinClosure(fn = call(lambda: makeTable(max(arr.data) if arr.offsets is None else max(arr)))),
+        String(value = "sub"): BuiltinClosure(fn = sub),
+        String(value = "toTable"): BuiltinClosure(fn = toTable),
+        String(value = "map"): BuiltinClosure(fn = lambda fn: toTable().map(fn)),
+        String(value = "filter"): BuiltinClosure(fn = lambda fn: toTable().filter(fn)),
+        String(value = "close"): BuiltinClosure(fn = lambda: (arr.close(), Nil())[-1]),
+        String(value = "unlink"): BuiltinClosure(fn = unlink)
+    }, size = arr.count)
+    res.array = arr
+    return res
+
+def share(table: Table, name: String | Nil = Nil()) -> SharedTable | Error:
+    if not isinstance(table, Table):
+        return Error({}, typ = "SharedError", value = "share needs a Table")
+    try:
+        values = [v.value if isinstance(v, (Number, String)) else None for v in table.toList()]
+        return makeShared(create(values, name.value if isinstance(name, String) else None))
+    except (TypeError, ValueError, OSError) as e:
+        return Error({}, typ = "SharedError", value = str(e))
+
+def attach(name: String) -> SharedTable | Error:
+    try:
+        return makeShared(openArray(name.value))
+    except (ValueError, OSError) as e:
+        return Error({}, typ = "SharedError", value = str(e))
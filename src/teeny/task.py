@@ -0,0 +1,88 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from teeny.value import Value, Closure, Error, isolate
+
+# One pool for every task of the process, started on first use. The interpreter holds the GIL while
+# it runs Teeny code, so tasks pay off when they wait: http calls, os.run, time.sleep, channels.
+poolLock = threading.Lock()
+pool: ThreadPoolExecutor | None = None
+poolSize = 64
+
+def getPool() -> ThreadPoolExecutor:
+    global pool
+    with poolLock:
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers = poolSize, thread_name_prefix = "teeny-task")
+        return pool
+
+class Task:
+    # A call of `fn` on the pool. Whoever gets to it first runs it: a pool thread, or the thread that
+    # awaits it before any pool thread has picked it up, so tasks awaiting tasks cannot starve the pool
+    def __init__(self, fn: Value, args: list[Value]) -> None:
+        # Like http handlers, every task assigns into its own child env of the closure
+        self.fn = isolate(fn) if isinstance(fn, Closure) else fn
+        self.args = args
+        self.lock = threading.Lock()
+        self.claimed = False
+        self.finished = threading.Event()
+        self.value: Value | None = None
+        getPool().submit(self.run)
+
+    def run(self) -> None:
+        with self.lock:
+            if self.claimed:
+                return
+            self.claimed = True
+        try:
+            self.value = self.fn(self.args, [])
+        except Exception as e:
+            self.value = Error({}, typ = "TaskError", value = str(e))
+        finally:
+            self.finished.set()
+    def wait(self) -> Value:
+        self.run()
+        self.finished.wait()
+        return self.value
+    def done(self) -> bool:
+        return self.finished.is_set()
+
+class Closed(Exception):
+    pass
+
+class Channel:
+    # A FIFO of at most `capacity` values: send blocks while it is full, recv while it is empty.
+    # After close, send fails and recv drains what is left, then returns None.
+    def __init__(self, capacity: int = 16) -> None:
+        self.capacity = max(1, capacity)
+        self.items: deque[Value] = deque()
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def send(self, value: Value) -> None:
+        with self.cond:
+            while len(self.items) >= self.capacity and not self.closed:
+                self.cond.wait()
+            if self.closed:
+                raise Closed("send on a closed channel")
+            self.items.append(value)
+            self.cond.notify_all()
+    def recv(self) -> Value | None:
+        with self.cond:
+            while not self.items and not self.closed:
+                self.cond.wait()
+            if not self.items:
+                return None
+            value = self.items.popleft()
+            self.cond.notify_all()
+            return value
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+    def __iter__(self):
+        while (value := self.recv()) is not None:
+            yield value
+    def __len__(self) -> int:
+        with self.cond:
+            return len(self.items)
@@ -5,13 +5,30 @@ from teeny.exception import RuntimeError
 import math
 import functools
 import codecs
-import uuid
+import itertools
 from collections.abc import Callable
 from typing import Union
 import re
 import importlib
 import types
+import sys
+import threading
 from teeny.lexer import escapeString
+from teeny.counters import counters
+
+# Unique ids only need to be distinct within the process, a counter is much cheaper than uuid4.
+# With the GIL, count.__next__ is atomic; free-threaded builds get a lock around it.
+nextID = itertools.count().__next__
+if not getattr(sys, "_is_gil_enabled", lambda: True)():
+    idLock = threading.Lock()
+    counter = nextID
+    def nextID() -> int:
+        with idLock:
+            return counter()
+
+def compileRegex(pattern: str | bytes) -> re.Pattern:
+    counters.regexCompiles += 1
+    return re.compile(pattern)
 
 def requireType(message: str) -> Callable:
     def decorator(func) -> Callable:
@@ -39,15 +56,26 @@ def requireType(message: str) -> Callable:
 class Value:
     metaTable: dict["Value": "Value"] = field(default_factory=dict)
     gID: str = field(default_factory=str)
+    # Built-in methods, bound on first access so allocating a value stays cheap
+    methods = {}
 
     def __post_init__(self) -> None:
-        self.gID = str(uuid.uuid4())
+        self.gID = str(nextID())
+        counters.allocations[type(self)] += 1
     def register(self, pos: "Value", val: "Value") -> None:
         self.metaTable[pos] = val
     def get(self, pos: "Value") -> "Value":
-        return self.metaTable.get(pos, Nil())
+        res = self.metaTable.get(pos)
+        if res is not None:
+            return res
+        method = self.methods.get(pos.value) if isinstance(pos, String) else None
+        if method is None:
+            return Nil()
+        res = BuiltinClosure(fn = method(self))
+        self.metaTable[pos] = res
+        return res
     def take(self, pos: "Value") -> "Value":
-        return self.metaTable.get(pos, Nil())
+        return Value.get(self, pos)
     def toString(self) -> "String":
         return String(value = "value")
     def toPrint(self) -> "String":
@@ -81,11 +109,11 @@ def isTruthy(value: Value) -> bool:
 class Number(Value):
     value: float = 0.0
 
-    def __post_init__(self) -> None:
-        super().__post_init__()
-        self.register(String(value = "times"), BuiltinClosure(fn = self.times))
-        self.register(String(value = "negative"), BuiltinClosure(fn = self.negative))
-        self.register(String(value = "fact"), BuiltinClosure(fn = self.fact))
+    methods = {
+        "times": lambda self: self.times,
+        "negative": lambda self: self.negative,
+        "fact": lambda self: self.fact
+    }
 
     @requireType("add a non-Number to a Number")
     def __add__(self, rhs: "Number") -> "Number":
@@ -145,23 +173,26 @@ class String(Value):
     value: str = ""
     noConstruct: bool = False
 
+    methods = {
+        "len": lambda self: self.len,
+        "slice": lambda self: self.slice,
+        "find": lambda self: self.find,
+        "upper": lambda self: self.upper,
+        "lower": lambda self: self.lower,
+        "cap": lambda self: self.cap,
+        "trim": lambda self: self.trim,
+        "split": lambda self: self.split,
+        "join": lambda self: self.join,
+        "format": lambda self: self.format,
+        "count": lambda self: self.count,
+        "number": lambda self: self.numberQ,
+        "_iter_": lambda self: self._iter_
+    }
+
     def __post_init__(self) -> None:
         if self.noConstruct:
             return
         super().__post_init__()
-        self.register(String(value = "len", noConstruct = True), BuiltinClosure(fn = self.len))
-        self.register(String(value = "slice", noConstruct = True), BuiltinClosure(fn = self.slice))
-        self.register(String(value = "find", noConstruct = True), BuiltinClosure(fn = self.find))
-        self.register(String(value = "upper", noConstruct = True), BuiltinClosure(fn = self.upper))
-        self.register(String(value = "lower", noConstruct = True), BuiltinClosure(fn = self.lower))
-        self.register(String(value = "cap", noConstruct = True), BuiltinClosure(fn = self.cap))
-        self.register(String(value = "trim", noConstruct = True), BuiltinClosure(fn = self.trim))
-        self.register(String(value = "split", noConstruct = True), BuiltinClosure(fn = self.split))
-        self.register(String(value = "join", noConstruct = True), BuiltinClosure(fn = self.join))
-        self.register(String(value = "format", noConstruct = True), BuiltinClosure(fn = self.format))
-        self.register(String(value = "count", noConstruct = True), BuiltinClosure(fn = self.count))
-        self.register(String(value = "number", noConstruct = True), BuiltinClosure(fn = self.numberQ))
-        self.register(String(value = "_iter_", noConstruct = True), BuiltinClosure(fn = self._iter_))
 
     @requireType("add a non-String to a String")
     def __add__(self, rhs: "String") -> "String":
@@ -220,7 +251,7 @@ class String(Value):
         elif isinstance(pos, String):
             self.value = self.value.replace(pos.value, val.value)
         elif isinstance(pos, Regex):
-            pattern = re.compile(pos.value)
+            pattern = compileRegex(pos.value)
             self.value = pattern.sub(val.value, self.value)
         elif isinstance(pos, Table):
             for p in range(pos.size):
@@ -293,21 +324,21 @@ class String(Value):
 class Regex(Value):
     value: str = ""
 
-    def __post_init__(self) -> None:
-        super().__post_init__()
-        self.register(String(value = "find", noConstruct = True), BuiltinClosure(fn = self.find))
+    methods = {
+        "find": lambda self: self.find
+    }
     def __hash__(self):
         return self.value.__hash__()
     def match(self, rhs: String) -> Number:
         try:
-            pattern = re.compile(self.value)
+            pattern = compileRegex(self.value)
             ok = bool(pattern.search(rhs.value))
         except Exception:
             ok = False
         return Number(value = 1 if ok else 0)
     def find(self, rhs: String) -> Value:
         try:
-            pattern = re.compile(self.value)
+            pattern = compileRegex(self.value)
             matches = pattern.findall(rhs.value)
             def convert(x):
                 if isinstance(x, tuple):
@@ -324,39 +355,39 @@ class Table(Value):
     value: dict[Value: Value] = field(default_factory=dict)
     size: int = 0
 
-    def __post_init__(self) -> None:
-        super().__post_init__()
-        self.register(String(value = "push"), BuiltinClosure(fn = self.append))
-        self.register(String(value = "pop"), BuiltinClosure(fn = self.popE))
-        self.register(String(value = "keys"), BuiltinClosure(fn = self.keys))
-        self.register(String(value = "values"), BuiltinClosure(fn = self.values))
-        self.register(String(value = "enumerate"), BuiltinClosure(fn = self.enumerate))
-        self.register(String(value = "pairs"), BuiltinClosure(fn = self.pairs))
-        self.register(String(value = "mean"), BuiltinClosure(fn = lambda: makeTable(self.mean())))
-        self.register(String(value = "sum"), BuiltinClosure(fn = lambda: makeTable(self.sum())))
-        self.register(String(value = "median"), BuiltinClosure(fn = lambda: makeTable(self.median())))
-        self.register(String(value = "stdev"), BuiltinClosure(fn = lambda: makeTable(self.stdev())))
-        self.register(String(value = "describe"), BuiltinClosure(fn = lambda: makeTable(self.describe())))
-        self.register(String(value = "has"), BuiltinClosure(fn = self.has))
-        self.register(String(value = "map"), BuiltinClosure(fn = self.map))
-        self.register(String(value = "sort"), BuiltinClosure(fn = lambda: self.sort()))
-        self.register(String(value = "filter"), BuiltinClosure(fn = self.filter))
-        self.register(String(value = "reduce"), BuiltinClosure(fn = self.reduce))
-        self.register(String(value = "_iter_"), BuiltinClosure(fn = self._iter_))
-        self.register(String(value = "set"), BuiltinClosure(fn = self.set))
-        self.register(String(value = "define"), BuiltinClosure(fn = self.define))
-        self.register(String(value = "get"), BuiltinClosure(fn = self.take))
-        self.register(String(value = "defaultGet"), BuiltinClosure(fn = self.get))
-        self.register(String(value = "len"), BuiltinClosure(fn = self.len))
-        self.register(String(value = "sub"), BuiltinClosure(fn = self.sub))
-        self.register(String(value = "shuffle"), BuiltinClosure(fn = self.shuffle))
-        self.register(String(value = "find"), BuiltinClosure(fn = self.find))
-        self.register(String(value = "all"), BuiltinClosure(fn = self.allQ))
-        self.register(String(value = "any"), BuiltinClosure(fn = self.anyQ))
-        self.register(String(value = "none"), BuiltinClosure(fn = self.noneQ))
-        self.register(String(value = "one"), BuiltinClosure(fn = self.oneQ))
-        self.register(String(value = "compact"), BuiltinClosure(fn = self.compact))
-        self.register(String(value = "drop"), BuiltinClosure(fn = self.drop))
+    methods = {
+        "push": lambda self: self.append,
+        "pop": lambda self: self.popE,
+        "keys": lambda self: self.keys,
+        "values": lambda self: self.values,
+        "enumerate": lambda self: self.enumerate,
+        "pairs": lambda self: self.pairs,
+        "mean": lambda self: lambda: makeTable(self.mean()),
+        "sum": lambda self: lambda: makeTable(self.sum()),
+        "median": lambda self: lambda: makeTable(self.median()),
+        "stdev": lambda self: lambda: makeTable(self.stdev()),
+        "describe": lambda self: lambda: makeTable(self.describe()),
+        "has": lambda self: self.has,
+        "map": lambda self: self.map,
+        "sort": lambda self: lambda: self.sort(),
+        "filter": lambda self: self.filter,
+        "reduce": lambda self: self.reduce,
+        "_iter_": lambda self: self._iter_,
+        "set": lambda self: self.set,
+        "define": lambda self: self.define,
+        "get": lambda self: self.take,
+        "defaultGet": lambda self: self.get,
+        "len": lambda self: self.len,
+        "sub": lambda self: self.sub,
+        "shuffle": lambda self: self.shuffle,
+        "find": lambda self: self.find,
+        "all": lambda self: self.allQ,
+        "any": lambda self: self.anyQ,
+        "none": lambda self: self.noneQ,
+        "one": lambda self: self.oneQ,
+        "compact": lambda self: self.compact,
+        "drop": lambda self: self.drop
+    }
 
     def __add__(self, rhs: "Table") -> "Table":
         if self.get(String(value = "_add_")) != Nil():
@@ -662,12 +693,14 @@ class Env(dict):
             return self.outer.find(name)
     
     def read(self, name: str) -> Value:
-        if self.get(name) != None:
-            return self.get(name)
-        else:
-            if self.outer == None:
+        counters.envLookups += 1
+        env = self
+        while env.get(name) is None:
+            if env.outer is None:
                 return Error(typ = "Runtime Error", value = f"read from non-existing variable, try to read {name} but it doesn't exist")
-            return self.outer.read(name)
+            env = env.outer
+            counters.envDepth += 1
+        return env.get(name)
     
     def write(self, name: str, val: Value) -> Value:
         if self.get(name, None) != None:
@@ -684,6 +717,19 @@ class Env(dict):
         else:
             self.update({name: val})
             return val
+class ChildEnv(Env):
+    # Reads fall through to outer, but assigning an outer variable shadows it here instead of
+    # rebinding it, so concurrent calls through the same closure never see each other's writes
+    def write(self, name: str, val: Value) -> Value:
+        if name not in self and not self.find(name):
+            return Error(typ = "Runtime Error", value = f"assign to non-existing variable, try to assign to {name} but it doesn't exist")
+        self[name] = val
+        return val
+def isolate(fn: "Closure") -> "Closure":
+    res = Closure.__new__(Closure)
+    res.__dict__.update(fn.__dict__)
+    res.env = ChildEnv(outer = fn.env)
+    return res
 @dataclass
 class Closure:
     params: list[str] = field(default_factory = list)
@@ -707,7 +753,7 @@ class Closure:
                 self.params.append(item)
         self.implementation = implementation; self.env = snapshot(env) if isDynamic else env;
         self.isDynamic = isDynamic
-        self.gID = str(uuid.uuid4())
+        self.gID = str(nextID())
 
     def __eq__(self, rhs) -> Number:
         if not isinstance(rhs, Closure): return Number(value = 0)
@@ -717,6 +763,7 @@ class Closure:
         return Number(value = int(self.gID != rhs.gID))
 
     def __call__(self, value, kwarg: list) -> Value:
+        counters.closureCalls += 1
         nEnv = Env(outer = self.env)
         for pos in range(len(self.default)):
             param = self.default[pos][0]
@@ -808,9 +855,8 @@ class ValError(Value):
 
 @dataclass
 class Nil(Value):
+    # The instance is created right below the class, so threads never race to make it
     def __new__(cls):
-        if not hasattr(cls, 'instance'):
-            cls.instance = super(Nil, cls).__new__(cls)
         return cls.instance
     def toString(self) -> "String":
         return String(value = "nil")
@@ -824,6 +870,7 @@ class Nil(Value):
         if not isinstance(rhs, Nil):
             return Number(value = 1)
         return Number(value = 0)
+Nil.instance = Value.__new__(Nil)
 
 @dataclass
 class BuiltinClosure(Value):
@@ -831,6 +878,7 @@ class BuiltinClosure(Value):
     hasEnv: bool = False
 
     def __call__(self, value: list, kwarg: list = []) -> Value:
+        counters.builtinCalls += 1
         kwarg_dict = {}
         for item in kwarg:
             if item[0].typ == "NAME":
@@ -854,6 +902,7 @@ class Bubble(Value):
         return super().toNumber()
 
 def snapshot(e: Env) -> Env:
+    counters.snapshots += 1
     if e.outer == None:
         res = Env(None)
         res.update(e.copy())
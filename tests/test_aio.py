@@ -0,0 +1,70 @@
+import os
+import time
+import tempfile
+import asyncio
+import threading
+import unittest
+from teeny.runner import run_code
+from teeny.value import makeObject, Error
+
+class StandIn:
+    # An asyncio server answering every request after 0.2 s, so a thousand requests only finish
+    # quickly if they are all in flight together
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, "127.0.0.1", 0, backlog = 2048))
+        self.port = self.server.sockets[0].getsockname()[1]
+        threading.Thread(target = self.loop.run_forever, daemon = True).start()
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                path = head.split(b" ")[1]
+                length = [int(l.split(b":")[1]) for l in head.split(b"\r\n") if l.lower().startswith(b"content-length")]
+                body = await reader.readexactly(length[0]) if length else path
+                await asyncio.sleep(0.2)
+                writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n%x\r\n%s\r\n0\r\n\r\n" % (len(body), body))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+    def close(self) -> None:
+        self.loop.call_soon_threadsafe(self.server.close)
+
+class TestAio(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandIn()
+        cls.url = f"http://127.0.0.1:{cls.server.port}"
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+    def test_many_requests(self):
+        threads = threading.active_count()
+        st = time.perf_counter()
+        res = run_code(f'rs = task.all(range(0, 1000).map((i) => aio.get("{self.url}/" + string(i)))); [rs.len(), rs[999].content]',
+                       False, False, False)
+        self.assertEqual(makeObject(res), [1000, "/999"])
+        self.assertLess(time.perf_counter() - st, 5)
+        # The requests wait on the event loop, not on a thread each
+        self.assertLess(threading.active_count() - threads, 10)
+    def test_async_mode(self):
+        res = run_code(f'r = await(http.post("{self.url}/p", [a: 1])); [r.status, r.json]', False, False, False, asyncMode = True)
+        self.assertEqual(makeObject(res), [200, {"a": 1}])
+        st = time.perf_counter()
+        res = run_code('f = async((x) => { await(time.sleep(0.3)); x }); task.all([f(1), f(2), time.sleep(0.3)])', False, False, False, asyncMode = True)
+        self.assertEqual(makeObject(res), [1, 2, None])
+        self.assertLess(time.perf_counter() - st, 0.6)
+        self.assertEqual(makeObject(run_code('await(os.run("echo hi"))', False, False, False, asyncMode = True)), "hi\n")
+        # Appends still buffered are flushed before the file is read
+        with tempfile.TemporaryDirectory() as d:
+            out = os.path.join(d, "log.txt")
+            code = f'fs.writeText("{out}", "a", 1); t = await(fs.readText("{out}")); fs.writeText("{out}", "b", 1); [t, await(os.run("cat {out}"))]'
+            self.assertEqual(makeObject(run_code(code, False, False, False, asyncMode = True)), ["a", "ab"])
+        # Normal mode keeps the blocking builtins
+        self.assertEqual(makeObject(run_code('time.sleep(0)', False, False, False)), None)
+        res = run_code('aio.get("http://127.0.0.1:1/").await()', False, False, False)
+        self.assertIsInstance(res, Error)
+        self.assertEqual(res.typ, "HTTPError")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,9 @@ import math, random
 from teeny.runner import run_code
 from teeny.value import makeObject
 import json
+import os
+import tempfile
+from teeny.value import Error
 
 
 class TestBuiltin(unittest.TestCase):
@@ -65,6 +68,46 @@ class TestBuiltin(unittest.TestCase):
         self.assertEqual(makeObject(run_code('json.parse("123")', False, False, False)), 123)
         roundtrip = makeObject(run_code('json.decode(json.encode([ "x": 5, "y": [1,2,3] ]))', False, False, False))
         self.assertEqual(roundtrip, {"x": 5, "y": [1, 2, 3]})
+        nested = makeObject(run_code("""json.decode('[\\{"a": [1, \\{"b": null\\}]\\}, 2.5, "s"]')""", False, False, False))
+        self.assertEqual(nested, [{"a": [1, {"b": None}]}, 2.5, "s"])
+        self.assertEqual(makeObject(run_code("""json.decode('\\{"k": [1, 2]\\}').k.len()""", False, False, False)), 2)
+        self.assertEqual(makeObject(run_code('json.encode([1, [a: [2.5, nil]], "x"])', False, False, False)),
+                         json.dumps([1, {"a": [2.5, None]}, "x"]))
+        self.assertEqual(run_code("""json.encode(json.decode('["a\\\\\\\\nb"]'))""", False, False, False).value,
+                         json.dumps(["a\\nb"]))
+    def test_json_stream(self):
+        with tempfile.TemporaryDirectory() as d:
+            doc = os.path.join(d, "doc.json")
+            items = [{"id": i, "name": "n" * (i % 7), "score": i / 4} for i in range(500)]
+            with open(doc, "w") as f:
+                json.dump({"meta": {"skip": [1, {"x": "]"}]}, "data": {"items": items}}, f)
+            code = f'for item in json.stream("{doc}", "data.items") {{ item }}'
+            self.assertEqual(makeObject(run_code(code, False, False, False)), items)
+            code = f'for x in json.stream("{doc}", "meta.skip") {{ x }}'
+            self.assertEqual(makeObject(run_code(code, False, False, False)), [1, {"x": "]"}])
+            self.assertIsInstance(run_code(f'for x in json.stream("{doc}", "missing") {{ x }}', False, False, False), Error)
+            top = os.path.join(d, "top.json")
+            with open(top, "w") as f:
+                f.write("[ ]")
+            self.assertEqual(makeObject(run_code(f'for x in json.stream("{top}") {{ x }}', False, False, False)), [])
+            lines = os.path.join(d, "rows.ndjson")
+            with open(lines, "w") as f:
+                f.write('{"a": 1}\n\n[1, 2]\n"s"\n')
+            code = f'for row in json.lines("{lines}") {{ row }}'
+            self.assertEqual(makeObject(run_code(code, False, False, False)), [{"a": 1}, [1, 2], "s"])
+            with open(lines, "a") as f:
+                f.write("not json\n")
+            self.assertIsInstance(run_code(f'for row in json.lines("{lines}") {{ row }}', False, False, False), Error)
+            self.assertIsInstance(run_code(f'json.lines("{d}/absent")', False, False, False), Error)
+    def test_runtime_stats(self):
+        code = 'runtime.reset(); f = (x) => x * 2; t = range(0, 10).map((i) => f(i)); m = "abc" =~ `b`; for i in 0..2 { i }; runtime.stats()'
+        stats = makeObject(run_code(code, False, False, False))
+        self.assertEqual((stats["closureCalls"], stats["regexCompiles"], stats["snapshots"]), (20, 1, 5))
+        self.assertGreaterEqual(stats["builtinCalls"], 3)
+        self.assertGreater(stats["allocations"]["Number"], 10)
+        self.assertGreater(stats["envDepth"], 0)
+        self.assertGreater(stats["envLookups"], stats["closureCalls"])
+        self.assertEqual(makeObject(run_code('runtime.reset(); runtime.stats().closureCalls', False, False, False)), 0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,35 @@
+import unittest
+from teeny.runner import run_code
+from teeny.glob import makeGlobal
+from teeny.value import makeObject, Error
+
+class TestCache(unittest.TestCase):
+    def test_get_set(self):
+        env = makeGlobal()
+        code = 'c = cache.named("test_get_set", max = 2); c.set("a", 1); c.set([1, 2], "x"); [c.get("a"), c.get([1, 2]), c.get("b"), c.has("a")]'
+        self.assertEqual(makeObject(run_code(code, False, False, False, env)), [1, "x", None, 1])
+        # "a" is the least recently used entry once a third one comes in
+        self.assertEqual(makeObject(run_code('c.get([1, 2]); c.set("b", 3); [c.has("a"), c.len(), c.stats().evictions]', False, False, False, env)), [0, 2, 1])
+        self.assertEqual(makeObject(run_code('cache.named("test_get_set").len()', False, False, False, env)), 2)
+        self.assertEqual(makeObject(run_code('c.set("t", 1, ttl = 0.05); time.sleep(0.1); [c.get("t"), c.stats().expirations]', False, False, False, env)), [None, 1])
+        self.assertEqual(makeObject(run_code('[c.delete("b"), c.delete("b"), cache.drop("test_get_set")]', False, False, False, env)), [1, 0, 1])
+    def test_bytes(self):
+        res = run_code('b = cache.named("test_bytes", max = 0, bytes = 1000); for i in 0..20 { b.set(i, "x" * 30) }; b.stats()', False, False, False)
+        stats = makeObject(res)
+        self.assertLessEqual(stats["bytes"], 1000)
+        self.assertEqual(stats["entries"] + stats["evictions"], 21)
+    def test_get_or_compute(self):
+        env = makeGlobal()
+        code = 'n = [0]; f = (k) => { n[0] = n[0] + 1; k + "!" }; c = cache.named("test_goc"); [c.getOrCompute("q", f), c.getOrCompute("q", f), n[0]]'
+        self.assertEqual(makeObject(run_code(code, False, False, False, env)), ["q!", "q!", 1])
+        self.assertIsInstance(run_code('c.getOrCompute("e", () => missing)', False, False, False, env), Error)
+        self.assertEqual(makeObject(run_code('c.has("e")', False, False, False, env)), 0)
+        # fn asking for its own key gets an error instead of waiting for itself
+        self.assertIsInstance(run_code('c.getOrCompute("r", (k) => c.getOrCompute(k, (k) => 1))', False, False, False, env), Error)
+        self.assertEqual(makeObject(run_code('[c.has("r"), c.getOrCompute("r", (k) => 2)]', False, False, False, env)), [0, 2])
+        # Concurrent callers of a missing key wait for the one computing it
+        code = 'fs = range(0, 8).map((i) => task.spawn(() => c.getOrCompute("k", () => { time.sleep(0.2); n[0] = n[0] + 1; time.now() }))); r = task.all(fs); [r[0] == r[7], n[0]]'
+        self.assertEqual(makeObject(run_code(code, False, False, False, env)), [1, 2])
+
+if __name__ == "__main__":
+    unittest.main()
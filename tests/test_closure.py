@@ -1,6 +1,8 @@
 import unittest
 from teeny.runner import run_code
-from teeny.value import makeObject, Error, Nil
+from teeny.value import makeObject, Error, Nil, BuiltinClosure
+from teeny.glob import makeGlobal
+from teeny import memo
 
 class TestClosure(unittest.TestCase):
     def test_closure(self):
@@ -20,6 +22,21 @@ class TestClosure(unittest.TestCase):
         self.assertEqual(makeObject(run_code('a = 1; f = () @=> a = a + 1; f(); a', False, False, False)), 1)
         self.assertEqual(makeObject(run_code('a = 1; f = (c) @=> a = c + 1; f(1); a', False, False, False)), 1)
         self.assertEqual(makeObject(run_code('a = 1; f = fn@ (c = 1) a = a + 1; f(); a', False, False, False)), 1)
+    def test_memo(self):
+        code = 'calls = [0]; fib = func.memo((n) => { calls[0] = calls[0] + 1; if n < 2 { n } else { fib(n - 1) + fib(n - 2) } }); '
+        self.assertEqual(makeObject(run_code(code + '[fib(60), calls[0], fib.stats().hits]', False, False, False)), [1548008755920, 61, 58])
+        # Tables are keyed by content, the oldest result is evicted past max
+        code = 'f = func.memo((t, k = 1) => t.len() * k, max = 2); '
+        self.assertEqual(makeObject(run_code(code + '[f([1, 2]), f([1, 2]), f([3]), f([4, 5, 6]), f([1, 2], k = 5), f.stats()]', False, False, False)),
+                         [2, 2, 1, 3, 10, {"hits": 1, "misses": 4, "evictions": 2, "size": 2, "max": 2}])
+        self.assertEqual(makeObject(run_code(code + 'f([1]); f.clear(); f.stats().size', False, False, False)), 0)
+        env = makeGlobal()
+        self.assertIsInstance(run_code('g = func.memo((x) => missing); g(1)', False, False, False, env), Error)
+        self.assertEqual(makeObject(run_code('g.stats().size', False, False, False, env)), 0)
+        self.assertEqual(makeObject(run_code('t = func.memo((x) => time.now(), ttl = 0.05); a = t(1); time.sleep(0.1); [a == t(1), t(1) == t(1)]',
+                                             False, False, False)), [0, 1])
+        # Values made and dropped one after another can share an id(), never a key
+        self.assertNotEqual(memo.key(BuiltinClosure(fn = len)), memo.key(BuiltinClosure(fn = len)))
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,98 @@
+import unittest
+import os
+import sys
+import time
+import tempfile
+import subprocess
+from pathlib import Path
+from unittest import mock
+from teeny.runner import run_code
+from teeny import glob
+from teeny.value import makeObject, Error
+
+class TestFs(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "data.txt")
+        with open(self.path, "w", encoding = "utf8") as f:
+            f.write("alpha\nbeta\ngamma\n")
+    def tearDown(self):
+        self.dir.cleanup()
+    def test_open_lines(self):
+        code = f'for line in fs.open("{self.path}").lines() {{ line.upper() }}'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), ["ALPHA", "BETA", "GAMMA"])
+        code = f'h = fs.open("{self.path}"); l = h.lines(); [l.next(), l.next(), l.next(), l.next()]'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), ["alpha", "beta", "gamma", None])
+        code = f'h = fs.open("{self.path}"); for line in h.lines() {{ line }}; h.closed()'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), 1)
+    def test_open_read_write(self):
+        out = os.path.join(self.dir.name, "out.txt")
+        run_code(f'h = fs.open("{out}", "w"); h.write("one\\n"); h.write("two"); h.close()', False, False, False)
+        with open(out, encoding = "utf8") as f:
+            self.assertEqual(f.read(), "one\ntwo")
+        code = f'h = fs.open("{self.path}"); [h.read(3), h.readLine(), h.read()]'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), ["alp", "ha", "beta\ngamma\n"])
+        code = f'h = fs.open("{self.path}"); h.close(); h.read()'
+        self.assertIsInstance(run_code(code, False, False, False), Error)
+        self.assertIsInstance(run_code('fs.open("/nonexistent/file")', False, False, False), Error)
+    def test_each_line(self):
+        code = f'seen = []; n = fs.eachLine("{self.path}", (line, i) => seen.push("{{i}}:{{line}}")); [n, seen]'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), [3, ["0:alpha", "1:beta", "2:gamma"]])
+        code = f'fs.eachLine("{self.path}", (line) => error.raise("Stop", line))'
+        self.assertIsInstance(run_code(code, False, False, False), Error)
+    def test_mmap(self):
+        big = os.path.join(self.dir.name, "big.txt")
+        row = "0123456789abcdef" * 4 + "\n"
+        with open(big, "w", encoding = "utf8") as f:
+            for _ in range(64):
+                f.write(row * 4096)
+            f.write("needle-42\n")
+        size = len(row) * 4096 * 64
+        code = f'm = fs.mmap("{big}"); [m.len(), m.find("needle"), m.find(`needle-\\d+`), m.slice({size}, {size + 9}), m.find("absent")]'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), [size + 10, size, size, "needle-42", -1])
+        code = f'm = fs.mmap("{big}"); for x in m.matches(`needle-\\d+`) {{ x }}'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), ["needle-42"])
+        code = f'for line in fs.mmap("{self.path}").lines() {{ line }}'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), ["alpha", "beta", "gamma"])
+        code = f'm = fs.mmap("{self.path}"); m.close(); m.len()'
+        self.assertIsInstance(run_code(code, False, False, False), Error)
+    def test_buffered_write(self):
+        out = os.path.join(self.dir.name, "log.txt")
+        code = f'fs.writeText("{out}", "head\\n"); for i in 0..2 {{ fs.writeText("{out}", "line {{i}}\\n", 1) }}; fs.readLines("{out}")'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), ["head", "line 0", "line 1", "line 2"])
+        code = f'fs.writeText("{out}", "fresh"); fs.readText("{out}")'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), "fresh")
+        code = f'fs.writer("{out}", bufferSize = 4).use((w) => {{ w.writeLine("a"); w.write("b") }}); fs.readText("{out}")'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), "a\nb")
+        code = f'w = fs.writer("{out}", 1); w.write("c"); w.close(); fs.readText("{out}")'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), "a\nbc")
+        code = f'fs.writeLines("{out}", ["x", "y"]); fs.readText("{out}")'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), "x\ny")
+    def test_writer_flushes_unprompted(self):
+        out = os.path.join(self.dir.name, "quiet.txt")
+        run_code(f'fs.writeText("{out}", "first\\n", 1); fs.writeText("{out}", "second\\n", 1)', False, False, False)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and open(out, encoding = "utf8").read() != "first\nsecond\n":
+            time.sleep(0.05)
+        self.assertEqual(open(out, encoding = "utf8").read(), "first\nsecond\n")
+        code = f'fs.writeText("{out}", "third", 1); fs.fileSize("{out}")'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), 18)
+        # A writer the script never closes still reaches the file when the process exits
+        left = os.path.join(self.dir.name, "left.txt")
+        script = f'from teeny.runner import run_code; run_code(\'w = fs.writer("{left}"); w.write("kept")\', False, False, False)'
+        subprocess.run([sys.executable, "-c", script], check = True)
+        self.assertEqual(open(left, encoding = "utf8").read(), "kept")
+    def test_relative_paths_flush(self):
+        # fs.writeText resolves against the working directory, fileSize and copy against srcPath,
+        # both relative when the script runs from its own directory
+        cwd = os.getcwd()
+        os.chdir(self.dir.name)
+        try:
+            with mock.patch.object(glob, "srcPath", Path(".")):
+                code = 'fs.writeText("out.txt", "hello", 1); size = fs.fileSize("out.txt"); fs.copy("out.txt", "copy.txt"); [size, fs.readText("copy.txt")]'
+                self.assertEqual(makeObject(run_code(code, False, False, False)), [5, "hello"])
+        finally:
+            os.chdir(cwd)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,464 @@
+import unittest
+import json
+import gzip
+import os
+import sys
+import signal
+import socket
+import subprocess
+import requests
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from teeny.runner import run_code
+from teeny.value import makeObject, Error
+from teeny.glob import makeGlobal
+from teeny.httpserver import respond, Dispatcher, HandlerCache, Router
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    ports: set = set()
+    served: list = []
+    failed: set = set()
+    def cached(self):
+        StandIn.served.append(self.path)
+        if self.path.startswith("/etag") and self.headers.get("If-None-Match") == '"v1"' or \
+           self.path.startswith("/modified") and self.headers.get("If-Modified-Since") == "Mon, 05 Oct 2026 10:00:00 GMT":
+            self.send_response(304)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            return
+        payload = json.dumps({"path": self.path, "auth": self.headers.get("Authorization", ""),
+                              "accept": self.headers.get("Accept", "")}).encode()
+        self.send_response(200)
+        if self.path.startswith("/fresh"): self.send_header("Cache-Control", "max-age=60")
+        if self.path.startswith("/vary"): self.send_header("Cache-Control", "max-age=60"); self.send_header("Vary", "Accept")
+        if self.path.startswith("/private"): self.send_header("Cache-Control", "private, max-age=60")
+        if self.path.startswith("/etag"): self.send_header("ETag", '"v1"')
+        if self.path.startswith("/modified"): self.send_header("Last-Modified", "Mon, 05 Oct 2026 10:00:00 GMT")
+        if self.path.startswith("/nostore"): self.send_header("Cache-Control", "no-store")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    def reply(self):
+        StandIn.ports.add(self.client_address[1])
+        if self.path.split("?")[0].split("/")[1] in ("fresh", "etag", "modified", "nostore", "vary", "private"):
+            return self.cached()
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else ""
+        StandIn.served.append(self.path)
+        if self.path.startswith("/flaky") and self.path not in StandIn.failed:
+            StandIn.failed.add(self.path)
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/slow"):
+            time.sleep(0.5)
+        payload = json.dumps({"method": self.command, "path": self.path, "body": body,
+                              "agent": self.headers.get("X-Agent", "")}).encode()
+        kind = "application/json"
+        if self.path.startswith("/text"):
+            payload = b"line\n" * 1000
+        if self.path.startswith("/binary"):
+            payload, kind = b"\x00\xffab\xc3" * 100, "application/octet-stream"
+        self.send_response(200)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(payload)
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = reply
+    def log_message(self, *args):
+        pass
+
+class TestHttp(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target = cls.server.serve_forever, daemon = True).start()
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+    def setUp(self):
+        StandIn.ports.clear()
+        StandIn.served.clear()
+    def test_verbs(self):
+        code = f'r = http.get("{self.url}/a", [q: 1]); [r.status, r.json.path]'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), [200, "/a?q=1"])
+        code = f'r = http.post("{self.url}/b", [x: 1]); r.json().body'
+        self.assertEqual(json.loads(makeObject(run_code(code, False, False, False))), {"x": 1})
+        for call in ('put("/c", [1])', 'delete("/c")', 'head("/c")'):
+            code = f'http.{call.replace("/c", self.url + "/c")}.status'
+            self.assertEqual(makeObject(run_code(code, False, False, False)), 200)
+    def test_lazy_response(self):
+        code = f'r = http.get("{self.url}/text"); [r.status, r.json, r.content.len(), r.headers["Content-Length"]]'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), [200, None, 5000, "5000"])
+        code = f'r = http.get("{self.url}/text", stream = 1); for c in r.chunks(1024) {{ c.len() }}'
+        self.assertEqual(sum(makeObject(run_code(code, False, False, False))), 5000)
+        with tempfile.TemporaryDirectory() as d:
+            out = os.path.join(d, "body.txt")
+            code = f'http.get("{self.url}/text", stream = 1).save("{out}", 100)'
+            self.assertEqual(makeObject(run_code(code, False, False, False)), 5000)
+            with open(out, "rb") as f:
+                self.assertEqual(f.read(), b"line\n" * 1000)
+    def test_response_fields(self):
+        code = f'r = http.get("{self.url}/a"); [r.keys(), r.keys().has("json"), r.has("/a") || r.has(200)]'
+        fields = ["status", "content", "json", "headers", "cookie", "chunks", "save"]
+        self.assertEqual(makeObject(run_code(code, False, False, False)), [fields, 1, 1])
+        code = f'r = http.get("{self.url}/a"); match r {{ [status: 200, content: _]: r.json.path, _: 0 }}'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), "/a")
+        code = f'json.decode(json.encode(http.get("{self.url}/a")))'
+        res = makeObject(run_code(code, False, False, False))
+        self.assertEqual(res["json"], {"method": "GET", "path": "/a", "body": "", "agent": ""})
+        self.assertEqual(json.loads(res["content"]), res["json"])
+        self.assertNotIn("_get_", res)
+        # Other verbs keep json as a closure
+        code = f'r = http.delete("{self.url}/d"); j = r.json(); j.seen = 1; [j.method, r.json.path, r.json().seen]'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), ["DELETE", None, 1])
+    def test_binary_chunks(self):
+        code = f'r = http.get("{self.url}/binary", stream = 1); for c in r.chunks(7) {{ c }}'
+        text = "".join(makeObject(run_code(code, False, False, False)))
+        self.assertEqual(text, "\x00\ufffdab\ufffd" * 100)
+    def test_keep_alive(self):
+        code = f'for i in 1..20 {{ http.get("{self.url}/k").status }}'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), [200] * 20)
+        self.assertEqual(len(StandIn.ports), 1)
+    def test_client(self):
+        code = f'c = http.client([timeout: 0.1, keepAlive: 0, headers: ["X-Agent": "teeny"]]); c.post("{self.url}/slow", [])'
+        self.assertIsInstance(run_code(code, False, False, False), Error)
+        StandIn.ports.clear()
+        code = f'c = http.client([keepAlive: 0, headers: ["X-Agent": "teeny"]]); for i in 1..5 {{ c.get("{self.url}/k").json.agent }}'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), ["teeny"] * 5)
+        self.assertEqual(len(StandIn.ports), 5)
+        self.assertEqual(makeObject(run_code(f'http.get("{self.url}/k").json.agent', False, False, False)), "")
+    def test_retries(self):
+        for verb in ("get", "post", "patch", "delete"):
+            data = ", [x: 1]" if verb in ("post", "patch") else ""
+            code = f'c = http.client([retries: 2]); c.{verb}("{self.url}/flaky/{verb}"{data}).status'
+            self.assertEqual(makeObject(run_code(code, False, False, False)), 200)
+        self.assertEqual(StandIn.served, [f"/flaky/{verb}" for verb in ("get", "post", "patch", "delete") for _ in (1, 2)])
+        code = f'http.post("{self.url}/flaky/once", []).status'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), 503)
+    def test_all(self):
+        reqs = f'["{self.url}/slow/1", [method: "post", url: "{self.url}/p", data: [x: 1]], "http://127.0.0.1:1/refused", [method: "bogus", url: "{self.url}"]]'
+        code = f'rs = http.all({reqs}, concurrency = 4); [rs[0].json.path, rs[1].json().method, rs[2].type, rs[3].type]'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), ["/slow/1", "POST", "HTTPError", "HTTPError"])
+        code = f'urls = []; for i in 1..8 {{ urls.push("{self.url}/slow/{{i}}") }}; http.map(urls, (r) => r.json.path, concurrency = 8)'
+        start = time.perf_counter()
+        res = makeObject(run_code(code, False, False, False))
+        self.assertEqual(res, [f"/slow/{i}" for i in range(1, 9)])
+        self.assertLess(time.perf_counter() - start, 2)
+    def test_cache(self):
+        code = f'''c = http.client([cache: 1]); a = c.get("{self.url}/fresh"); b = c.get("{self.url}/fresh")
+                   e1 = c.get("{self.url}/etag"); e2 = c.get("{self.url}/etag"); m = c.get("{self.url}/modified"); m = c.get("{self.url}/modified")
+                   n = c.get("{self.url}/nostore"); n = c.get("{self.url}/nostore"); [a, b, e2.json.path, c.cacheStats()]'''
+        res = run_code(code.replace("\n", ";"), False, False, False)
+        a, b, path, stats = res.toList()
+        self.assertIsNot(a, b)
+        self.assertEqual(makeObject(a), makeObject(b))
+        self.assertEqual(makeObject(path), "/etag")
+        self.assertEqual(makeObject(stats), {"hits": 1, "misses": 5, "revalidations": 2, "entries": 3})
+        self.assertEqual(StandIn.served, ["/fresh", "/etag", "/etag", "/modified", "/modified", "/nostore", "/nostore"])
+    def test_cache_isolation(self):
+        # A hit is a Table of its own, changing it does not change the next hit
+        code = f'c = http.client([cache: 1]); a = c.get("{self.url}/fresh/m"); a.json.path = "changed"; c.get("{self.url}/fresh/m").json.path'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), "/fresh/m")
+        code = f'''c = http.client([cache: 1]); a = c.get("{self.url}/fresh/u", headers = [Authorization: "alice"])
+                   b = c.get("{self.url}/fresh/u", headers = [Authorization: "bob"]); p = c.get("{self.url}/private"); p = c.get("{self.url}/private")
+                   [a.json.auth, b.json.auth, c.cacheStats().entries]'''
+        self.assertEqual(makeObject(run_code(code.replace("\n", ";"), False, False, False)), ["alice", "bob", 0])
+        code = f'''c = http.client([cache: 1]); j = c.get("{self.url}/vary", headers = [Accept: "application/json"])
+                   t = c.get("{self.url}/vary", headers = [Accept: "text/plain"]); t2 = c.get("{self.url}/vary", headers = [Accept: "text/plain"])
+                   [j.json.accept, t.json.accept, t2.json.accept, c.cacheStats().hits]'''
+        self.assertEqual(makeObject(run_code(code.replace("\n", ";"), False, False, False)), ["application/json", "text/plain", "text/plain", 1])
+        self.assertEqual(StandIn.served, ["/fresh/m", "/fresh/u", "/fresh/u", "/private", "/private", "/vary", "/vary"])
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as d:
+            code = f'c = http.client([cache: [size: 1, dir: "{d}"]]); c.get("{self.url}/fresh?a=1"); c.get("{self.url}/fresh?a=2"); c.get("{self.url}/fresh?a=1").json.path'
+            self.assertEqual(makeObject(run_code(code, False, False, False)), "/fresh?a=1")
+            code = f'c = http.client([cache: [dir: "{d}"]]); r = c.get("{self.url}/fresh", [a: 2]); [r.json.path, c.cacheStats().hits]'
+            self.assertEqual(makeObject(run_code(code, False, False, False)), ["/fresh?a=2", 1])
+        self.assertEqual(StandIn.served, ["/fresh?a=1", "/fresh?a=2"])
+
+def freePort() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def startServer(port: int, options: str, handler: str = "(req) => [body: string(os.pid()), headers: [path: req.path]]") -> subprocess.Popen:
+    code = f'http.listen({port}, {handler}{options})'
+    proc = subprocess.Popen([sys.executable, "-c", f"from teeny.runner import run_code; run_code({code!r}, False, False, False)"],
+                            stderr = subprocess.DEVNULL)
+    # The socket listens before the engine runs, only an answered request proves the server is up
+    for _ in range(100):
+        try:
+            requests.get(f"http://127.0.0.1:{port}/", timeout = 1)
+            break
+        except requests.RequestException:
+            time.sleep(0.05)
+    return proc
+
+@unittest.skipUnless(hasattr(os, "fork") and os.path.isdir("/proc/self/task"), "pre-fork needs fork and /proc")
+class TestListen(unittest.TestCase):
+    def setUp(self):
+        self.port = freePort()
+        self.proc = startServer(self.port, ", workers = 2")
+        self.url = f"http://127.0.0.1:{self.port}/"
+        for _ in range(100):
+            if len(self.workers()) == 2: break
+            time.sleep(0.05)
+    def tearDown(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+    def workers(self) -> set:
+        try:
+            with open(f"/proc/{self.proc.pid}/task/{self.proc.pid}/children") as f:
+                return set(map(int, f.read().split()))
+        except OSError:
+            return set()
+    def test_prefork(self):
+        first = self.workers()
+        self.assertEqual(len(first), 2)
+        r = requests.get(self.url + "x")
+        self.assertIn(int(r.text), first)
+        self.assertEqual(r.headers["path"], "/x")
+        victim = int(r.text)
+        os.kill(victim, signal.SIGKILL)
+        for _ in range(100):
+            if len(self.workers()) == 2 and victim not in self.workers(): break
+            time.sleep(0.05)
+        self.assertEqual(len(self.workers() - first), 1)
+        self.assertIn(int(requests.get(self.url).text), self.workers())
+        self.proc.send_signal(signal.SIGTERM)
+        self.assertEqual(self.proc.wait(timeout = 10), 0)
+
+class TestAsyncEngine(unittest.TestCase):
+    def setUp(self):
+        self.port = freePort()
+        self.proc = startServer(self.port, ', engine = "async", maxConnections = 3, threads = 2',
+                                '(req) => [json: [method: req.method, path: req.path, body: req.body]]')
+    def tearDown(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+    def test_keep_alive_pipelining(self):
+        with socket.create_connection(("127.0.0.1", self.port)) as s:
+            s.sendall(b"GET /a HTTP/1.1\r\nHost: x\r\n\r\nPOST /b HTTP/1.1\r\nContent-Length: 5\r\n\r\nhello"
+                      b"GET /c HTTP/1.1\r\nConnection: close\r\n\r\n")
+            data = b""
+            while chunk := s.recv(65536):
+                data += chunk
+        parts = data.split(b"HTTP/1.1 200 OK")[1:]
+        bodies = [json.loads(p.split(b"\r\n\r\n", 1)[1]) for p in parts]
+        self.assertEqual(bodies, [{"method": "GET", "path": "/a", "body": ""}, {"method": "POST", "path": "/b", "body": "hello"},
+                                  {"method": "GET", "path": "/c", "body": ""}])
+        self.assertIn(b"Connection: keep-alive", parts[0])
+        self.assertIn(b"Connection: close", parts[2])
+    def test_limits(self):
+        idle = [socket.create_connection(("127.0.0.1", self.port)) for _ in range(3)]
+        time.sleep(0.2)
+        with socket.create_connection(("127.0.0.1", self.port)) as s:
+            s.sendall(b"GET / HTTP/1.1\r\n\r\n")
+            self.assertTrue(s.recv(65536).startswith(b"HTTP/1.1 503"))
+        for s in idle: s.close()
+        time.sleep(0.2)
+        with socket.create_connection(("127.0.0.1", self.port)) as s:
+            s.sendall(b"BROKEN\r\n\r\n")
+            self.assertTrue(s.recv(65536).startswith(b"HTTP/1.1 400"))
+        session = requests.Session()
+        self.assertEqual([session.get(f"http://127.0.0.1:{self.port}/{i}").json()["path"] for i in range(3)], ["/0", "/1", "/2"])
+        session.close()
+        self.proc.send_signal(signal.SIGTERM)
+        self.assertEqual(self.proc.wait(timeout = 10), 0)
+
+class TestDispatch(unittest.TestCase):
+    def test_isolated_requests(self):
+        env = makeGlobal()
+        run_code('count = 0; shared = []; handler = (req) => { count = count + 1; shared.push(req.path); [body: string(count)] }',
+                 False, False, False, env)
+        handler = env["handler"]
+        self.assertEqual([respond(handler, "GET", f"/{i}", {}, "")[2] for i in range(3)], [b"1", b"1", b"1"])
+        self.assertEqual(makeObject(env["count"]), 0)
+        self.assertEqual(makeObject(env["shared"]), ["/0", "/1", "/2"])
+    def test_queue_limit(self):
+        port = freePort()
+        handler = '(req) => if req.path == "/metrics" { [json: http.metrics()] } else { time.sleep(0.3); [body: "done"] }'
+        proc = startServer(port, ", threads = 1, maxQueue = 1", handler)
+        try:
+            url = f"http://127.0.0.1:{port}"
+            with ThreadPoolExecutor(4) as pool:
+                codes = sorted(pool.map(lambda i: requests.get(f"{url}/{i}").status_code, range(4)))
+            self.assertEqual(codes, [200, 200, 503, 503])
+            stats = requests.get(f"{url}/metrics").json()
+            self.assertEqual((stats["queued"], stats["inFlight"], stats["rejected"]), (0, 1, 2))
+            self.assertGreaterEqual(stats["served"], 3)
+            self.assertGreaterEqual(stats["latency"]["p99"], 300)
+        finally:
+            proc.kill()
+            proc.wait()
+
+class TestRouter(unittest.TestCase):
+    def test_routes(self):
+        env = makeGlobal()
+        code = '''r = http.router()
+            r.get("/users/:id", (req) => [json: req.params]).get("/users/me", (req) => [body: "me"])
+            r.get("/users/:id/posts/:post", (req) => [json: req.params])
+            api = r.group("/api"); v1 = api.group("v1")
+            v1.post("/items", (req) => [status: 201, body: req.body]).any("/files/*path", (req) => [body: req.method + " " + req.params.path])'''
+        run_code(code.replace("\n", ";"), False, False, False, env)
+        r = env["r"]
+        call = lambda method, path, body = "": respond(r, method, path, {}, body)
+        self.assertEqual(call("GET", "/users/42?full=1"), (200, {"content-type": "application/json"}, b'{"id": "42"}'))
+        self.assertEqual(call("GET", "/users/me")[2], b"me")
+        self.assertEqual(json.loads(call("GET", "/users/a%20b/posts/7")[2]), {"id": "a b", "post": "7"})
+        self.assertEqual(call("POST", "/api/v1/items", "x")[::2], (201, b"x"))
+        self.assertEqual(call("DELETE", "/api/v1/files/a/b.txt")[2], b"DELETE a/b.txt")
+        self.assertEqual(call("HEAD", "/users/me")[2], b"me")
+        self.assertEqual(call("PUT", "/users/1")[:2], (405, {"allow": "GET"}))
+        self.assertEqual(call("GET", "/nope")[0], 404)
+        run_code('r.notFound((req) => [status: 404, body: "custom " + req.path])', False, False, False, env)
+        self.assertEqual(call("GET", "/nope")[2], b"custom /nope")
+        self.assertIsInstance(run_code('r.get("/users/:name/x", (req) => 1)', False, False, False, env), Error)
+        self.assertIsInstance(run_code('r.post("/api/v1/files/*rest", (req) => 1)', False, False, False, env), Error)
+    def test_route_methods(self):
+        # A static route for another method does not hide a parameter or wildcard route
+        router = Router()
+        router.add("GET", "/users/:id", "byId"); router.add("DELETE", "/users/me", "deleteMe")
+        router.add("GET", "/files/*path", "file"); router.add("PUT", "/files/tmp", "putTmp")
+        self.assertEqual(router.match("GET", "/users/me"), ("byId", {"id": "me"}, []))
+        self.assertEqual(router.match("DELETE", "/users/me"), ("deleteMe", {}, []))
+        self.assertEqual(router.match("HEAD", "/files/tmp"), ("file", {"path": "tmp"}, []))
+        self.assertEqual(router.match("POST", "/users/me"), (None, {}, ["DELETE", "GET"]))
+        self.assertEqual(router.match("POST", "/files/tmp"), (None, {}, ["GET", "PUT"]))
+        with self.assertRaises(ValueError):
+            router.add("POST", "/files/*rest", "other")
+
+class TestFileResponse(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "data.bin")
+        self.data = bytes(range(256)) * 1000
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+        self.env = makeGlobal()
+        run_code(f'h = (req) => [file: "{self.path}", gzip: req.path == "/gz"]', False, False, False, self.env)
+    def tearDown(self):
+        self.dir.cleanup()
+    def call(self, headers: dict, path: str = "/"):
+        return respond(self.env["h"], "GET", path, headers, "")
+    def test_conditional_and_range(self):
+        status, headers, body = self.call({})
+        self.assertEqual((status, len(body), headers["content-type"]), (200, len(self.data), "application/octet-stream"))
+        etag = headers["etag"]
+        self.assertEqual(self.call({"If-None-Match": etag})[0], 304)
+        self.assertEqual(self.call({"If-Modified-Since": headers["last-modified"]})[0], 304)
+        status, headers, body = self.call({"Range": "bytes=10-19"})
+        self.assertEqual((status, headers["content-range"], body.offset, len(body)), (206, f"bytes 10-19/{len(self.data)}", 10, 10))
+        self.assertEqual(self.call({"Range": "bytes=-5"})[2].offset, len(self.data) - 5)
+        self.assertEqual(self.call({"Range": f"bytes={len(self.data)}-"})[0], 416)
+        self.assertEqual(self.call({"Range": "bytes=0-1", "If-Range": '"stale"'})[0], 200)
+        os.remove(self.path)
+        self.assertEqual(self.call({})[0], 404)
+    def test_gzip_variant(self):
+        status, headers, body = self.call({"Accept-Encoding": "gzip, br"}, "/gz")
+        self.assertEqual((headers["content-encoding"], gzip.decompress(body)), ("gzip", self.data))
+        self.assertIs(self.call({"Accept-Encoding": "gzip"}, "/gz")[2], body)
+        self.assertNotIn("content-encoding", self.call({}, "/gz")[1])
+        stat = os.stat(self.path)
+        with open(self.path, "wb") as f:
+            f.write(b"changed")
+        os.utime(self.path, ns = (stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(gzip.decompress(self.call({"Accept-Encoding": "gzip"}, "/gz")[2]), b"changed")
+    def test_sendfile(self):
+        for options in ("", ', engine = "async"'):
+            port = freePort()
+            proc = startServer(port, options, f'(req) => [file: "{self.path}"]')
+            try:
+                r = requests.get(f"http://127.0.0.1:{port}/")
+                self.assertEqual(r.content, self.data)
+                r = requests.get(f"http://127.0.0.1:{port}/", headers = {"Range": "bytes=256-511"})
+                self.assertEqual((r.status_code, r.content), (206, bytes(range(256))))
+            finally:
+                proc.kill()
+                proc.wait()
+
+class TestStreaming(unittest.TestCase):
+    def test_stream_response(self):
+        env = makeGlobal()
+        run_code('n = [0]; h = (req) => [stream: () => { n.push(1); if n.len() > 3 { nil } else { string(n.len()) } }]; '
+                 'l = (req) => [stream: ["a", "", "b"], headers: [x: "1"]]', False, False, False, env)
+        status, headers, body = respond(env["h"], "GET", "/", {}, "")
+        self.assertEqual((status, list(body)), (200, [b"2", b"3"]))
+        status, headers, body = respond(env["l"], "GET", "/", {}, "")
+        self.assertEqual((headers, list(body)), ({"x": "1"}, [b"a", b"b"]))
+    def test_chunked_body(self):
+        for options in ("", ', engine = "async"'):
+            port = freePort()
+            proc = startServer(port, options, '(req) => [body: req.body]')
+            try:
+                r = requests.post(f"http://127.0.0.1:{port}/", data = iter([b"hello ", b"chunked ", b"world"]))
+                self.assertEqual(r.text, "hello chunked world")
+            finally:
+                proc.kill()
+                proc.wait()
+    def test_stream_body(self):
+        # The first line is echoed back before the rest of the upload is sent
+        handler = '(req) => [stream: () => { l = req.body.readLine(); if l == nil { nil } else { l.upper() + "\\n" } }]'
+        for options in (", streamBody = 1", ', streamBody = 1, engine = "async"'):
+            port = freePort()
+            proc = startServer(port, options, handler)
+            try:
+                with socket.create_connection(("127.0.0.1", port)) as s:
+                    s.sendall(b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n6\r\nfirst\n\r\n")
+                    s.settimeout(5)
+                    data = b""
+                    while b"FIRST" not in data:
+                        data += s.recv(65536)
+                    s.sendall(b"7\r\nsecond\n\r\n0\r\n\r\n")
+                    while chunk := s.recv(65536):
+                        data += chunk
+                head, _, rest = data.partition(b"\r\n\r\n")
+                if b"chunked" in head.lower():
+                    self.assertEqual(rest, b"6\r\nFIRST\n\r\n7\r\nSECOND\n\r\n0\r\n\r\n")
+                else:
+                    self.assertEqual(rest, b"FIRST\nSECOND\n")
+            finally:
+                proc.kill()
+                proc.wait()
+
+class TestHandlerCache(unittest.TestCase):
+    def test_cached_responses(self):
+        env = makeGlobal()
+        run_code('calls = []; h = (req) => { calls.push(req.path); if req.path == "/live" { [body: "live"] } else { [body: "v" + req.path, cache: 60] } }',
+                 False, False, False, env)
+        dispatcher = Dispatcher(env["h"], threads = 1, cache = HandlerCache(maxBytes = 10, vary = ["Accept-Language"]))
+        call = lambda path, headers = {}, method = "GET": dispatcher.submit(method, path, headers, "").result()
+        try:
+            status, headers, body = call("/a")
+            etag = headers["etag"]
+            self.assertEqual(call("/a"), (200, {"etag": etag}, b"v/a"))
+            self.assertEqual(call("/a", {"If-None-Match": etag}), (304, {"etag": etag}, b""))
+            self.assertEqual(call("/a", {"Accept-Language": "fr"})[2], b"v/a")
+            call("/live"); call("/live"); call("/a", method = "POST")
+            self.assertEqual(makeObject(env["calls"]), ["/a", "/a", "/live", "/live", "/a"])
+            # HEAD has entries of its own, it is not answered with what GET stored
+            call("/a", method = "HEAD"); call("/a", method = "HEAD")
+            self.assertEqual(makeObject(env["calls"]), ["/a", "/a", "/live", "/live", "/a", "/a"])
+            self.assertEqual(dispatcher.cache.key("HEAD", "/a", {}), ("HEAD", "/a", False, ""))
+            # Three bodies of 3 bytes fit in 10, the fourth evicts the least recently used
+            call("/b"); call("/c"); call("/a")
+            self.assertEqual(dispatcher.cache.stats()["entries"], 3)
+            self.assertEqual(makeObject(env["calls"])[-3:], ["/b", "/c", "/a"])
+        finally:
+            dispatcher.close()
+        fresh = HandlerCache()
+        status, headers, _ = respond(env["h"], "GET", "/x", {"If-None-Match": etag}, "", fresh)
+        self.assertEqual(status, 200)
+        self.assertEqual(respond(env["h"], "GET", "/x", {"If-None-Match": headers["etag"]}, "", fresh)[0], 304)
@@ -0,0 +1,32 @@
+import unittest
+from teeny import interpreter
+from teeny.lexer import tokenize
+from teeny.parser import parse
+from teeny.runner import run_code
+from teeny.profiler import Profiler
+from teeny.value import makeObject, Closure
+
+class TestProfiler(unittest.TestCase):
+    def test_lines(self):
+        ast = parse(tokenize('f = (n) => {\n    g(n,\n      "{h(2)}")\n}'))[0]
+        call = ast.children[1].children[0].children[0]
+        self.assertEqual((ast.line, call.typ, call.line), (1, "CALL", 2))
+        self.assertEqual(call.children[2].children[1].line, 3)
+    def test_profile(self):
+        code = 'fib = (n) => if n < 2 { n } else { fib(n - 1) + fib(n - 2) }\nsq = (x) => x * x\nt = range(0, 10).map((i) => sq(i))\nr = [fib(10), t.sum()]'
+        interpret, call = interpreter.interpret, Closure.__call__
+        prof = Profiler()
+        self.assertEqual(makeObject(prof.run(run_code, code, False, False, False)), [55, 285])
+        # Hooks are gone once it is done
+        self.assertIs(interpreter.interpret, interpret)
+        self.assertIs(Closure.__call__, call)
+        funcs = {s.label: s for s in prof.funcs.values()}
+        self.assertEqual((funcs["fib:1"].calls, funcs["sq:2"].calls, funcs["<lambda>:3"].calls, funcs["map (builtin)"].calls), (177, 10, 10, 1))
+        self.assertGreater(funcs["fib:1"].allocs, 0)
+        self.assertLessEqual(funcs["fib:1"].selfWall, funcs["fib:1"].wall)
+        self.assertEqual(prof.lines[2].hits, 11)
+        self.assertIn("<script>;fib:1;fib:1 ", prof.collapsed())
+        self.assertIn("fib = (n)", prof.report(code))
+
+if __name__ == "__main__":
+    unittest.main()
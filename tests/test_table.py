@@ -42,6 +42,30 @@ class TestTable(unittest.TestCase):
         })
         self.assertEqual(makeObject(run_code('[1, 2, 3].len()', False, False, False)), 3)
         self.assertEqual(makeObject(run_code('a = 1; [:a]', False, False, False)), {'a': 1})
+    def test_parallel_map_filter(self):
+        code = 'k = 3; fib = (n) => if n < 2 { n } else { fib(n - 1) + fib(n - 2) }; t = [10, 15, 1, 2, a: 5]'
+        serial = makeObject(run_code(code + '; t.map((x, i) => fib(x) * k)', False, False, False))
+        self.assertEqual(makeObject(run_code(code + '; table.pmap(t, (x, i) => fib(x) * k, workers = 2, chunk = 2)', False, False, False)), serial)
+        self.assertEqual(makeObject(run_code(code + '; table.pfilter(t, (x) => x % 5 == 0, workers = 2)', False, False, False)), {"0": 10, "1": 15, "a": 5})
+        self.assertEqual(makeObject(run_code('s = [n: 1]; table.pmap([1, 2], (x) => [x, s, s], workers = 2)', False, False, False)),
+                         [[1, {"n": 1}, {"n": 1}], [2, {"n": 1}, {"n": 1}]])
+        self.assertEqual(makeObject(run_code('table.pmap([], (x) => x)', False, False, False)), [])
+        res = run_code('table.pmap([1, 2, 3], (x) => if x == 2 { missing } else { x }, workers = 2)', False, False, False)
+        self.assertIsInstance(res, Error)
+        self.assertIsInstance(run_code('table.pmap([1], math.floor)', False, False, False), Error)
+    def test_shared_table(self):
+        code = 's = shm.share([1, 2, 3.5]); w = shm.share(["a", "héllo", ""]); '
+        self.assertEqual(makeObject(run_code(code + '[s[2], s.len(), s.sum(), w[1], w.sub(1, 3), w.toTable()]', False, False, False)),
+                         [3.5, 3, 6.5, "héllo", ["héllo", ""], ["a", "héllo", ""]])
+        self.assertEqual(makeObject(run_code(code + 'a = shm.attach(w.name); x = []; for v in a { x.push(v) }; a.close(); x', False, False, False)),
+                         ["a", "héllo", ""])
+        res = run_code(code + 's[0] = 5', False, False, False)
+        self.assertEqual(res.typ, "SharedError")
+        self.assertIsInstance(run_code('shm.share([1, "a"])', False, False, False), Error)
+        self.assertIsInstance(run_code('s = shm.share([1]); s.unlink(); shm.attach(s.name)', False, False, False), Error)
+        # Workers map the segment instead of receiving the items
+        self.assertEqual(makeObject(run_code('big = shm.share(range(0, 10000)); table.pmap([0, 1], (i) => big.sum() + big[i], workers = 2)',
+                                             False, False, False)), [49995000, 49995001])
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
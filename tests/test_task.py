@@ -0,0 +1,33 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from teeny.runner import run_code
+from teeny.value import makeObject, Error
+
+class TestTask(unittest.TestCase):
+    def test_spawn_overlaps_waits(self):
+        st = time.perf_counter()
+        res = run_code('fs = range(0, 8).map((i) => task.spawn((x) => { time.sleep(0.2); x * 2 }, i)); task.all(fs)', False, False, False)
+        self.assertEqual(makeObject(res), [0, 2, 4, 6, 8, 10, 12, 14])
+        self.assertLess(time.perf_counter() - st, 1)
+    def test_await(self):
+        self.assertEqual(makeObject(run_code('x = 1; f = task.spawn(() => { x = 2; x }); [f.await(), x, f.done()]', False, False, False)), [2, 1, 1])
+        # Tasks awaiting tasks run them inline instead of waiting for a free thread
+        self.assertEqual(makeObject(run_code('inner = () => task.spawn(() => 5).await(); task.all(range(0, 100).map((i) => task.spawn(inner))).sum()',
+                                             False, False, False)), 500)
+        self.assertIsInstance(run_code('task.all([task.spawn(() => 1), task.spawn(() => missing)])', False, False, False), Error)
+    def test_chan(self):
+        code = 'ch = task.chan(2); task.spawn(() => { for i in 0..9 { ch.send(i) }; ch.close() }); got = []; for v in ch { got.push(v) }; [got, ch.recv(), ch.closed()]'
+        self.assertEqual(makeObject(run_code(code, False, False, False)), [list(range(10)), None, 1])
+        res = run_code('ch = task.chan(); ch.close(); ch.send(1)', False, False, False)
+        self.assertEqual((res.typ, res.value), ("ChannelError", "send on a closed channel"))
+    def test_interpreters_on_threads(self):
+        # Each run_code call has its own globals, standard library tables included
+        code = 'math.me = {0}; fib = (n) => if n < 2 {{ n }} else {{ fib(n - 1) + fib(n - 2) }}; [math.me, fib(12)]'
+        with ThreadPoolExecutor(8) as pool:
+            res = list(pool.map(lambda i: makeObject(run_code(code.format(i), False, False, False)), range(32)))
+        self.assertEqual(res, [[i, 144] for i in range(32)])
+        self.assertIsNone(makeObject(run_code('math.me', False, False, False)))
+
+if __name__ == "__main__":
+    unittest.main()